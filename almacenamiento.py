@@ -0,0 +1,628 @@
+import abc
+import fcntl
+import functools
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import ChainMap
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+
+from conexion_remota import anexar_sftp, candado, obtener_pool
+from diario import obtener_diario
+from trazas import tramo
+
+TAM_BLOQUE = 1 << 20      # Bytes por lectura
+TAM_SEGMENTO_MB = 64      # Tamaño a partir del cual se abre un segmento nuevo
+ESPERA_QUORUM = 60        # Segundos máximos esperando las confirmaciones de una escritura replicada
+NIVEL_GZIP = 6
+
+
+class SesionLocal:
+    """Operaciones sobre archivos de un directorio local"""
+
+    # Réplica que atiende la sesión; None si el almacén no está replicado
+    origen = None
+
+    def __init__(self, raiz):
+        self.raiz = Path(raiz)
+
+    def _ruta(self, nombre):
+        return self.raiz / nombre
+
+    def stat(self, nombre):
+        """(tamaño, mtime) del archivo, o (0, None) si no existe"""
+        try:
+            atributos = os.stat(self._ruta(nombre))
+        except FileNotFoundError:
+            return 0, None
+        return atributos.st_size, atributos.st_mtime
+
+    def leer(self, nombre, inicio=0, tamano=None):
+        """Itera en bloques los bytes de [inicio, inicio + tamano); sin tamaño, hasta el final"""
+        with open(self._ruta(nombre), 'rb') as archivo:
+            archivo.seek(inicio)
+            pendiente = tamano
+            while pendiente is None or pendiente > 0:
+                datos = archivo.read(TAM_BLOQUE if pendiente is None else min(TAM_BLOQUE, pendiente))
+                if not datos:
+                    break
+                if pendiente is not None:
+                    pendiente -= len(datos)
+                yield datos
+
+    def anexar(self, nombre, datos, cabecera=None):
+        """Agrega `datos` al final del archivo y devuelve el offset donde quedaron"""
+        ruta = self._ruta(nombre)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        with open(ruta, 'ab') as archivo:
+            # flock excluye a los demás procesos que escriben en el mismo archivo
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+            try:
+                inicio = archivo.seek(0, os.SEEK_END)
+                if inicio == 0 and cabecera:
+                    archivo.write(cabecera)
+                    inicio = len(cabecera)
+                archivo.write(datos)
+                archivo.flush()
+                os.fsync(archivo.fileno())
+            finally:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+        return inicio
+
+    def contar(self, nombre):
+        """Líneas completas del archivo (registros en los archivos JSONL)"""
+        try:
+            return sum(bloque.count(b'\n') for bloque in self.leer(nombre))
+        except FileNotFoundError:
+            return 0
+
+    def abrir(self, nombre):
+        """Archivo binario de solo lectura, para envolverlo (por ejemplo con gzip)"""
+        return open(self._ruta(nombre), 'rb')
+
+    def reemplazar(self, nombre, bloques):
+        """Escribe el archivo completo con `bloques` (bytes o iterable de bytes) y lo instala de un golpe"""
+        ruta = self._ruta(nombre)
+        temporal = ruta.with_name(ruta.name + '.tmp')
+        with open(temporal, 'wb') as archivo:
+            for bloque in [bloques] if isinstance(bloques, bytes) else bloques:
+                archivo.write(bloque)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, ruta)
+
+    def borrar(self, nombre):
+        try:
+            os.remove(self._ruta(nombre))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def bloqueo(self, nombre):
+        """Excluye a otros escritores de `nombre` mientras dura el bloque"""
+        with open(self._ruta(nombre + '.lock'), 'ab') as archivo:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+class SesionSSH(SesionLocal):
+    """Las mismas operaciones sobre un cliente SFTP del pool"""
+
+    def __init__(self, sftp, raiz):
+        self.sftp = sftp
+        self.raiz = raiz
+
+    def _ruta(self, nombre):
+        return f"{self.raiz}/{nombre}"
+
+    def stat(self, nombre):
+        try:
+            atributos = self.sftp.stat(self._ruta(nombre))
+        except FileNotFoundError:
+            return 0, None
+        return atributos.st_size, atributos.st_mtime
+
+    def leer(self, nombre, inicio=0, tamano=None):
+        with self.sftp.open(self._ruta(nombre), 'rb') as archivo:
+            if tamano is None:
+                tamano = max(0, archivo.stat().st_size - inicio)
+            archivo.seek(inicio)
+            # Las lecturas del rango se piden por adelantado, sin esperar cada respuesta
+            archivo.prefetch(inicio + tamano)
+            pendiente = tamano
+            while pendiente > 0:
+                datos = archivo.read(min(TAM_BLOQUE, pendiente))
+                if not datos:
+                    break
+                pendiente -= len(datos)
+                yield datos
+
+    def anexar(self, nombre, datos, cabecera=None):
+        return anexar_sftp(self.sftp, self._ruta(nombre), datos, cabecera)
+
+    def abrir(self, nombre):
+        archivo = self.sftp.open(self._ruta(nombre), 'rb')
+        archivo.prefetch()
+        return archivo
+
+    def reemplazar(self, nombre, bloques):
+        ruta = self._ruta(nombre)
+        with self.sftp.open(ruta + '.tmp', 'wb') as archivo:
+            archivo.set_pipelined(True)
+            for bloque in [bloques] if isinstance(bloques, bytes) else bloques:
+                archivo.write(bloque)
+        self.sftp.posix_rename(ruta + '.tmp', ruta)
+
+    def borrar(self, nombre):
+        try:
+            self.sftp.remove(self._ruta(nombre))
+        except FileNotFoundError:
+            pass
+
+    def bloqueo(self, nombre):
+        return candado(self.sftp, self._ruta(nombre) + '.lock')
+
+
+def _gzip(bloques):
+    """Comprime en formato gzip un iterable de bloques sin juntarlos en memoria"""
+    compresor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+class SesionSegmentada:
+    """Un archivo lógico repartido en segmentos, sobre otra sesión.
+
+    `articulos.jsonl` se guarda como `articulos.2025-001.jsonl`,
+    `articulos.2025-002.jsonl`... (o `articulos.0001.jsonl` por tamaño) y
+    `articulos.jsonl.manifiesto.json` lista los segmentos con sus registros
+    y bytes. Para quien lee, el archivo lógico es la concatenación de los
+    segmentos ya descomprimidos: los offsets no cambian al rotar ni al
+    comprimir. Un archivo anterior sin manifiesto se adopta como primer
+    segmento en la siguiente escritura.
+    """
+
+    origen = None
+
+    def __init__(self, base, politica='anio', tam_segmento=TAM_SEGMENTO_MB << 20, comprimir=False):
+        self.base = base
+        self.politica = politica
+        self.tam_segmento = tam_segmento
+        self.comprimir = comprimir
+        self._manifiestos = {}
+
+    @staticmethod
+    def ruta_manifiesto(nombre):
+        return nombre + '.manifiesto.json'
+
+    def manifiesto(self, nombre, fresco=False):
+        """Manifiesto del archivo lógico, o None si aún no está segmentado"""
+        if fresco or nombre not in self._manifiestos:
+            try:
+                datos = b''.join(self.base.leer(self.ruta_manifiesto(nombre)))
+                self._manifiestos[nombre] = json.loads(datos)
+            except FileNotFoundError:
+                self._manifiestos[nombre] = None
+        return self._manifiestos[nombre]
+
+    def _guardar(self, nombre, manifiesto):
+        self.base.reemplazar(self.ruta_manifiesto(nombre), json.dumps(manifiesto, indent=1).encode())
+        self._manifiestos[nombre] = manifiesto
+
+    def stat(self, nombre):
+        manifiesto = self.manifiesto(nombre)
+        if manifiesto is None:
+            return self.base.stat(nombre)
+        # El manifiesto se reescribe en cada escritura: su mtime es el del archivo lógico
+        _, mtime = self.base.stat(self.ruta_manifiesto(nombre))
+        return sum(segmento['bytes'] for segmento in manifiesto['segmentos']), mtime
+
+    def _leer_segmento(self, segmento, inicio, tamano):
+        if not segmento['comprimido']:
+            yield from self.base.leer(segmento['nombre'], inicio, tamano)
+            return
+        with self.base.abrir(segmento['nombre']) as crudo, gzip.GzipFile(fileobj=crudo) as archivo:
+            archivo.seek(inicio)
+            while tamano > 0:
+                datos = archivo.read(min(TAM_BLOQUE, tamano))
+                if not datos:
+                    break
+                tamano -= len(datos)
+                yield datos
+
+    def leer(self, nombre, inicio=0, tamano=None):
+        manifiesto = self.manifiesto(nombre)
+        if manifiesto is None:
+            yield from self.base.leer(nombre, inicio, tamano)
+            return
+        total = sum(segmento['bytes'] for segmento in manifiesto['segmentos'])
+        fin = total if tamano is None else min(total, inicio + tamano)
+        desde = 0
+        for segmento in manifiesto['segmentos']:
+            hasta = desde + segmento['bytes']
+            if hasta > inicio and desde < fin:
+                # Del segmento activo solo se lee lo que ya registró el manifiesto
+                inicio_segmento = max(inicio, desde) - desde
+                yield from self._leer_segmento(segmento, inicio_segmento, min(fin, hasta) - desde - inicio_segmento)
+            desde = hasta
+            if desde >= fin:
+                break
+
+    def _adoptar(self, nombre):
+        """Manifiesto inicial: el archivo sin segmentar, si existe, queda como primer segmento"""
+        tamano, mtime = self.base.stat(nombre)
+        if mtime is None and not tamano:
+            return {'segmentos': []}
+        return {'segmentos': [{'nombre': nombre, 'anio': None, 'registros': self.base.contar(nombre),
+                               'bytes': tamano, 'comprimido': False}]}
+
+    def _cerrado(self, segmento, anio):
+        return (segmento['comprimido'] or segmento['bytes'] >= self.tam_segmento
+                or (self.politica == 'anio' and segmento['anio'] != anio))
+
+    def _nombre_segmento(self, nombre, segmentos, anio):
+        ruta = PurePosixPath(nombre)
+        if self.politica == 'anio':
+            numero = 1 + sum(segmento['anio'] == anio for segmento in segmentos)
+            etiqueta = f"{anio}-{numero:03d}"
+        else:
+            etiqueta = f"{len(segmentos) + 1:04d}"
+        return str(ruta.with_name(f"{ruta.stem}.{etiqueta}{ruta.suffix}"))
+
+    def anexar(self, nombre, datos, cabecera=None):
+        """Agrega al segmento activo (abriendo uno nuevo si toca) y devuelve el offset lógico"""
+        anio = datetime.now().year
+        with self.base.bloqueo(self.ruta_manifiesto(nombre)):
+            manifiesto = self.manifiesto(nombre, fresco=True) or self._adoptar(nombre)
+            segmentos = manifiesto['segmentos']
+            rotado = not segmentos or self._cerrado(segmentos[-1], anio)
+            if rotado:
+                segmentos.append({'nombre': self._nombre_segmento(nombre, segmentos, anio), 'anio': anio,
+                                  'registros': 0, 'bytes': 0, 'comprimido': False})
+            activo = segmentos[-1]
+            previos = sum(segmento['bytes'] for segmento in segmentos[:-1])
+            inicio = self.base.anexar(activo['nombre'], datos, cabecera if previos == 0 else None)
+            # El tamaño real del segmento también absorbe una escritura previa que no llegó al manifiesto
+            activo['bytes'] = inicio + len(datos)
+            activo['registros'] += datos.count(b'\n')
+            self._guardar(nombre, manifiesto)
+        if rotado and self.comprimir:
+            try:
+                with tramo('almacen.comprimir', archivo=nombre):
+                    self.comprimir_cerrados(nombre)
+            except Exception:
+                # Lo anexado ya quedó escrito; lo pendiente se comprime en la siguiente rotación
+                pass
+        return previos + inicio
+
+    def comprimir_cerrados(self, nombre):
+        """Comprime con gzip los segmentos cerrados.
+
+        Los segmentos cerrados ya no cambian, así que se comprimen sin retener
+        el candado de escritura; solo se toma para actualizar el manifiesto.
+        Un candado aparte evita que dos escritores compriman lo mismo.
+        """
+        with self.base.bloqueo(nombre + '.comprimiendo'):
+            manifiesto = self.manifiesto(nombre, fresco=True)
+            for segmento in (manifiesto or {'segmentos': []})['segmentos'][:-1]:
+                if segmento['comprimido']:
+                    continue
+                comprimido = segmento['nombre'] + '.gz'
+                self.base.reemplazar(comprimido, _gzip(self.base.leer(segmento['nombre'], 0, segmento['bytes'])))
+                with self.base.bloqueo(self.ruta_manifiesto(nombre)):
+                    actual = self.manifiesto(nombre, fresco=True)
+                    for entrada in actual['segmentos']:
+                        if entrada['nombre'] == segmento['nombre']:
+                            entrada['nombre'], entrada['comprimido'] = comprimido, True
+                            entrada['bytes_comprimidos'] = self.base.stat(comprimido)[0]
+                    self._guardar(nombre, actual)
+                self.base.borrar(segmento['nombre'])
+
+
+class Almacen(abc.ABC):
+    """Archivos de registros del proyecto, sin importar dónde estén guardados.
+
+    `sesion()` agrupa varias operaciones (una sola sesión SFTP en el almacén
+    remoto); `anexar` suelto abre una sesión para cada llamada. Los
+    nombres son relativos a la raíz del almacén.
+    """
+
+    @abc.abstractmethod
+    def sesion(self):
+        """Context manager que entrega una sesión con las operaciones sobre archivos"""
+
+    def anexar(self, nombre, datos, cabecera=None):
+        with self.sesion() as sesion:
+            return sesion.anexar(nombre, datos, cabecera)
+
+
+class AlmacenLocal(Almacen):
+    """Archivos en un directorio del mismo servidor: sin SSH de por medio"""
+
+    def __init__(self, raiz):
+        self.raiz = Path(raiz)
+        self.raiz.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def sesion(self):
+        yield SesionLocal(self.raiz)
+
+
+class AlmacenSSH(Almacen):
+    """Archivos en `remote_dir` del servidor remoto, por SFTP sobre el pool de conexiones"""
+
+    def __init__(self, config):
+        self.pool = obtener_pool(config)
+        self.raiz = config['remote_dir']
+
+    @contextmanager
+    def sesion(self):
+        with self.pool.sftp() as sftp:
+            yield SesionSSH(sftp, self.raiz)
+
+
+class AlmacenSegmentado(Almacen):
+    """Otro almacén con cada archivo repartido en segmentos (ver SesionSegmentada)"""
+
+    def __init__(self, base, politica='anio', tam_segmento=TAM_SEGMENTO_MB << 20, comprimir=False):
+        self.base = base
+        self.politica = politica
+        self.tam_segmento = tam_segmento
+        self.comprimir = comprimir
+
+    @contextmanager
+    def sesion(self):
+        with self.base.sesion() as sesion:
+            yield SesionSegmentada(sesion, self.politica, self.tam_segmento, self.comprimir)
+
+
+class ErrorQuorum(IOError):
+    """Menos réplicas que el quórum confirmaron una escritura"""
+
+
+class AlmacenReplicado(Almacen):
+    """Las escrituras van a varias réplicas en paralelo y se confirman al alcanzar el quórum.
+
+    Cada bloque se anexa a la vez en todas las réplicas, desde un pool de
+    hilos, y `anexar` regresa en cuanto `quorum` de ellas lo confirman: la
+    latencia la fijan las más rápidas. Lo que una réplica no recibió se
+    guarda en su diario de reparación (`journal_dir/replicas`) y un hilo de
+    fondo se lo reenvía; mientras tenga reparaciones pendientes, sus bloques
+    nuevos se encolan detrás de ellas en lugar de escribirse directo.
+
+    Si no se alcanza el quórum se lanza ErrorQuorum y el diario de capturas
+    reintenta el lote, que empieza con el mismo bloque; las réplicas que sí
+    lo recibieron recuerdan lo escrito y del reintento solo anexan el resto.
+    Las escrituras en un mismo archivo de una réplica van en serie, pero nadie
+    espera turno: si la réplica todavía está escribiendo un envío anterior, el
+    bloque nuevo se trata como rezagado y va a su diario de reparación, que lo
+    anexa cuando ese envío termina y sin repetir lo que alcanzó a escribir.
+    Así una réplica colgada no acapara los hilos ni detiene las capturas; y
+    si el quórum no llega en `espera` segundos la escritura falla con
+    ErrorQuorum.
+
+    Las lecturas las atiende la primera réplica al día que responda; la
+    sesión indica en `origen` cuál fue, porque los offsets de una réplica no
+    valen en otra.
+    """
+
+    def __init__(self, replicas, etiquetas, quorum, directorio_reparacion, espera=ESPERA_QUORUM):
+        self.replicas = replicas
+        self.etiquetas = etiquetas
+        self.quorum = quorum
+        self.espera = espera
+        self._ejecutor = ThreadPoolExecutor(max_workers=2 * len(replicas), thread_name_prefix='gea-replica')
+        self._reparaciones = [
+            obtener_diario(Path(directorio_reparacion) / f"{etiqueta}.jsonl", functools.partial(self._reparar, i))
+            for i, etiqueta in enumerate(etiquetas)
+        ]
+        # (réplica, archivo) -> bytes que la réplica ya tiene de un envío que no alcanzó el quórum
+        self._adelantados = {}
+        # (réplica, archivo) -> candado que pone en serie sus escrituras
+        self._escrituras = {}
+        self._lock = threading.Lock()
+
+    def _candado(self, i, nombre):
+        with self._lock:
+            return self._escrituras.setdefault((i, nombre), threading.Lock())
+
+    def _reparar(self, i, archivo, entradas):
+        datos = ''.join(entrada['contenido']['datos'] for entrada in entradas).encode('utf-8')
+        cabecera = entradas[0]['contenido']['cabecera']
+        with self._candado(i, archivo):
+            # El bloque pudo encolarse mientras la réplica escribía su comienzo
+            with self._lock:
+                previo = self._adelantados.pop((i, archivo), b'')
+            if datos.startswith(previo):
+                datos = datos[len(previo):]
+            if not datos:
+                return None
+            with tramo('replica.reparar', replica=self.etiquetas[i], bytes=len(datos)):
+                return self.replicas[i].anexar(archivo, datos, cabecera.encode('utf-8') if cabecera else None)
+
+    def _rezagada(self, i):
+        return self._reparaciones[i].estado()['pendientes'] > 0
+
+    def _escribir_replica(self, i, nombre, datos, cabecera):
+        """Anexa el bloque en la réplica `i`; no lanza excepciones, el resultado describe lo ocurrido.
+
+        Lo que la réplica queda teniendo del bloque se anota en `_adelantados`
+        antes de soltar el candado, para que la siguiente escritura lo vea
+        aunque el quórum de esta todavía no se conozca; `_resolver` lo retira
+        si el bloque se confirmó. Si el archivo tiene una escritura en curso
+        en esta réplica, el bloque queda rezagado sin esperarla.
+        """
+        candado = self._candado(i, nombre)
+        if not candado.acquire(blocking=False):
+            return {'estado': 'rezagada', 'previo': b'', 'resto': datos, 'offset': None,
+                    'error': None, 'ya_escrito': b''}
+        try:
+            with self._lock:
+                previo = self._adelantados.pop((i, nombre), b'')
+            if not datos.startswith(previo):
+                previo = b''
+            resultado = {'estado': 'escrito', 'previo': previo, 'resto': datos[len(previo):],
+                         'offset': None, 'error': None}
+            if self._rezagada(i):
+                resultado['estado'] = 'rezagada'
+            elif resultado['resto']:
+                try:
+                    with tramo('replica.anexar', replica=self.etiquetas[i], bytes=len(resultado['resto'])):
+                        resultado['offset'] = (self.replicas[i].anexar(nombre, resultado['resto'], cabecera)
+                                               - len(previo))
+                except Exception as e:
+                    resultado['estado'], resultado['error'] = 'fallido', e
+            resultado['ya_escrito'] = previo + (resultado['resto'] if resultado['estado'] == 'escrito' else b'')
+            if resultado['ya_escrito']:
+                with self._lock:
+                    self._adelantados[(i, nombre)] = resultado['ya_escrito']
+        finally:
+            candado.release()
+        return resultado
+
+    def _resolver(self, i, nombre, cabecera, resultado, exito):
+        """Cierra la escritura en la réplica `i` una vez que se sabe si hubo quórum"""
+        if not exito:
+            # Lo escrito queda en `_adelantados` para que el reintento no lo repita
+            return
+        with self._lock:
+            if resultado['ya_escrito'] and self._adelantados.get((i, nombre)) is resultado['ya_escrito']:
+                del self._adelantados[(i, nombre)]
+        if resultado['estado'] != 'escrito' and resultado['resto']:
+            self._reparaciones[i].agregar(nombre, {
+                'datos': resultado['resto'].decode('utf-8'),
+                'cabecera': cabecera.decode('utf-8') if cabecera else None,
+            })
+
+    def anexar(self, nombre, datos, cabecera=None):
+        total = len(self.replicas)
+        futuros = {self._ejecutor.submit(self._escribir_replica, i, nombre, datos, cabecera): i
+                   for i in range(total)}
+        resultados, pendientes = {}, set(futuros)
+        escritos = 0
+        limite = time.monotonic() + self.espera
+        # Se espera hasta tener el quórum, hasta que ya no sea posible alcanzarlo o hasta el límite
+        while pendientes and escritos < self.quorum and len(resultados) - escritos <= total - self.quorum:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            listos, pendientes = wait(pendientes, timeout=restante, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                resultado = resultados[futuros[futuro]] = futuro.result()
+                escritos += resultado['estado'] == 'escrito'
+        exito = escritos >= self.quorum
+        for i, resultado in resultados.items():
+            self._resolver(i, nombre, cabecera, resultado, exito)
+        # Las réplicas que siguen escribiendo reciben el bloque completo por su diario de
+        # reparación, que va en orden y descarta lo que esta escritura alcance a anexar
+        for futuro in pendientes:
+            if exito:
+                self._resolver(futuros[futuro], nombre, cabecera,
+                               {'estado': 'rezagada', 'resto': datos, 'ya_escrito': None}, exito)
+        if not exito:
+            fallas = '; '.join(f"{self.etiquetas[i]}: {resultado['error'] or resultado['estado']}"
+                               for i, resultado in sorted(resultados.items()) if resultado['estado'] != 'escrito')
+            en_curso = f", {len(pendientes)} aún escribiendo" if pendientes else ""
+            raise ErrorQuorum(f"{escritos} de {total} réplicas confirmaron {nombre} "
+                              f"(quórum {self.quorum}{en_curso}): {fallas}")
+        offsets = [resultados[i]['offset'] for i in sorted(resultados) if resultados[i]['offset'] is not None]
+        return offsets[0] if offsets else None
+
+    @contextmanager
+    def sesion(self):
+        # Primero las réplicas sin reparaciones pendientes, en el orden configurado
+        ultimo_error = None
+        for i in sorted(range(len(self.replicas)), key=self._rezagada):
+            pila = ExitStack()
+            try:
+                sesion = pila.enter_context(self.replicas[i].sesion())
+            except Exception as e:
+                ultimo_error = e
+                continue
+            with pila:
+                sesion.origen = self.etiquetas[i]
+                yield sesion
+            return
+        raise ultimo_error
+
+    def estado_replicas(self):
+        """Reparaciones pendientes y último error de cada réplica"""
+        estados = []
+        for etiqueta, reparacion in zip(self.etiquetas, self._reparaciones):
+            estado = reparacion.estado()
+            estados.append({'replica': etiqueta, 'pendientes': estado['pendientes'],
+                            'ultimo_error': estado['ultimo_error']})
+        return estados
+
+
+_almacenes = {}
+_almacenes_lock = threading.Lock()
+
+
+def _clave_almacen(config):
+    tipo = config.get('storage_backend', 'ssh')
+    if tipo == 'local':
+        clave = (tipo, str(Path(config['storage_dir']).resolve()))
+    else:
+        clave = (tipo, config['remote_host'], int(config['remote_port']), config['remote_user'], config['remote_dir'])
+    segmentos = config.get('storage_segments')
+    tam_segmento = int(config.get('storage_segment_mb', TAM_SEGMENTO_MB) * (1 << 20))
+    comprimir = bool(config.get('storage_compress', False))
+    return clave + (segmentos, tam_segmento, comprimir)
+
+
+def _almacen_unico(config):
+    clave = _clave_almacen(config)
+    with _almacenes_lock:
+        almacen = _almacenes.get(clave)
+        if almacen is None:
+            segmentos, tam_segmento, comprimir = clave[-3:]
+            almacen = AlmacenLocal(config['storage_dir']) if clave[0] == 'local' else AlmacenSSH(config)
+            if segmentos:
+                almacen = AlmacenSegmentado(almacen, segmentos, tam_segmento, comprimir)
+            _almacenes[clave] = almacen
+        return almacen
+
+
+def obtener_almacen(config):
+    """Devuelve el almacén del proceso según `storage_backend` (ssh por defecto o local).
+
+    Con `storage_segments` ("anio" o "tamano") los archivos se reparten en
+    segmentos de hasta `storage_segment_mb` MB y, con `storage_compress`,
+    los segmentos cerrados se guardan comprimidos con gzip.
+
+    Con tablas [[replicas]] cada escritura va también a las réplicas (ver
+    AlmacenReplicado); `replica_quorum` fija cuántas deben confirmarla, la
+    mayoría por defecto. Cada réplica hereda las claves que no define.
+    """
+    if not config.get('replicas'):
+        return _almacen_unico(config)
+    configuraciones = [config] + [ChainMap(dict(replica), config) for replica in config['replicas']]
+    claves = [_clave_almacen(configuracion) for configuracion in configuraciones]
+    quorum = config.get('replica_quorum', len(claves) // 2 + 1)
+    clave = ('replicado', tuple(claves), quorum)
+    with _almacenes_lock:
+        almacen = _almacenes.get(clave)
+    if almacen is None:
+        replicas = [_almacen_unico(configuracion) for configuracion in configuraciones]
+        etiquetas = [f"{c[1] if c[0] == 'ssh' else 'local'}-{hashlib.sha1(repr(c).encode()).hexdigest()[:8]}"
+                     for c in claves]
+        reparacion = Path(config.get('journal_dir', '.gea_diario')) / 'replicas'
+        with _almacenes_lock:
+            almacen = _almacenes.get(clave)
+            if almacen is None:
+                almacen = _almacenes[clave] = AlmacenReplicado(replicas, etiquetas, quorum, reparacion)
+    return almacen
@@ -0,0 +1,134 @@
+import threading
+from collections import Counter
+
+from espejo import TIPOS
+
+SIN_INDEXACION = "Sin indexación"
+OTRA_INDEXACION = "Otra"
+
+# Variantes con que se captura la indexación -> categoría del tablero
+CATEGORIAS_INDEXACION = {
+    'SCI': 'SCI',
+    'SCIE': 'SCI',
+    'JCR': 'SCI',
+    'WOS': 'SCI',
+    'WEB OF SCIENCE': 'SCI',
+    'SCOPUS': 'SCOPUS',
+}
+
+
+def categorias_indexacion(registro):
+    """Categorías de indexación de un artículo, cada una una sola vez"""
+    valores = registro.get('campos', {}).get('indexacion') or []
+    if not valores:
+        return {SIN_INDEXACION}
+    return {CATEGORIAS_INDEXACION.get(' '.join(str(v).upper().split()), OTRA_INDEXACION) for v in valores}
+
+
+class _Agregados:
+    """Contadores de un tipo de registro"""
+
+    __slots__ = ('total', 'meses', 'anios', 'indexacion')
+
+    def __init__(self):
+        self.total = 0
+        self.meses = Counter()
+        self.anios = Counter()
+        self.indexacion = Counter()
+
+
+class Analitica:
+    """Agregados por mes de captura, año de publicación e indexación.
+
+    Se actualizan con los registros que el espejo local trae en cada
+    sincronización, sin volver a leer los archivos completos. Si el espejo
+    volvió a copiar un archivo desde cero, los contadores de ese tipo se
+    reconstruyen.
+    """
+
+    def __init__(self):
+        self._agregados = {tipo: _Agregados() for tipo in TIPOS}
+        self._posiciones = {}
+        self._lock = threading.RLock()
+
+    def agregar(self, registro):
+        tipo = registro.get('tipo')
+        with self._lock:
+            agregados = self._agregados.get(tipo)
+            if agregados is None:
+                return
+            agregados.total += 1
+            fecha = registro.get('fecha_registro') or ''
+            if len(fecha) >= 7:
+                agregados.meses[fecha[:7]] += 1
+            if registro.get('anio'):
+                agregados.anios[registro['anio']] += 1
+            if tipo == 'art':
+                agregados.indexacion.update(categorias_indexacion(registro))
+
+    def actualizar(self, espejo):
+        """Suma lo que el espejo local agregó desde la última llamada"""
+        with self._lock:
+            for tipo in TIPOS:
+                anterior = self._posiciones.get(tipo)
+                registros, posicion = espejo.nuevos(tipo, anterior)
+                if anterior is not None and anterior[0] != posicion[0]:
+                    self._agregados[tipo] = _Agregados()
+                for registro in registros:
+                    self.agregar(registro)
+                self._posiciones[tipo] = posicion
+
+    def _tabla(self, atributo, columna):
+        import pandas as pd
+
+        with self._lock:
+            filas = [
+                (tipo, clave, conteo)
+                for tipo, agregados in self._agregados.items()
+                for clave, conteo in getattr(agregados, atributo).items()
+            ]
+        return pd.DataFrame(filas, columns=['tipo', columna, 'Registros'])
+
+    def capturas_por_mes(self):
+        """Registros capturados por mes y tipo; los meses sin capturas aparecen en cero"""
+        import pandas as pd
+
+        tabla = self._tabla('meses', 'Mes')
+        if tabla.empty:
+            return tabla
+        tabla['Mes'] = pd.PeriodIndex(tabla['Mes'], freq='M')
+        meses = pd.period_range(tabla['Mes'].min(), tabla['Mes'].max(), freq='M')
+        completa = (tabla.pivot_table(index='Mes', columns='tipo', values='Registros', aggfunc='sum')
+                    .reindex(index=meses, columns=list(TIPOS), fill_value=0)
+                    .fillna(0).astype(int))
+        completa.index = completa.index.to_timestamp()
+        completa.index.name = 'Mes'
+        return completa.reset_index().melt(id_vars='Mes', var_name='tipo', value_name='Registros')
+
+    def publicaciones_por_anio(self):
+        """Registros por año de publicación y tipo"""
+        return self._tabla('anios', 'Año').sort_values(['Año', 'tipo'], ignore_index=True)
+
+    def por_indexacion(self):
+        """Artículos por categoría de indexación (un artículo puede contar en varias)"""
+        tabla = self._tabla('indexacion', 'Indexación')
+        return tabla.drop(columns='tipo').sort_values('Registros', ascending=False, ignore_index=True)
+
+    def totales(self):
+        with self._lock:
+            return {tipo: agregados.total for tipo, agregados in self._agregados.items()}
+
+
+_analiticas = {}
+_analiticas_lock = threading.Lock()
+
+
+def obtener_analitica(espejo):
+    """Devuelve los agregados del proceso asociados a un espejo local"""
+    clave = str(espejo.directorio)
+    with _analiticas_lock:
+        analitica = _analiticas.get(clave)
+        if analitica is None:
+            analitica = Analitica()
+            _analiticas[clave] = analitica
+        return analitica
@@ -0,0 +1,166 @@
+"""Tiempo de arranque en frío de captura_gea5.py y pagina_gea.py.
+
+Cada medición corre en un intérprete nuevo, así que no hay módulos ya
+importados ni cachés de Streamlit calientes. Por script se reporta:
+
+- importacion_ms: `import <script>` con Streamlit ya cargado, como lo paga el
+  servidor la primera vez que ejecuta el script; desglosado por paquete a
+  partir de `python -X importtime`
+- primera_ejecucion_ms: la primera ejecución completa con AppTest, hasta la
+  pantalla de contraseña en la captura y la página completa en la pública
+- autenticada_ms (solo captura): la ejecución que sigue a escribir la
+  contraseña y pulsar Acceder, que dibuja por primera vez el formulario y la
+  barra lateral con todo lo que importan
+
+Usa el almacén local (storage_backend = "local"), así que no requiere
+servidor SSH ni SMTP:
+
+    python benchmarks/arranque.py --repeticiones 5
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+DIRECTORIO_RESULTADOS = Path(__file__).resolve().parent / 'resultados'
+SCRIPTS = ('captura_gea5', 'pagina_gea')
+PAQUETES_MOSTRADOS = 8    # Paquetes más costosos listados en el desglose
+
+
+def _config(directorio):
+    """Configuración mínima con almacén local; el SMTP no se contacta antes de capturar"""
+    return {
+        'storage_backend': 'local', 'storage_dir': str(Path(directorio) / 'almacen'),
+        'mirror_dir': str(Path(directorio) / 'espejo'), 'journal_dir': str(Path(directorio) / 'diario'),
+        'remote_password': 'gea-arranque', 'remote_file_art': 'articulos.txt',
+        'remote_file_tes': 'tesis.txt', 'remote_file_con': 'congresos.txt',
+        'remote_file_fin': 'financiamiento.txt', 'smtp_server': 'localhost', 'smtp_port': 25,
+        'email_user': 'gea', 'email_password': 'gea', 'notification_email': 'gea@localhost',
+    }
+
+
+def desglose_importtime(salida):
+    """Milisegundos propios por paquete de primer nivel a partir de la salida de -X importtime"""
+    por_paquete = defaultdict(float)
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, _, nombre = linea[len('import time:'):].split('|')
+        por_paquete[nombre.strip().split('.')[0]] += int(propio) / 1000
+    return dict(por_paquete)
+
+
+def medir_importacion(script):
+    """(ms de importar el script, desglose por paquete) con Streamlit ya importado"""
+    codigo = f"import streamlit, sys; sys.stderr.write('---\\n'); import {script}"
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], cwd=RAIZ,
+                             capture_output=True, text=True, check=True)
+    posteriores = proceso.stderr.split('---\n', 1)[1]
+    desglose = desglose_importtime(posteriores)
+    return sum(desglose.values()), desglose
+
+
+def medir_primera_ejecucion(script, directorio):
+    """Milisegundos de la primera ejecución de AppTest del script en un proceso nuevo"""
+    entorno = dict(os.environ, GEA_ARRANQUE_CONFIG=json.dumps(_config(directorio)))
+    proceso = subprocess.run([sys.executable, __file__, '--hijo', script], cwd=RAIZ, env=entorno,
+                             capture_output=True, text=True, check=True)
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def _hijo(script):
+    """Se ejecuta en el proceso nuevo: importa AppTest y mide solo la ejecución del script"""
+    import logging
+    logging.disable(logging.WARNING)
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(RAIZ / f"{script}.py"), default_timeout=120)
+    for clave, valor in json.loads(os.environ['GEA_ARRANQUE_CONFIG']).items():
+        app.secrets[clave] = valor
+    inicio = time.perf_counter()
+    app.run()
+    medicion = {'ms': round((time.perf_counter() - inicio) * 1000, 1)}
+    if script == 'captura_gea5':
+        app.text_input[0].input(app.secrets['remote_password'])
+        app.button[0].click()
+        inicio = time.perf_counter()
+        app.run()
+        medicion['autenticada_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+    medicion['errores'] = len(app.exception) + len(app.error)
+    print(json.dumps(medicion))
+
+
+def correr(repeticiones):
+    resultados = {}
+    for script in SCRIPTS:
+        importaciones, ejecuciones, autenticadas, errores = [], [], [], 0
+        desgloses = defaultdict(list)
+        for _ in range(repeticiones):
+            total, desglose = medir_importacion(script)
+            importaciones.append(total)
+            for paquete, ms in desglose.items():
+                desgloses[paquete].append(ms)
+            with tempfile.TemporaryDirectory(prefix='gea_arranque_') as directorio:
+                medicion = medir_primera_ejecucion(script, directorio)
+            ejecuciones.append(medicion['ms'])
+            if 'autenticada_ms' in medicion:
+                autenticadas.append(medicion['autenticada_ms'])
+            errores += medicion['errores']
+        paquetes = sorted(((paquete, statistics.median(valores + [0] * (repeticiones - len(valores))))
+                           for paquete, valores in desgloses.items()), key=lambda par: -par[1])
+        resultados[script] = {
+            'importacion_ms': round(statistics.median(importaciones), 1),
+            'primera_ejecucion_ms': round(statistics.median(ejecuciones), 1),
+            'primera_ejecucion_max_ms': round(max(ejecuciones), 1),
+            'autenticada_ms': round(statistics.median(autenticadas), 1) if autenticadas else None,
+            'errores': errores,
+            'paquetes_ms': {paquete: round(ms, 1) for paquete, ms in paquetes[:PAQUETES_MOSTRADOS]},
+        }
+        autenticada = f" autenticada={resultados[script]['autenticada_ms']:>7.1f}ms" if autenticadas else ""
+        print(f"{script:13} importación={resultados[script]['importacion_ms']:>7.1f}ms "
+              f"primera ejecución={resultados[script]['primera_ejecucion_ms']:>7.1f}ms{autenticada} errores={errores}")
+        print("              " + "  ".join(f"{p}={ms:.1f}" for p, ms in resultados[script]['paquetes_ms'].items()),
+              flush=True)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de arranque en frío de las aplicaciones GEA")
+    parser.add_argument('--repeticiones', type=int, default=5,
+                        help="Procesos nuevos por script (se reporta la mediana)")
+    parser.add_argument('--salida', type=Path,
+                        help="Archivo JSON de resultados (por defecto en benchmarks/resultados/)")
+    parser.add_argument('--hijo', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        _hijo(args.hijo)
+        return
+
+    inicio = datetime.now()
+    salida = {
+        'fecha': inicio.isoformat(timespec='seconds'),
+        'commit': subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                                 capture_output=True, text=True).stdout.strip() or None,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'repeticiones': args.repeticiones,
+        'resultados': correr(args.repeticiones),
+    }
+    ruta_salida = args.salida or DIRECTORIO_RESULTADOS / f"arranque-{inicio:%Y%m%d-%H%M%S}.json"
+    ruta_salida.parent.mkdir(parents=True, exist_ok=True)
+    ruta_salida.write_text(json.dumps(salida, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"Resultados en {ruta_salida}")
+
+
+if __name__ == "__main__":
+    main()
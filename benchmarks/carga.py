@@ -0,0 +1,491 @@
+"""Prueba de carga con sesiones simultáneas contra un servidor Streamlit real.
+
+A diferencia de rendimiento.py, que ejecuta cada sesión con AppTest en su propio
+proceso, aquí cada aplicación corre en un solo servidor `streamlit run` (un
+worker, como en el despliegue) y todas las sesiones comparten sus pools SSH,
+el diario, el notificador y st.cache_data. Cada usuario virtual habla el mismo
+protocolo que el navegador (BackMsg/ForwardMsg sobre el websocket
+/_stcore/stream) y repite un ciclo:
+
+- acceso: abre captura_gea5.py y entra por `autenticar` (contraseña + Acceder)
+- captura: guarda artículos nuevos con el formulario de `formulario_simplificado`
+- pagina: abre pagina_gea.py en una sesión nueva y espera a que termine de dibujarse
+
+Los servidores SSH/SFTP y SMTP son los de servidores_locales.py; se les puede
+poner un tope de conexiones SSH y un límite de correos por minuto para ver en
+qué punto empiezan a fallar. El número de sesiones sube por niveles y en cada
+uno se mide durante `--duracion` segundos:
+
+- operaciones por segundo y tasa de error, total y por paso
+- latencias p50/p95 por paso
+- tiempo hasta que el servidor remoto recibió todas las capturas confirmadas
+  y correos entregados o rechazados por el sumidero
+
+El punto de saturación es el primer nivel con tasa de error o p95 por encima
+del umbral, con capturas que no llegaron al servidor remoto o correos
+rechazados, o cuyo
+rendimiento no crece al menos `--ganancia-minima` respecto al mejor nivel
+anterior; la capacidad es ese mejor nivel. Los resultados se guardan en JSON:
+
+    python benchmarks/carga.py --sesiones 1,2,4,8,16,32 --duracion 30
+    python benchmarks/carga.py --correos-por-minuto 60 --max-conexiones-ssh 4
+    python benchmarks/carga.py --ajuste remote_max_canales=16 --ajuste notification_digest_seconds=5
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import toml
+import websockets
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from rendimiento import (DIRECTORIO_RESULTADOS, RAIZ, TIEMPO_LIMITE, _commit_actual, _enteros,
+                         percentil, sembrar, texto_registro)
+from servidores_locales import ServidorSSHLocal, SumideroSMTP
+
+PASOS = ('acceso', 'captura', 'pagina')
+ESPERA_ARRANQUE = 60      # Segundos máximos para que `streamlit run` responda
+ESPERA_ENTREGAS = 120     # Segundos máximos para que el diario vacíe lo capturado en un nivel
+
+
+class ErrorPaso(Exception):
+    """Un paso del usuario virtual terminó sin el resultado esperado"""
+
+
+class ServidorStreamlit:
+    """`streamlit run` de una aplicación en un puerto libre, sin navegador ni recarga"""
+
+    def __init__(self, script, secretos, bitacora):
+        self.script = script
+        self.secretos = secretos
+        self.bitacora = bitacora
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.port = s.getsockname()[1]
+        self._proceso = None
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.port}/_stcore/stream"
+
+    def iniciar(self):
+        self._salida = open(self.bitacora, 'wb')
+        self._proceso = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', self.script,
+             '--server.headless', 'true', '--server.address', '127.0.0.1', '--server.port', str(self.port),
+             '--server.fileWatcherType', 'none', '--server.runOnSave', 'false',
+             '--browser.gatherUsageStats', 'false', '--secrets.files', str(self.secretos)],
+            cwd=RAIZ, stdout=self._salida, stderr=subprocess.STDOUT)
+        limite = time.monotonic() + ESPERA_ARRANQUE
+        while time.monotonic() < limite:
+            if self._proceso.poll() is not None:
+                raise RuntimeError(f"{self.script} terminó al arrancar; ver {self.bitacora}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1):
+                    return self
+            except OSError:
+                time.sleep(0.2)
+        self.detener()
+        raise RuntimeError(f"{self.script} no respondió en {ESPERA_ARRANQUE} s; ver {self.bitacora}")
+
+    def detener(self):
+        if self._proceso is not None:
+            self._proceso.terminate()
+            try:
+                self._proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._proceso.kill()
+        self._salida.close()
+
+
+class Pantalla:
+    """Elementos que dibujó una ejecución del script: (tipo, id, texto, formato)"""
+
+    def __init__(self):
+        self.elementos = []
+
+    def agregar(self, elemento):
+        tipo = elemento.WhichOneof('type')
+        contenido = getattr(elemento, tipo)
+        texto = (getattr(contenido, 'label', '') or getattr(contenido, 'body', '')
+                 or getattr(contenido, 'message', '') or getattr(contenido, 'type', ''))
+        self.elementos.append((tipo, getattr(contenido, 'id', None), texto, getattr(contenido, 'format', None)))
+
+    def widget(self, tipo, texto):
+        for tipo_elemento, id_widget, etiqueta, _ in self.elementos:
+            if tipo_elemento == tipo and texto in etiqueta:
+                return id_widget
+        raise ErrorPaso(f"no apareció {tipo} '{texto}'")
+
+    def alertas(self, formato):
+        return [texto for tipo, _, texto, fmt in self.elementos if tipo == 'alert' and fmt == formato]
+
+    def errores(self):
+        excepciones = [texto for tipo, _, texto, _ in self.elementos if tipo == 'exception']
+        return excepciones + self.alertas(Alert.ERROR)
+
+    def comprobar(self):
+        """La misma pantalla, o ErrorPaso con el primer error o excepción que mostró"""
+        errores = self.errores()
+        if errores:
+            raise ErrorPaso(errores[0])
+        return self
+
+
+class Navegador:
+    """Una pestaña: una sesión de Streamlit sobre su websocket"""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+
+    @classmethod
+    async def abrir(cls, url):
+        # Sin pings del cliente: con el servidor saturado cerrarían la conexión por su cuenta
+        return cls(await websockets.connect(url, subprotocols=['streamlit'], max_size=None,
+                                            ping_interval=None, open_timeout=TIEMPO_LIMITE))
+
+    async def ejecutar(self, widgets=()):
+        """Pide una ejecución con esos valores de widgets y devuelve lo que dibujó la última.
+
+        Un st.rerun() termina la ejecución antes de tiempo y encadena otra; se
+        espera a la que termina normalmente.
+        """
+        mensaje = BackMsg()
+        mensaje.rerun_script.query_string = ''
+        mensaje.rerun_script.widget_states.widgets.extend(widgets)
+        await self.websocket.send(mensaje.SerializeToString())
+        pantalla = Pantalla()
+        while True:
+            recibido = ForwardMsg()
+            recibido.ParseFromString(await self.websocket.recv())
+            tipo = recibido.WhichOneof('type')
+            if tipo == 'new_session':
+                pantalla = Pantalla()
+            elif tipo == 'delta' and recibido.delta.WhichOneof('type') == 'new_element':
+                pantalla.agregar(recibido.delta.new_element)
+            elif tipo == 'script_finished':
+                if recibido.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise ErrorPaso("error de compilación del script")
+                if recibido.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return pantalla
+
+    async def cerrar(self):
+        await self.websocket.close()
+
+
+def texto(id_widget, valor):
+    return WidgetState(id=id_widget, string_value=valor)
+
+
+def clic(id_widget):
+    return WidgetState(id=id_widget, trigger_value=True)
+
+
+async def acceder(url, password):
+    navegador = await Navegador.abrir(url)
+    try:
+        pantalla = await navegador.ejecutar()
+        pantalla = await navegador.ejecutar([
+            texto(pantalla.widget('text_input', 'contraseña'), password),
+            clic(pantalla.widget('button', 'Acceder')),
+        ])
+        pantalla.comprobar().widget('text_area', 'referencia')
+    except BaseException:
+        await navegador.cerrar()
+        raise
+    return navegador, pantalla
+
+
+async def capturar(navegador, pantalla, referencia):
+    pantalla = await navegador.ejecutar([
+        texto(pantalla.widget('text_area', 'referencia'), referencia),
+        clic(pantalla.widget('button', 'Guardar')),
+    ])
+    pantalla.comprobar()
+    if not any('guardado' in s for s in pantalla.alertas(Alert.SUCCESS)):
+        avisos = pantalla.alertas(Alert.WARNING)
+        raise ErrorPaso(avisos[0] if avisos else "sin confirmación de guardado")
+    return pantalla
+
+
+async def ver_pagina(url):
+    navegador = await Navegador.abrir(url)
+    try:
+        return (await navegador.ejecutar()).comprobar()
+    finally:
+        await navegador.cerrar()
+
+
+async def _medir(pasos, nombre, corrutina):
+    """Ejecuta un paso con tiempo límite; anota (paso, fin, latencia, error) y devuelve su resultado"""
+    inicio = time.perf_counter()
+    error, resultado = None, None
+    try:
+        resultado = await asyncio.wait_for(corrutina, TIEMPO_LIMITE)
+    except ErrorPaso as e:
+        error = str(e)
+    except asyncio.TimeoutError:
+        error = f"sin respuesta en {TIEMPO_LIMITE} s"
+    except (OSError, websockets.WebSocketException) as e:
+        error = f"conexión: {type(e).__name__}"
+    pasos.append((nombre, time.monotonic(), time.perf_counter() - inicio, error and error[:120]))
+    return None if error else resultado
+
+
+async def usuario(numero, urls, password, fin, capturas, pausa, pasos):
+    """Repite acceso -> capturas -> página hasta `fin` (reloj monotónico); al menos un ciclo"""
+    ciclo = 0
+    while True:
+        acceso = await _medir(pasos, 'acceso', acceder(urls['captura'], password))
+        if acceso is not None:
+            navegador, pantalla = acceso
+            try:
+                for i in range(capturas):
+                    await asyncio.sleep(pausa)
+                    referencia = texto_registro('art', ciclo * capturas + i, prefijo=f"Carga {numero}")
+                    resultado = await _medir(pasos, 'captura', capturar(navegador, pantalla, referencia))
+                    if resultado is None:
+                        break
+                    pantalla = resultado
+            finally:
+                try:
+                    await navegador.cerrar()
+                except (OSError, websockets.WebSocketException):
+                    pass
+        await asyncio.sleep(pausa)
+        await _medir(pasos, 'pagina', ver_pagina(urls['pagina']))
+        ciclo += 1
+        if time.monotonic() >= fin:
+            return
+
+
+def _resumen(pasos, inicio, fin):
+    """Operaciones por segundo, tasa de error y latencias de un grupo de pasos"""
+    duracion = max(fin - inicio, 1e-9)
+    latencias = [latencia for _, _, latencia, error in pasos if error is None]
+    errores = [error for _, _, _, error in pasos if error is not None]
+    return {
+        'muestras': len(pasos),
+        'errores': len(errores),
+        'tasa_error': round(len(errores) / len(pasos), 4) if pasos else 0,
+        'por_segundo': round(len(latencias) / duracion, 2),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 1) if latencias else None,
+        'p95_ms': round(percentil(latencias, 95) * 1000, 1) if latencias else None,
+        'max_ms': round(max(latencias) * 1000, 1) if latencias else None,
+        'motivos': dict(Counter(errores).most_common(5)),
+    }
+
+
+def _lineas_remotas(raiz):
+    total = 0
+    for archivo in Path(raiz).glob('*.jsonl'):
+        with open(archivo, 'rb') as f:
+            total += sum(1 for _ in f)
+    return total
+
+
+def esperar_entregas(raiz, esperadas, smtp):
+    """Segundos hasta que el servidor remoto tiene `esperadas` líneas (None si no llegan)
+    y espera a que el sumidero SMTP deje de recibir"""
+    inicio = time.monotonic()
+    vaciado = None
+    while time.monotonic() - inicio < ESPERA_ENTREGAS:
+        if _lineas_remotas(raiz) >= esperadas:
+            vaciado = round(time.monotonic() - inicio, 2)
+            break
+        time.sleep(0.1)
+    atendidos, quieto = None, time.monotonic()
+    while time.monotonic() - quieto < 1 and time.monotonic() - inicio < ESPERA_ENTREGAS:
+        actuales = len(smtp.mensajes) + smtp.rechazados
+        if actuales != atendidos:
+            atendidos, quieto = actuales, time.monotonic()
+        time.sleep(0.1)
+    return vaciado
+
+
+def ejecutar_nivel(sesiones, urls, password, duracion, capturas, pausa):
+    """`sesiones` usuarios virtuales a la vez durante `duracion` segundos"""
+    pasos = []
+
+    async def nivel():
+        fin = time.monotonic() + duracion
+        await asyncio.gather(*(usuario(n, urls, password, fin, capturas, pausa, pasos)
+                               for n in range(sesiones)))
+
+    inicio = time.monotonic()
+    asyncio.run(nivel())
+    fin = max([momento for _, momento, _, _ in pasos] or [time.monotonic()])
+    resultado = {'sesiones': sesiones, 'duracion_s': round(fin - inicio, 2)}
+    resultado.update(_resumen(pasos, inicio, fin))
+    resultado['pasos'] = {paso: _resumen([p for p in pasos if p[0] == paso], inicio, fin) for paso in PASOS}
+    return resultado
+
+
+def punto_de_saturacion(niveles, ganancia_minima, tasa_error_maxima, p95_maximo_ms):
+    """Primer nivel que deja de escalar y el mejor nivel anterior (capacidad)"""
+    mejor = None
+    for nivel in niveles:
+        motivo = None
+        if nivel['tasa_error'] > tasa_error_maxima:
+            motivo = f"tasa de error {nivel['tasa_error']:.1%}"
+        elif p95_maximo_ms and (nivel['p95_ms'] or 0) > p95_maximo_ms:
+            motivo = f"p95 de {nivel['p95_ms']:.0f} ms"
+        elif nivel['vaciado_diario_s'] is None:
+            motivo = "el servidor remoto no recibió todas las capturas confirmadas"
+        elif nivel['correos_rechazados']:
+            motivo = f"el servidor SMTP rechazó {nivel['correos_rechazados']} correos"
+        elif mejor is not None and nivel['por_segundo'] < mejor['por_segundo'] * (1 + ganancia_minima):
+            ganancia = nivel['por_segundo'] / mejor['por_segundo'] - 1 if mejor['por_segundo'] else 0
+            motivo = f"rendimiento {ganancia:+.0%} respecto a {mejor['sesiones']} sesiones"
+        if motivo:
+            return {
+                'sesiones': nivel['sesiones'],
+                'motivo': motivo,
+                'capacidad_sesiones': mejor['sesiones'] if mejor else None,
+                'capacidad_por_segundo': mejor['por_segundo'] if mejor else None,
+            }
+        mejor = nivel
+    return None
+
+
+def _ajuste(texto):
+    """'clave=16' -> ('clave', 16); los valores JSON (números, true/false) se convierten"""
+    clave, _, valor = texto.partition('=')
+    if not clave.strip() or not valor.strip():
+        raise argparse.ArgumentTypeError(f"use clave=valor: {texto}")
+    try:
+        return clave.strip(), json.loads(valor)
+    except json.JSONDecodeError:
+        return clave.strip(), valor.strip()
+
+
+def correr(args):
+    ssh_raiz = tempfile.mkdtemp(prefix='gea_ssh_')
+    temporal = Path(tempfile.mkdtemp(prefix='gea_carga_'))
+    servidor = ServidorSSHLocal(ssh_raiz, max_conexiones=args.max_conexiones_ssh).iniciar()
+    smtp = SumideroSMTP(correos_por_minuto=args.correos_por_minuto).iniciar()
+    config = servidor.config()
+    config.update(smtp.config())
+    config.update(
+        remote_file_art='articulos.txt', remote_file_tes='tesis.txt',
+        remote_file_con='congresos.txt', remote_file_fin='financiamiento.txt',
+        journal_dir=str(temporal / 'diario'), mirror_dir=str(temporal / 'espejo'),
+    )
+    config.update(dict(args.ajuste))
+    sembrar(ssh_raiz, config, args.registros)
+    secretos = temporal / 'secrets.toml'
+    secretos.write_text(toml.dumps(config), encoding='utf-8')
+
+    aplicaciones = {
+        'captura': ServidorStreamlit('captura_gea5.py', secretos, temporal / 'captura.log'),
+        'pagina': ServidorStreamlit('pagina_gea.py', secretos, temporal / 'pagina.log'),
+    }
+    niveles, saturacion = [], None
+    try:
+        for aplicacion in aplicaciones.values():
+            aplicacion.iniciar()
+        urls = {nombre: aplicacion.url for nombre, aplicacion in aplicaciones.items()}
+        # Un ciclo sin medir: importaciones, espejo y cachés ya calientes como en producción
+        calentamiento = ejecutar_nivel(1, urls, config['remote_password'], 0, 1, 0)
+        if calentamiento['errores']:
+            raise RuntimeError(f"El ciclo de calentamiento falló: {calentamiento['motivos']}; "
+                               f"ver las bitácoras en {temporal}")
+        esperar_entregas(ssh_raiz, args.registros + 1, smtp)
+        for sesiones in args.sesiones:
+            lineas, correos, rechazados = _lineas_remotas(ssh_raiz), len(smtp.mensajes), smtp.rechazados
+            conexiones, rechazadas = servidor.conexiones, servidor.rechazadas
+            nivel = ejecutar_nivel(sesiones, urls, config['remote_password'], args.duracion,
+                                   args.capturas, args.pausa)
+            confirmadas = nivel['pasos']['captura']['muestras'] - nivel['pasos']['captura']['errores']
+            nivel['vaciado_diario_s'] = esperar_entregas(ssh_raiz, lineas + confirmadas, smtp)
+            nivel['registros_remotos'] = _lineas_remotas(ssh_raiz) - lineas
+            nivel['correos_entregados'] = len(smtp.mensajes) - correos
+            nivel['correos_rechazados'] = smtp.rechazados - rechazados
+            nivel['conexiones_ssh'] = servidor.conexiones - conexiones
+            nivel['conexiones_ssh_rechazadas'] = servidor.rechazadas - rechazadas
+            niveles.append(nivel)
+            pasos = nivel['pasos']
+            vaciado = 'incompleto' if nivel['vaciado_diario_s'] is None else f"{nivel['vaciado_diario_s']}s"
+            print(f"sesiones={sesiones:<4} {nivel['por_segundo']:>7.2f} op/s errores={nivel['tasa_error']:>6.1%} "
+                  + " ".join(f"{paso}: p50={pasos[paso]['p50_ms'] or 0:.0f} p95={pasos[paso]['p95_ms'] or 0:.0f}ms"
+                             for paso in PASOS)
+                  + f" vaciado={vaciado} correos={nivel['correos_entregados']}"
+                  + f"/{nivel['correos_rechazados']} rechazados", flush=True)
+            saturacion = punto_de_saturacion(niveles, args.ganancia_minima, args.tasa_error_maxima,
+                                             args.p95_maximo_ms)
+            if saturacion is not None and not args.todos:
+                break
+    finally:
+        for aplicacion in aplicaciones.values():
+            aplicacion.detener()
+        servidor.detener()
+        smtp.detener()
+    return niveles, saturacion, temporal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de las aplicaciones GEA con sesiones simultáneas")
+    parser.add_argument('--sesiones', type=_enteros, default=[1, 2, 4, 8, 16, 32],
+                        help="Niveles de sesiones simultáneas, separados por coma")
+    parser.add_argument('--duracion', type=float, default=30, help="Segundos de carga por nivel")
+    parser.add_argument('--capturas', type=int, default=3, help="Capturas por acceso de cada usuario virtual")
+    parser.add_argument('--pausa', type=float, default=0,
+                        help="Segundos de espera del usuario entre pasos (0 = carga máxima)")
+    parser.add_argument('--registros', type=int, default=1000, help="Registros sembrados en el servidor")
+    parser.add_argument('--max-conexiones-ssh', type=int,
+                        help="Conexiones SSH simultáneas que admite el servidor local")
+    parser.add_argument('--correos-por-minuto', type=int,
+                        help="Correos por minuto que admite el sumidero SMTP antes de responder 451")
+    parser.add_argument('--ajuste', type=_ajuste, action='append', default=[], metavar='CLAVE=VALOR',
+                        help="Clave de configuración de las aplicaciones (p. ej. remote_max_canales=16)")
+    parser.add_argument('--ganancia-minima', type=float, default=0.1,
+                        help="Crecimiento mínimo de op/s respecto al mejor nivel para no considerarlo saturado")
+    parser.add_argument('--tasa-error-maxima', type=float, default=0.01)
+    parser.add_argument('--p95-maximo-ms', type=float, default=5000)
+    parser.add_argument('--todos', action='store_true', help="Sigue con los niveles restantes tras la saturación")
+    parser.add_argument('--salida', type=Path,
+                        help="Archivo JSON de resultados (por defecto en benchmarks/resultados/)")
+    args = parser.parse_args()
+
+    inicio = datetime.now()
+    niveles, saturacion, bitacoras = correr(args)
+    if saturacion is None:
+        print("Sin saturación en los niveles probados")
+    else:
+        capacidad = (f"{saturacion['capacidad_sesiones']} sesiones, {saturacion['capacidad_por_segundo']} op/s"
+                     if saturacion['capacidad_sesiones'] else "ninguno")
+        print(f"Saturación con {saturacion['sesiones']} sesiones ({saturacion['motivo']}); "
+              f"último nivel sano: {capacidad}")
+    salida = {
+        'fecha': inicio.isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parametros': {clave: valor for clave, valor in vars(args).items() if clave != 'salida'},
+        'saturacion': saturacion,
+        'niveles': niveles,
+        'bitacoras': str(bitacoras),
+    }
+    ruta_salida = args.salida or DIRECTORIO_RESULTADOS / f"carga-{inicio:%Y%m%d-%H%M%S}.json"
+    ruta_salida.parent.mkdir(parents=True, exist_ok=True)
+    ruta_salida.write_text(json.dumps(salida, indent=2, ensure_ascii=False, default=str), encoding='utf-8')
+    print(f"Resultados en {ruta_salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""Pruebas de rendimiento de captura_gea5.py y pagina_gea.py.
+
+Levanta un servidor SSH/SFTP y un sumidero SMTP locales (servidores_locales.py),
+siembra los archivos remotos con N registros y ejecuta ambas aplicaciones sin
+navegador con AppTest. La configuración se inyecta como st.secrets, que es lo
+que lee cargar_configuracion().
+
+Mide la latencia de main() en dos rutas:
+- captura: una sesión autenticada que guarda un registro nuevo por ejecución
+- pagina: una sesión nueva que dibuja la página completa con estadísticas
+
+Los resultados (p50/p95/p99 por ruta, número de registros y concurrencia) se
+guardan en JSON para comparar corridas:
+
+    python benchmarks/rendimiento.py --registros 0,1000,10000 --concurrencia 1,4
+    python benchmarks/rendimiento.py --comparar benchmarks/resultados/anterior.json
+    python benchmarks/rendimiento.py --almacen local   # sin servidor SSH
+    python benchmarks/rendimiento.py --replicas 2 --retraso-replica 0.05
+
+Notas:
+- AppTest no admite ejecuciones simultáneas en un mismo proceso, así que cada
+  sesión concurrente corre en su propio proceso. Comparten el servidor remoto y
+  el disco, pero no las cachés, pools ni el diario que en producción comparten
+  las sesiones de un mismo servidor Streamlit; carga.py mide ese caso.
+- AppTest crea un almacenamiento de st.cache_data nuevo en cada ejecución, así
+  que lo cacheado por la página no se reutiliza entre mediciones; las cifras de
+  la ruta de la página son una cota superior.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from streamlit.testing.v1 import AppTest
+
+from registros import crear_registro, serializar
+from servidores_locales import ServidorSSHLocal, SumideroSMTP
+
+TIPOS = ("art", "tes", "con", "fin")
+DIRECTORIO_RESULTADOS = Path(__file__).resolve().parent / 'resultados'
+TIEMPO_LIMITE = 60        # Segundos máximos por ejecución de AppTest
+
+# AppTest instala cada script como __main__ y no lo restaura; los procesos hijos
+# de multiprocessing necesitan encontrar aquí las funciones que ejecutan
+_ESTE_MODULO = sys.modules[__name__]
+
+# ISSN con dígito verificador correcto: la captura los valida
+_ISSN = ('0028-0836', '0036-8075', '0140-6736', '0092-8674', '1529-2908', '0031-9007', '2049-3630')
+
+_PLANTILLAS = {
+    "art": "Título: {titulo}\nAutores: Autor {i}, Coautor {j}\nRevista: Revista {j}\n"
+           "Vol(No): {j}(2)\nPáginas: 1-10\nAño: {anio}\nDOI: 10.5555/gea.{unico}\nISSN: {issn}",
+    "tes": "Título: {titulo}\nAutor: Autor {i}\nTipo: Doctorado\nDirector: Director {j}\n"
+           "Institución: Instituto {j}\nAño: {anio}",
+    "con": "Título: {titulo}\nAutores: Autor {i}, Coautor {j}\nEvento: Congreso {j}\n"
+           "Tipo: Internacional\nLugar: Ciudad de México, México\nFecha: {anio}-05-15\nMemorias: Sí",
+    "fin": "Proyecto: {titulo}\nResponsable: Autor {i}\nFuente: Fuente {j}\nMonto: $100,000 MXN\n"
+           "Periodo: {anio}-{anio}\nClave: CLAVE-{unico}\nTipo: Externo",
+}
+
+
+def texto_registro(tipo, i, prefijo="Registro"):
+    """Referencia con título, DOI y clave únicos para que no se tome por duplicado"""
+    unico = uuid.uuid4().hex[:12]
+    return _PLANTILLAS[tipo].format(
+        titulo=f"{prefijo} {i} sobre aterosclerosis {unico}",
+        unico=unico, i=i, j=i % 7, anio=2000 + i % 25, issn=_ISSN[i % 7])
+
+
+def sembrar(directorio, config, registros):
+    """Escribe `registros` registros repartidos entre los cuatro archivos remotos"""
+    for k, tipo in enumerate(TIPOS):
+        cantidad = registros // len(TIPOS) + (1 if k < registros % len(TIPOS) else 0)
+        ruta = Path(directorio) / Path(config[f'remote_file_{tipo}']).with_suffix('.jsonl').name
+        with open(ruta, 'w', encoding='utf-8') as f:
+            for i in range(cantidad):
+                f.write(serializar(crear_registro(tipo, texto_registro(tipo, i))))
+
+
+def percentil(valores, p):
+    """Percentil por interpolación lineal (mismo criterio que numpy por defecto)"""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+
+def _nueva_app(script, config):
+    app = AppTest.from_file(str(RAIZ / script), default_timeout=TIEMPO_LIMITE)
+    for clave, valor in config.items():
+        app.secrets[clave] = valor
+    return app
+
+
+def _errores(app):
+    return list(app.exception) + list(app.error)
+
+
+def medir_pagina(config, repeticiones, sesion=0, barrera=None):
+    """Latencias de la primera ejecución de pagina_gea.py en sesiones nuevas"""
+    # Una ejecución sin medir para no contar la importación de pandas y plotly
+    _nueva_app('pagina_gea.py', config).run()
+    if barrera is not None:
+        barrera.wait()
+    latencias, errores = [], 0
+    comienzo = time.monotonic()
+    for _ in range(repeticiones):
+        app = _nueva_app('pagina_gea.py', config)
+        inicio = time.perf_counter()
+        app.run()
+        latencias.append(time.perf_counter() - inicio)
+        errores += bool(_errores(app))
+    return latencias, errores, comienzo
+
+
+def medir_captura(config, repeticiones, sesion=0, barrera=None):
+    """Latencias de guardar un artículo nuevo en una sesión ya autenticada"""
+    app = _nueva_app('captura_gea5.py', config)
+    app.run()
+    app.text_input[0].input(config['remote_password'])
+    app.button[0].click()
+    app.run()
+    if barrera is not None:
+        barrera.wait()
+    latencias, errores = [], 0
+    comienzo = time.monotonic()
+    for i in range(repeticiones):
+        app.text_area(key="input_art").input(texto_registro("art", i, prefijo=f"Sesión {sesion}"))
+        next(b for b in app.button if 'Guardar' in b.label).click()
+        inicio = time.perf_counter()
+        app.run()
+        latencias.append(time.perf_counter() - inicio)
+        errores += bool(_errores(app)) or not any('guardado' in s.value for s in app.success)
+    return latencias, errores, comienzo
+
+
+def esperar_envios(espera_maxima=60):
+    """Segundos que tardó el diario en entregar todo lo capturado al servidor"""
+    import diario
+    inicio = time.monotonic()
+    while time.monotonic() - inicio < espera_maxima:
+        if all(d.estado()['pendientes'] == 0 for d in diario._diarios.values()):
+            return round(time.monotonic() - inicio, 3)
+        time.sleep(0.05)
+    return None
+
+
+def _preparar_proceso():
+    # AppTest restablece el nivel de los registradores de Streamlit en cada
+    # ejecución; sus avisos de "fuera de un servidor" ocultarían los resultados
+    logging.disable(logging.WARNING)
+    os.chdir(RAIZ)  # Las aplicaciones abren sus imágenes con rutas relativas
+
+
+def _sesion(ruta, config, repeticiones, sesion, barrera):
+    """Una sesión medida; devuelve (latencias, errores, inicio, fin, vaciado del diario)"""
+    _preparar_proceso()
+    if ruta == 'captura':
+        # Un diario por sesión: en producción lo usa un solo proceso
+        config = dict(config, journal_dir=str(Path(config['journal_dir']) / f"sesion_{sesion}"))
+        latencias, errores, inicio = medir_captura(config, repeticiones, sesion, barrera)
+        fin = time.monotonic()
+        return latencias, errores, inicio, fin, esperar_envios()
+    latencias, errores, inicio = medir_pagina(config, repeticiones, sesion, barrera)
+    return latencias, errores, inicio, time.monotonic(), None
+
+
+def ejecutar_nivel(ruta, config, repeticiones, concurrencia):
+    """Corre `concurrencia` sesiones en paralelo y junta sus latencias"""
+    if concurrencia == 1:
+        resultados = [_sesion(ruta, config, repeticiones, 0, None)]
+    else:
+        sys.modules['__main__'] = _ESTE_MODULO
+        contexto = multiprocessing.get_context('spawn')
+        with contexto.Manager() as administrador, ProcessPoolExecutor(
+                max_workers=concurrencia, mp_context=contexto) as ejecutor:
+            # Todas las sesiones empiezan a medir a la vez, ya importadas y autenticadas
+            barrera = administrador.Barrier(concurrencia)
+            futuros = [ejecutor.submit(_sesion, ruta, config, repeticiones, s, barrera)
+                       for s in range(concurrencia)]
+            resultados = [futuro.result() for futuro in futuros]
+    latencias = [valor for parcial, *_ in resultados for valor in parcial]
+    errores = sum(resultado[1] for resultado in resultados)
+    duracion = max(resultado[3] for resultado in resultados) - min(resultado[2] for resultado in resultados)
+    vaciados = [resultado[4] for resultado in resultados] if ruta == 'captura' else []
+    return {
+        'ruta': ruta,
+        'concurrencia': concurrencia,
+        'muestras': len(latencias),
+        'errores': errores,
+        'por_segundo': round(len(latencias) / duracion, 2) if duracion else None,
+        'media_ms': round(statistics.fmean(latencias) * 1000, 2),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 2),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+        'max_ms': round(max(latencias) * 1000, 2),
+        # Tiempo hasta que el diario entregó al servidor lo capturado (solo captura)
+        'vaciado_diario_s': max(vaciados) if vaciados and None not in vaciados else None,
+    }
+
+
+def correr(niveles_registros, niveles_concurrencia, repeticiones, rutas, almacen='ssh',
+           replicas=0, retraso_replica=0, quorum=None):
+    """Con `replicas` se agregan réplicas del mismo tipo de almacén; la última responde con `retraso_replica`"""
+    ssh_raiz = tempfile.mkdtemp(prefix='gea_ssh_')
+    servidor = ServidorSSHLocal(ssh_raiz).iniciar() if almacen == 'ssh' else None
+    raices_replicas = [tempfile.mkdtemp(prefix=f'gea_replica{n}_') for n in range(replicas)]
+    servidores_replicas = [
+        ServidorSSHLocal(raiz, retraso=retraso_replica if n == replicas - 1 else 0).iniciar()
+        for n, raiz in enumerate(raices_replicas)
+    ] if almacen == 'ssh' else []
+    smtp = SumideroSMTP().iniciar()
+    resultados = []
+    try:
+        for registros in niveles_registros:
+            # Directorios propios por nivel: espejo, índices y diario empiezan en frío
+            if servidor is not None:
+                config = servidor.config()
+            else:
+                config = {'storage_backend': 'local', 'storage_dir': ssh_raiz, 'remote_password': 'gea-local'}
+            config.update(smtp.config())
+            config.update(
+                remote_file_art='articulos.txt', remote_file_tes='tesis.txt',
+                remote_file_con='congresos.txt', remote_file_fin='financiamiento.txt',
+                journal_dir=tempfile.mkdtemp(prefix='gea_diario_'),
+                mirror_dir=tempfile.mkdtemp(prefix='gea_espejo_'),
+            )
+            sembrar(ssh_raiz, config, registros)
+            if replicas:
+                config['replicas'] = [replica.config() for replica in servidores_replicas] or [
+                    {'storage_dir': raiz} for raiz in raices_replicas]
+                if quorum:
+                    config['replica_quorum'] = quorum
+                for raiz in raices_replicas:
+                    for archivo in Path(ssh_raiz).glob('*.jsonl'):
+                        shutil.copy(archivo, raiz)
+            for ruta in rutas:
+                for concurrencia in niveles_concurrencia:
+                    resultado = ejecutar_nivel(ruta, config, repeticiones, concurrencia)
+                    resultado['registros'] = registros
+                    resultados.append(resultado)
+                    print(f"{ruta:8} registros={registros:<7} concurrencia={concurrencia:<3} "
+                          f"p50={resultado['p50_ms']:>8.1f}ms p95={resultado['p95_ms']:>8.1f}ms "
+                          f"p99={resultado['p99_ms']:>8.1f}ms errores={resultado['errores']}",
+                          flush=True)
+        resultados_servidor = {'almacen': almacen, 'replicas': replicas, 'quorum': quorum,
+                               'retraso_replica_s': retraso_replica,
+                               'conexiones_ssh': servidor.conexiones if servidor is not None else 0,
+                               'sesiones_smtp': smtp.sesiones, 'correos': len(smtp.mensajes)}
+    finally:
+        if servidor is not None:
+            servidor.detener()
+        for replica in servidores_replicas:
+            replica.detener()
+        smtp.detener()
+    return resultados, resultados_servidor
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def comparar(anterior, actual):
+    """Imprime la variación de p50/p95/p99 entre dos corridas con los mismos niveles"""
+    clave = lambda r: (r['ruta'], r['registros'], r['concurrencia'])
+    previos = {clave(r): r for r in anterior['resultados']}
+    for resultado in actual['resultados']:
+        previo = previos.get(clave(resultado))
+        if previo is None:
+            continue
+        cambios = []
+        for medida in ('p50_ms', 'p95_ms', 'p99_ms'):
+            cambio = (resultado[medida] - previo[medida]) / previo[medida] * 100 if previo[medida] else 0
+            cambios.append(f"{medida[:3]} {previo[medida]:.1f}->{resultado[medida]:.1f}ms ({cambio:+.0f}%)")
+        print(f"{resultado['ruta']:8} registros={resultado['registros']:<7} "
+              f"concurrencia={resultado['concurrencia']:<3} " + "  ".join(cambios))
+
+
+def _enteros(texto):
+    return [int(valor) for valor in texto.split(',') if valor.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pruebas de rendimiento de las aplicaciones GEA")
+    parser.add_argument('--registros', type=_enteros, default=[0, 1000, 10000],
+                        help="Registros sembrados en el servidor, separados por coma")
+    parser.add_argument('--concurrencia', type=_enteros, default=[1, 4],
+                        help="Sesiones simultáneas, separadas por coma")
+    parser.add_argument('--repeticiones', type=int, default=20,
+                        help="Ejecuciones medidas por sesión")
+    parser.add_argument('--rutas', default='captura,pagina',
+                        help="Rutas a medir: captura, pagina o ambas")
+    parser.add_argument('--almacen', choices=('ssh', 'local'), default='ssh',
+                        help="Almacén de los registros: servidor SSH local o directorio (storage_backend)")
+    parser.add_argument('--replicas', type=int, default=0,
+                        help="Réplicas adicionales del almacén que reciben cada escritura")
+    parser.add_argument('--retraso-replica', type=float, default=0,
+                        help="Segundos de retraso por apertura de archivo en la última réplica SSH")
+    parser.add_argument('--quorum', type=int,
+                        help="Confirmaciones requeridas por escritura (por defecto, la mayoría)")
+    parser.add_argument('--salida', type=Path,
+                        help="Archivo JSON de resultados (por defecto en benchmarks/resultados/)")
+    parser.add_argument('--comparar', type=Path,
+                        help="Resultados de una corrida anterior para mostrar la variación")
+    args = parser.parse_args()
+
+    _preparar_proceso()
+
+    inicio = datetime.now()
+    resultados, servidor = correr(args.registros, args.concurrencia, args.repeticiones,
+                                  [r.strip() for r in args.rutas.split(',') if r.strip()], args.almacen,
+                                  args.replicas, args.retraso_replica, args.quorum)
+    salida = {
+        'fecha': inicio.isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeticiones': args.repeticiones,
+        'servidor': servidor,
+        'resultados': resultados,
+    }
+    ruta_salida = args.salida or DIRECTORIO_RESULTADOS / f"{inicio:%Y%m%d-%H%M%S}.json"
+    ruta_salida.parent.mkdir(parents=True, exist_ok=True)
+    ruta_salida.write_text(json.dumps(salida, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"Resultados en {ruta_salida}")
+
+    if args.comparar:
+        comparar(json.loads(args.comparar.read_text(encoding='utf-8')), salida)
+
+
+if __name__ == "__main__":
+    main()
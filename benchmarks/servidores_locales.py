@@ -0,0 +1,350 @@
+"""Servidores locales SSH/SFTP y SMTP para pruebas de rendimiento.
+
+Levantan en hilos de fondo un servidor SSH basado en paramiko (exec + SFTP
+sobre un directorio local) y un sumidero SMTP que acepta y descarta correos,
+de forma que ambas aplicaciones puedan ejecutarse sin infraestructura real.
+"""
+import os
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+
+import paramiko
+from paramiko.sftp import SFTP_OK, SFTP_NO_SUCH_FILE, SFTP_FAILURE
+
+
+def _codigo_sftp(error):
+    if isinstance(error, FileNotFoundError):
+        return SFTP_NO_SUCH_FILE
+    return paramiko.SFTPServer.convert_errno(error.errno) if error.errno else SFTP_FAILURE
+
+
+class _ManejadorSFTP(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return _codigo_sftp(e)
+
+    def chattr(self, attr):
+        return SFTP_OK
+
+
+class _SFTPLocal(paramiko.SFTPServerInterface):
+    """SFTP sobre el sistema de archivos local; las rutas relativas parten de `raiz`.
+
+    El retraso se lee de `servidor` en cada apertura, así que cambiarlo afecta
+    también a las conexiones ya abiertas.
+    """
+
+    def __init__(self, server, raiz, servidor, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.raiz = raiz
+        self.servidor = servidor
+
+    def _ruta(self, ruta):
+        return os.path.normpath(os.path.join(self.raiz, ruta))
+
+    def canonicalize(self, ruta):
+        return self._ruta(ruta)
+
+    def list_folder(self, ruta):
+        try:
+            ruta_local = self._ruta(ruta)
+            resultado = []
+            for nombre in os.listdir(ruta_local):
+                attr = paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(ruta_local, nombre)))
+                attr.filename = nombre
+                resultado.append(attr)
+            return resultado
+        except OSError as e:
+            return _codigo_sftp(e)
+
+    def stat(self, ruta):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._ruta(ruta)))
+        except OSError as e:
+            return _codigo_sftp(e)
+
+    lstat = stat
+
+    def open(self, ruta, flags, attr):
+        time.sleep(self.servidor.retraso)
+        ruta_local = self._ruta(ruta)
+        try:
+            fd = os.open(ruta_local, flags | getattr(os, 'O_BINARY', 0), 0o644)
+        except OSError as e:
+            return _codigo_sftp(e)
+        if flags & os.O_WRONLY:
+            modo = 'ab' if flags & os.O_APPEND else 'wb'
+        elif flags & os.O_RDWR:
+            modo = 'a+b' if flags & os.O_APPEND else 'r+b'
+        else:
+            modo = 'rb'
+        archivo = os.fdopen(fd, modo)
+        manejador = _ManejadorSFTP(flags)
+        manejador.filename = ruta_local
+        manejador.readfile = archivo
+        manejador.writefile = archivo
+        return manejador
+
+    def remove(self, ruta):
+        try:
+            os.remove(self._ruta(ruta))
+        except OSError as e:
+            return _codigo_sftp(e)
+        return SFTP_OK
+
+    def rename(self, origen, destino):
+        try:
+            os.replace(self._ruta(origen), self._ruta(destino))
+        except OSError as e:
+            return _codigo_sftp(e)
+        return SFTP_OK
+
+    posix_rename = rename
+
+    def mkdir(self, ruta, attr):
+        try:
+            os.mkdir(self._ruta(ruta))
+        except OSError as e:
+            return _codigo_sftp(e)
+        return SFTP_OK
+
+    def rmdir(self, ruta):
+        try:
+            os.rmdir(self._ruta(ruta))
+        except OSError as e:
+            return _codigo_sftp(e)
+        return SFTP_OK
+
+    def chattr(self, ruta, attr):
+        return SFTP_OK
+
+
+class _InterfazSSH(paramiko.ServerInterface):
+    def __init__(self, servidor):
+        self.servidor = servidor
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (self.servidor.usuario, self.servidor.password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED_OPEN_REQUEST
+
+    def check_channel_exec_request(self, channel, command):
+        # paramiko confirma la petición después de que este método regresa;
+        # se difiere el comando para que su salida no llegue antes que la confirmación.
+        threading.Timer(0.01, self.servidor._ejecutar, args=(channel, command)).start()
+        return True
+
+
+class ServidorSSHLocal:
+    """Servidor SSH con exec (vía /bin/sh en `raiz`) y subsistema SFTP.
+
+    Con `retraso` (segundos) cada apertura de archivo por SFTP espera ese
+    tiempo, para simular un servidor lento o lejano (o, con un valor mayor
+    que el timeout del cliente, uno que dejó de responder); se puede cambiar
+    con el servidor en marcha. Con `max_conexiones` se
+    cierran las conexiones que excedan ese número de transportes activos, como
+    hace sshd al alcanzar MaxStartups o un límite de sesiones por usuario.
+    """
+
+    def __init__(self, raiz, usuario='gea', password='gea', host='127.0.0.1', port=0, retraso=0,
+                 max_conexiones=None):
+        self.raiz = os.path.abspath(raiz)
+        self.retraso = retraso
+        self.max_conexiones = max_conexiones
+        self.usuario = usuario
+        self.password = password
+        self._llave = paramiko.RSAKey.generate(2048)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self._socket.listen(64)
+        self.host, self.port = self._socket.getsockname()
+        self.conexiones = 0
+        self.rechazadas = 0
+        self._transportes = []
+        self._canales = set()
+        self._lock = threading.Lock()
+        self._activo = False
+
+    def config(self, remote_dir='/'):
+        """Claves de configuración que apuntan a este servidor"""
+        return {
+            'remote_host': self.host,
+            'remote_port': self.port,
+            'remote_user': self.usuario,
+            'remote_password': self.password,
+            'remote_dir': os.path.normpath(os.path.join(self.raiz, remote_dir.lstrip('/'))),
+        }
+
+    def iniciar(self):
+        self._activo = True
+        threading.Thread(target=self._aceptar, daemon=True).start()
+        return self
+
+    def _aceptar(self):
+        while self._activo:
+            try:
+                cliente, _ = self._socket.accept()
+            except OSError:
+                break
+            self.conexiones += 1
+            if self.max_conexiones and sum(t.is_active() for t in self._transportes) >= self.max_conexiones:
+                self.rechazadas += 1
+                cliente.close()
+                continue
+            transporte = paramiko.Transport(cliente)
+            transporte.add_server_key(self._llave)
+            transporte.set_subsystem_handler('sftp', paramiko.SFTPServer, _SFTPLocal, self.raiz, self)
+            self._transportes.append(transporte)
+            try:
+                transporte.start_server(server=_InterfazSSH(self))
+            except (paramiko.SSHException, EOFError, OSError):
+                continue
+            threading.Thread(target=self._atender, args=(transporte,), daemon=True).start()
+
+    def _atender(self, transporte):
+        # Los canales aceptados se retienen hasta que terminan: paramiko
+        # cierra un canal en cuanto se recolecta su objeto.
+        while transporte.is_active():
+            canal = transporte.accept(timeout=1)
+            if canal is not None:
+                with self._lock:
+                    self._canales.add(canal)
+
+    def _ejecutar(self, canal, comando):
+        try:
+            entrada = []
+            while True:
+                bloque = canal.recv(32768)
+                if not bloque:
+                    break
+                entrada.append(bloque)
+            proceso = subprocess.run(comando.decode(), shell=True, cwd=self.raiz,
+                                     input=b''.join(entrada), capture_output=True)
+            canal.sendall(proceso.stdout)
+            canal.sendall_stderr(proceso.stderr)
+            canal.send_exit_status(proceso.returncode)
+        finally:
+            canal.close()
+            with self._lock:
+                self._canales.discard(canal)
+
+    def detener(self):
+        self._activo = False
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+        for transporte in self._transportes:
+            transporte.close()
+
+
+class _ManejadorSMTP(socketserver.StreamRequestHandler):
+    """Implementa lo mínimo de SMTP (EHLO, STARTTLS omitido, AUTH, DATA)"""
+
+    def _responder(self, linea):
+        self.wfile.write((linea + '\r\n').encode())
+
+    def handle(self):
+        servidor = self.server
+        servidor.sesiones += 1
+        self._responder('220 sumidero-gea ESMTP')
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea.decode(errors='replace').strip().upper()
+            if comando.startswith(('EHLO', 'HELO')):
+                self._responder('250-sumidero-gea')
+                self._responder('250 AUTH PLAIN LOGIN')
+            elif comando.startswith('STARTTLS'):
+                # Sin TLS: el cliente de prueba no debe llamar a starttls()
+                self._responder('454 TLS no disponible')
+            elif comando.startswith('AUTH'):
+                servidor.logins += 1
+                self._responder('235 Autenticado')
+            elif comando.startswith('DATA'):
+                self._responder('354 Fin con <CRLF>.<CRLF>')
+                datos = []
+                while True:
+                    linea = self.rfile.readline()
+                    if not linea or linea in (b'.\r\n', b'.\n'):
+                        break
+                    datos.append(linea)
+                with servidor.lock:
+                    servidor.mensajes.append(b''.join(datos))
+                self._responder('250 Aceptado')
+            elif comando.startswith('QUIT'):
+                self._responder('221 Adiós')
+                return
+            elif comando.startswith('MAIL') and not servidor.admitir():
+                self._responder('451 4.7.1 Límite de envío excedido, intente más tarde')
+            elif comando.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self._responder('250 OK')
+            else:
+                self._responder('502 No implementado')
+
+
+class SumideroSMTP(socketserver.ThreadingTCPServer):
+    """Servidor SMTP que guarda en memoria los mensajes recibidos.
+
+    Con `correos_por_minuto` rechaza con 451 los envíos que excedan ese número
+    en el último minuto, como la limitación de un proveedor de correo.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, correos_por_minuto=None):
+        super().__init__((host, port), _ManejadorSMTP)
+        self.host, self.port = self.server_address
+        self.correos_por_minuto = correos_por_minuto
+        self.mensajes = []
+        self.sesiones = 0
+        self.logins = 0
+        self.rechazados = 0
+        self._admitidos = []
+        self.lock = threading.Lock()
+
+    def admitir(self):
+        """Registra un envío si cabe en el límite por minuto; False si se rechaza"""
+        with self.lock:
+            if self.correos_por_minuto:
+                ahora = time.monotonic()
+                self._admitidos = [t for t in self._admitidos if ahora - t < 60]
+                if len(self._admitidos) >= self.correos_por_minuto:
+                    self.rechazados += 1
+                    return False
+                self._admitidos.append(ahora)
+            return True
+
+    def config(self):
+        return {
+            'smtp_server': self.host,
+            'smtp_port': self.port,
+            'smtp_starttls': False,
+            'email_user': 'gea@localhost',
+            'email_password': 'gea',
+            'notification_email': 'avisos@localhost',
+        }
+
+    def iniciar(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def detener(self):
+        self.shutdown()
+        self.server_close()
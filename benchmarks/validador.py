@@ -0,0 +1,90 @@
+"""Referencias por segundo del motor de validación (validacion.py).
+
+Mide la validación de referencias "Clave: valor" como las envía la captura
+individual y la lectura completa de un CSV de importación masiva, que usa el
+mismo motor. Una fracción de las referencias lleva un campo inválido (ISSN,
+año, fecha o periodo según el tipo), para incluir el camino de rechazo:
+
+    python benchmarks/validador.py --referencias 20000
+"""
+import argparse
+import csv
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from importacion import leer_csv
+from rendimiento import TIPOS, texto_registro
+from validacion import validar_referencia
+
+
+# Tipo -> (texto original, texto que invalida el campo)
+_CORRUPCIONES = {
+    'art': ('ISSN: ', 'ISSN: 9'),
+    'tes': ('Año: ', 'Año: 20x'),
+    'con': ('Fecha: ', 'Fecha: x'),
+    'fin': ('Periodo: ', 'Periodo: x'),
+}
+
+
+def referencias(cantidad, proporcion_errores):
+    """(tipo, texto) repartidos entre los cuatro tipos; una fracción con un campo inválido"""
+    resultado = []
+    for i in range(cantidad):
+        tipo = TIPOS[i % len(TIPOS)]
+        texto = texto_registro(tipo, i)
+        if int((i + 1) * proporcion_errores) > int(i * proporcion_errores):
+            texto = texto.replace(*_CORRUPCIONES[tipo])
+        resultado.append((tipo, texto))
+    return resultado
+
+
+def medir_referencias(lista, repeticiones):
+    """(referencias por segundo, rechazadas) validando cada texto"""
+    tasas, rechazadas = [], 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        rechazadas = sum(bool(validar_referencia(tipo, texto)[1]) for tipo, texto in lista)
+        tasas.append(len(lista) / (time.perf_counter() - inicio))
+    return statistics.median(tasas), rechazadas
+
+
+def medir_csv(lista, repeticiones):
+    """Filas por segundo de leer_csv sobre un CSV con las mismas referencias de artículos"""
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    filas = [dict(linea.split(': ', 1) for linea in texto.splitlines()) for tipo, texto in lista if tipo == 'art']
+    encabezados = list(filas[0])
+    escritor.writerow(encabezados)
+    for fila in filas:
+        escritor.writerow([fila.get(encabezado, '') for encabezado in encabezados])
+    contenido = salida.getvalue()
+    tasas = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        leidas = sum(1 for _ in leer_csv(io.StringIO(contenido), 'art'))
+        tasas.append(leidas / (time.perf_counter() - inicio))
+    return statistics.median(tasas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendimiento del motor de validación de referencias")
+    parser.add_argument('--referencias', type=int, default=20000)
+    parser.add_argument('--errores', type=float, default=0.1,
+                        help="Fracción de referencias con un campo inválido")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    lista = referencias(args.referencias, args.errores)
+    por_segundo, rechazadas = medir_referencias(lista, args.repeticiones)
+    print(f"validar_referencia: {por_segundo:,.0f} referencias/s ({rechazadas} de {len(lista)} rechazadas)")
+    print(f"leer_csv (artículos): {medir_csv(lista, args.repeticiones):,.0f} filas/s")
+
+
+if __name__ == "__main__":
+    main()
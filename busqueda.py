@@ -0,0 +1,177 @@
+import bisect
+import hashlib
+import heapq
+import json
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from espejo import TIPOS
+
+# Peso de cada campo en la puntuación de un documento
+PESOS_CAMPOS = {
+    'titulo': 3.0,
+    'autores': 2.0,
+    'revista': 1.0,
+    'evento': 1.0,
+    'doi': 4.0,
+    'anio': 1.0,
+}
+LIMITE_RESULTADOS = 50
+
+_PALABRA = re.compile(r'[a-z0-9]+')
+_VACIAS = frozenset(
+    "a al con de del el en et la las los of on para por the to un una y".split()
+)
+
+
+def tokenizar(texto):
+    """Minúsculas, sin acentos y sin palabras vacías"""
+    sin_acentos = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode().lower()
+    return [t for t in _PALABRA.findall(sin_acentos) if t not in _VACIAS]
+
+
+class IndiceBusqueda:
+    """Índice invertido en memoria sobre los registros capturados.
+
+    Cada término apunta a los documentos que lo contienen con su frecuencia
+    ponderada por campo; el vocabulario ordenado permite buscar por prefijo
+    con bisección. Los registros se agregan de forma incremental y se
+    identifican por su `id`, así que agregar dos veces el mismo no lo duplica.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._documentos = []
+        self._ids = {}
+        self._vocabulario = []
+        self._vocabulario_sucio = False
+        self._posiciones = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._documentos)
+
+    def agregar(self, registro):
+        id_registro = registro.get('id') or hashlib.sha1(
+            json.dumps(registro, sort_keys=True).encode()).hexdigest()
+        with self._lock:
+            if id_registro in self._ids:
+                return False
+            campos = registro.get('campos', {})
+            numero = len(self._documentos)
+            self._documentos.append({
+                'id': id_registro,
+                'tipo': registro.get('tipo'),
+                'titulo': campos.get('titulo'),
+                'autores': ', '.join(campos.get('autores', [])),
+                'revista': campos.get('revista') or campos.get('evento') or campos.get('institucion'),
+                'anio': registro.get('anio'),
+                'doi': campos.get('doi'),
+            })
+            self._ids[id_registro] = numero
+
+            frecuencias = defaultdict(float)
+            for campo, peso in PESOS_CAMPOS.items():
+                valor = registro.get('anio') if campo == 'anio' else campos.get(campo)
+                if valor is None:
+                    continue
+                if isinstance(valor, list):
+                    valor = ' '.join(valor)
+                for termino in tokenizar(valor):
+                    frecuencias[termino] += peso
+            for termino, frecuencia in frecuencias.items():
+                if termino not in self._postings:
+                    self._vocabulario_sucio = True
+                self._postings[termino][numero] = frecuencia
+            return True
+
+    def agregar_registros(self, registros):
+        return sum(1 for registro in registros if self.agregar(registro))
+
+    def actualizar(self, espejo):
+        """Indexa lo que el espejo local agregó desde la última llamada"""
+        with self._lock:
+            for tipo in TIPOS:
+                # Si el espejo se recopió se relee completo; los ids evitan duplicar lo ya indexado
+                registros, self._posiciones[tipo] = espejo.nuevos(tipo, self._posiciones.get(tipo))
+                self.agregar_registros(registros)
+
+    def _expandir(self, termino, prefijo):
+        """Términos del vocabulario que coinciden exacto o por prefijo"""
+        if not prefijo:
+            return [termino] if termino in self._postings else []
+        if self._vocabulario_sucio:
+            self._vocabulario = sorted(self._postings)
+            self._vocabulario_sucio = False
+        inicio = bisect.bisect_left(self._vocabulario, termino)
+        fin = bisect.bisect_left(self._vocabulario, termino + '\x7f')
+        return self._vocabulario[inicio:fin]
+
+    def buscar(self, consulta, tipo=None, limite=LIMITE_RESULTADOS, prefijo=True):
+        """Documentos que contienen todos los términos, ordenados por TF-IDF.
+
+        Cada término de la consulta coincide también como prefijo de palabras
+        indexadas ("ather" encuentra "atherosclerosis").
+        """
+        terminos = tokenizar(consulta)
+        if not terminos:
+            return []
+        with self._lock:
+            total = len(self._documentos)
+            grupos = []
+            for termino in terminos:
+                expansiones = []
+                for expansion in self._expandir(termino, prefijo):
+                    postings = self._postings[expansion]
+                    idf = math.log(1 + total / len(postings))
+                    # Una coincidencia exacta pesa más que una por prefijo
+                    expansiones.append((postings, idf if expansion == termino else idf * 0.5))
+                if not expansiones:
+                    return []
+                grupos.append(expansiones)
+
+            # Se empieza por el término más selectivo; los siguientes solo revisan candidatos
+            grupos.sort(key=lambda expansiones: sum(len(p) for p, _ in expansiones))
+            puntajes = None
+            for expansiones in grupos:
+                parciales = {}
+                if puntajes is None or len(puntajes) > sum(len(p) for p, _ in expansiones):
+                    for postings, factor in expansiones:
+                        for numero, frecuencia in postings.items():
+                            if frecuencia * factor > parciales.get(numero, 0):
+                                parciales[numero] = frecuencia * factor
+                else:
+                    for numero in puntajes:
+                        for postings, factor in expansiones:
+                            frecuencia = postings.get(numero)
+                            if frecuencia and frecuencia * factor > parciales.get(numero, 0):
+                                parciales[numero] = frecuencia * factor
+                if puntajes is None:
+                    puntajes = parciales
+                else:
+                    puntajes = {n: p + parciales[n] for n, p in puntajes.items() if n in parciales}
+                if not puntajes:
+                    return []
+
+            if tipo:
+                puntajes = {n: p for n, p in puntajes.items() if self._documentos[n]['tipo'] == tipo}
+            mejores = heapq.nsmallest(limite, puntajes.items(), key=lambda par: (-par[1], -par[0]))
+            return [dict(self._documentos[n], puntaje=round(p, 3)) for n, p in mejores]
+
+
+_indices = {}
+_indices_lock = threading.Lock()
+
+
+def obtener_indice(espejo):
+    """Devuelve el índice de búsqueda del proceso asociado a un espejo local"""
+    clave = str(espejo.directorio)
+    with _indices_lock:
+        indice = _indices.get(clave)
+        if indice is None:
+            indice = IndiceBusqueda()
+            _indices[clave] = indice
+        return indice
@@ -1,81 +1,76 @@
-import toml
+import io
 import os
-from datetime import datetime
-import smtplib
-from email.message import EmailMessage
-import paramiko
-from scp import SCPClient
+import time
 import streamlit as st
 from pathlib import Path
-from PIL import Image
+from almacenamiento import obtener_almacen
+from diario import obtener_diario
+from notificaciones import obtener_notificador
+from registros import archivo_estructurado, serializar
+from validacion import validar_referencia
+from espejo import obtener_espejo
+from busqueda import obtener_indice
+from duplicados import obtener_indice_duplicados, claves as claves_duplicado
+from importacion import leer_referencias
+from recursos import imagen
+from configuracion import ErrorConfiguracion, cargar_configuracion
+import trazas
+from trazas import trazar
 
-# Cargar configuración desde secrets.toml
-def cargar_configuracion():
-    try:
-        config = dict(st.secrets)
-        if config.get('smtp_server'):
-            return config
-    except:
-        try:
-            secrets_path = Path('.streamlit') / 'secrets.toml'
-            with open(secrets_path, 'r') as f:
-                config = toml.load(f)
-            return config
-        except Exception as e:
-            st.error(f"Error al cargar configuración: {e}")
-            st.stop()
-
-# Función para verificar/crear archivo remoto y agregar contenido
-def gestionar_archivo_remoto(config, archivo_remoto, contenido):
-    try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            hostname=config['remote_host'],
-            port=config['remote_port'],
-            username=config['remote_user'],
-            password=config['remote_password']
+# Función para agregar un lote de registros del diario al archivo remoto
+@trazar('gestionar_archivo_remoto')
+def gestionar_archivo_remoto(config, archivo_remoto, entradas):
+    if isinstance(entradas[0]['contenido'], str):
+        # Entradas de texto libre anteriores al formato estructurado
+        bloque = "".join(
+            f"\n--- Registro del {entrada['fecha']} ---\n{entrada['contenido']}\n\n"
+            for entrada in entradas
         )
-        
-        ruta_completa = f"{config['remote_dir']}/{archivo_remoto}"
-        
-        stdin, stdout, stderr = ssh.exec_command(f"test -f {ruta_completa} && echo 'exists' || echo 'not exists'")
-        existe = stdout.read().decode().strip()
-        
-        if existe == 'not exists':
-            ssh.exec_command(f"echo 'Archivo de registros creado automáticamente' > {ruta_completa}")
-        
-        fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        ssh.exec_command(f"echo '\n--- Registro del {fecha} ---\n{contenido}\n' >> {ruta_completa}")
-        
-        ssh.close()
-        return True
-    except Exception as e:
-        st.error(f"Error al gestionar archivo remoto: {e}")
-        return False
+        cabecera = "Archivo de registros creado automáticamente\n"
+    else:
+        # Una línea JSON por registro
+        bloque = "".join(serializar(entrada['contenido']) for entrada in entradas)
+        cabecera = None
+    
+    # Una sola escritura bajo candado en el almacén configurado (SFTP o directorio local)
+    offset = obtener_almacen(config).anexar(
+        archivo_remoto, bloque.encode(), cabecera=cabecera.encode() if cabecera else None
+    )
+    
+    # Los registros enviados quedan buscables sin esperar a la siguiente sincronización
+    obtener_indice(obtener_espejo(config)).agregar_registros(
+        entrada['contenido'] for entrada in entradas if isinstance(entrada['contenido'], dict)
+    )
+    return offset
 
-# Función para enviar notificación por email
-def enviar_notificacion(config, tipo_registro, contenido):
+# Diario local compartido por todas las sesiones del proceso
+def obtener_diario_capturas(config):
+    ruta = Path(config.get('journal_dir', '.gea_diario')) / 'capturas.jsonl'
+    return obtener_diario(ruta, lambda archivo, entradas: gestionar_archivo_remoto(config, archivo, entradas))
+
+# Función para encolar la notificación por email (la envía un hilo de fondo)
+@trazar('enviar_notificacion')
+def enviar_notificacion(config, tipo_registro, contenido, asunto=None):
     try:
-        msg = EmailMessage()
-        msg['From'] = config['email_user']
-        msg['To'] = config['notification_email']
-        msg['Subject'] = f"Nuevo registro de {tipo_registro} capturado"
-        
-        cuerpo = f"Se ha capturado un nuevo {tipo_registro} con el siguiente contenido:\n\n{contenido}\n"
-        cuerpo += f"\nFecha de registro: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        
-        msg.set_content(cuerpo)
-        
-        with smtplib.SMTP(config['smtp_server'], config['smtp_port']) as server:
-            server.starttls()
-            server.login(config['email_user'], config['email_password'])
-            server.send_message(msg)
-            
+        obtener_notificador(config).encolar(tipo_registro, contenido, asunto)
     except Exception as e:
         st.error(f"Error al enviar notificación por email: {e}")
 
-# Función para mostrar formulario simplificado
+# Valida la captura al enviar el formulario, antes de cualquier acceso a red; si
+# es válida se vacía el cuadro de texto, si no se conserva para corregirla
+def revisar_captura(tipo):
+    contenido = st.session_state[f"input_{tipo}"]
+    if not contenido.strip():
+        st.session_state[f"errores_{tipo}"] = None
+        return
+    registro, errores = validar_referencia(tipo, contenido)
+    if errores:
+        st.session_state[f"errores_{tipo}"] = errores
+    else:
+        st.session_state[f"captura_{tipo}"] = (contenido, registro)
+        st.session_state[f"input_{tipo}"] = ""
+
+# Función para mostrar formulario simplificado; devuelve (contenido, registro) de una captura válida
 def formulario_simplificado(tipo):
     formatos = {
         "art": """Ejemplo formato artículo:
@@ -127,17 +122,197 @@ Tipo: Interno/Externo"""
     }
     
     st.subheader(titulos[tipo])
-    with st.form(f"form_{tipo}", clear_on_submit=True):
+    with st.form(f"form_{tipo}"):
         st.markdown(formatos[tipo])
-        contenido = st.text_area("Ingrese la referencia completa:", height=200, key=f"input_{tipo}")
+        st.text_area("Ingrese la referencia completa:", height=200, key=f"input_{tipo}")
         
-        submitted = st.form_submit_button(f"💾 Guardar {titulos[tipo][2:]}")
-        if submitted:
-            if not contenido.strip():
+        # Errores del último envío, junto al texto que hay que corregir
+        if f"errores_{tipo}" in st.session_state:
+            errores = st.session_state.pop(f"errores_{tipo}")
+            if errores is None:
                 st.warning("Por favor ingrese el contenido del registro")
-                return None
-            return contenido
-    return None
+            else:
+                st.error("❌ Corrija los siguientes campos antes de guardar:\n" + "\n".join(
+                    f"- **{error.etiqueta}**: {error.mensaje}" for error in errores))
+        
+        st.form_submit_button(f"💾 Guardar {titulos[tipo][2:]}", on_click=revisar_captura, args=(tipo,))
+    return st.session_state.pop(f"captura_{tipo}", None)
+
+# Función para detectar duplicados contra las claves ya conocidas (sin acceso a red)
+def buscar_duplicados(config, registro):
+    espejo = obtener_espejo(config)
+    indice = obtener_indice_duplicados(espejo)
+    indice.actualizar(espejo)
+    return indice.buscar(registro)
+
+def describir_coincidencias(coincidencias):
+    nombres = {
+        "doi": "DOI",
+        "issn": "ISSN y título",
+        "isbn": "ISBN y título",
+        "clave": "clave de proyecto",
+        "huella": "título y primer autor"
+    }
+    return ", ".join(sorted({nombres[clave.split(':', 1)[0]] for clave, _ in coincidencias}))
+
+# Función para guardar un registro en el diario local y avisar por correo
+def guardar_registro(config, tipo, contenido, registro):
+    try:
+        archivo = archivo_estructurado(config[f"remote_file_{registro['tipo']}"])
+        obtener_diario_capturas(config).agregar(archivo, registro)
+    except Exception as e:
+        st.error(f"❌ Error al guardar el registro: {e}")
+    else:
+        # Las claves del registro cuentan desde ahora, aunque aún no llegue al servidor
+        obtener_indice_duplicados(obtener_espejo(config)).agregar(registro)
+        st.success("✅ Registro guardado; se enviará al servidor remoto en segundo plano")
+        enviar_notificacion(config, tipo[2:].lower(), contenido)
+
+# Vista de búsqueda sobre el espejo local de los registros
+def vista_busqueda(config):
+    st.subheader("🔎 Buscar registros")
+    espejo = obtener_espejo(config)
+    indice = obtener_indice(espejo)
+    
+    forzar = st.button("🔄 Sincronizar con servidor remoto")
+    if not espejo.sincronizar(antiguedad_maxima=0 if forzar else 60):
+        st.warning(f"No se pudo sincronizar ({espejo.ultimo_error}); se busca en la copia local")
+    indice.actualizar(espejo)
+    
+    col_consulta, col_tipo = st.columns([3, 1])
+    with col_consulta:
+        consulta = st.text_input("Título, autores, revista, DOI o año:", key="consulta_busqueda")
+    with col_tipo:
+        filtro = st.selectbox("Tipo:", ["Todos", "art", "tes", "con", "fin"], key="tipo_busqueda")
+    
+    if consulta.strip():
+        inicio = time.perf_counter()
+        resultados = indice.buscar(consulta, tipo=None if filtro == "Todos" else filtro)
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        st.caption(f"{len(resultados)} resultados en {milisegundos:.1f} ms ({len(indice)} registros indexados)")
+        if resultados:
+            st.dataframe(resultados, use_container_width=True, hide_index=True)
+
+# Vista de importación masiva desde archivos BibTeX, RIS o CSV
+def vista_importacion(config):
+    st.subheader("📥 Importación masiva")
+    st.markdown(
+        "Suba un archivo **BibTeX** (.bib), **RIS** (.ris) o **CSV** (.csv). "
+        "En el CSV los encabezados son las etiquetas de los formatos sugeridos "
+        "(Título, Autores, Año, ...) y la columna opcional *Tipo de registro* indica art/tes/con/fin. "
+        "Título y Autores sirven para todos los tipos: se leen como Autor en tesis y como "
+        "Proyecto y Responsable en financiamiento; las demás columnas son las de la plantilla de cada tipo."
+    )
+    archivo = st.file_uploader("Archivo de referencias", type=["bib", "ris", "csv"], key="archivo_importacion")
+    tipo_csv = st.selectbox("Tipo para filas CSV sin 'Tipo de registro':", ["art", "tes", "con", "fin"])
+    if archivo is None:
+        return
+    
+    # El análisis se hace una vez por archivo y se conserva entre ejecuciones
+    clave = (archivo.file_id, tipo_csv)
+    if st.session_state.get('importacion', {}).get('clave') != clave:
+        # Se compara contra todo lo guardado hasta ahora, no contra lo que la última captura dejó indexado
+        espejo = obtener_espejo(config)
+        if not espejo.sincronizar():
+            st.warning(f"No se pudo sincronizar ({espejo.ultimo_error}); los duplicados se revisan contra la copia local")
+        indice = obtener_indice_duplicados(espejo)
+        indice.actualizar(espejo)
+        aceptados, rechazados, vistos = [], [], set()
+        lineas = io.TextIOWrapper(archivo, encoding='utf-8-sig', errors='replace')
+        for fila in leer_referencias(archivo.name, lineas, tipo_csv):
+            if fila.error is None:
+                claves_fila = set(claves_duplicado(fila.registro))
+                if indice.buscar(fila.registro):
+                    fila = fila._replace(registro=None, error="Ya existe un registro con los mismos datos")
+                elif claves_fila & vistos:
+                    fila = fila._replace(registro=None, error="Repetido dentro del archivo")
+                else:
+                    vistos |= claves_fila
+            (rechazados if fila.error else aceptados).append(fila)
+        lineas.detach()
+        archivo.seek(0)
+        st.session_state.importacion = {'clave': clave, 'aceptados': aceptados, 'rechazados': rechazados}
+    
+    aceptados = st.session_state.importacion['aceptados']
+    rechazados = st.session_state.importacion['rechazados']
+    
+    st.markdown(f"**{len(aceptados)}** referencias aceptadas, **{len(rechazados)}** rechazadas")
+    if aceptados:
+        st.dataframe(
+            [{"Línea": f.linea, "Tipo": f.tipo, "Título": f.registro['campos'].get('titulo'),
+              "Autores": ", ".join(f.registro['campos'].get('autores', [])), "Año": f.registro['anio']}
+             for f in aceptados],
+            use_container_width=True, hide_index=True
+        )
+    if rechazados:
+        with st.expander(f"Rechazadas ({len(rechazados)})"):
+            st.dataframe(
+                [{"Línea": f.linea, "Tipo": f.tipo, "Motivo": f.error} for f in rechazados],
+                use_container_width=True, hide_index=True
+            )
+    
+    if aceptados and st.button(f"💾 Importar {len(aceptados)} referencias"):
+        por_tipo = {}
+        for fila in aceptados:
+            por_tipo.setdefault(fila.tipo, []).append(fila.registro)
+        try:
+            diario = obtener_diario_capturas(config)
+            for tipo, registros in por_tipo.items():
+                diario.agregar_lote(archivo_estructurado(config[f'remote_file_{tipo}']), registros)
+        except Exception as e:
+            st.error(f"❌ Error al guardar la importación: {e}")
+            return
+        
+        indice = obtener_indice_duplicados(obtener_espejo(config))
+        for fila in aceptados:
+            indice.agregar(fila.registro)
+        del st.session_state.importacion
+        
+        resumen = "\n".join(f"- {tipo}: {len(registros)}" for tipo, registros in por_tipo.items())
+        enviar_notificacion(
+            config, "importación masiva",
+            f"Archivo: {archivo.name}\nReferencias importadas por tipo:\n{resumen}",
+            asunto=f"Importación masiva: {len(aceptados)} registros capturados"
+        )
+        st.success(f"✅ {len(aceptados)} referencias guardadas; se enviarán al servidor remoto en segundo plano")
+
+# Migración única de los archivos de texto libre anteriores a los registros JSONL
+def aviso_legado(config):
+    espejo = obtener_espejo(config)
+    if 'legado_sin_migrar' not in st.session_state:
+        try:
+            st.session_state.legado_sin_migrar = espejo.legado_sin_migrar()
+        except Exception as e:
+            st.caption(f"⚠️ No se pudo revisar si hay registros sin migrar: {e}")
+            return
+    sin_migrar = st.session_state.legado_sin_migrar
+    if not sin_migrar:
+        return
+    st.warning(
+        f"Hay registros en el formato de texto anterior ({', '.join(sin_migrar)}) que no se cuentan, "
+        "no se buscan, no se exportan ni se revisan como duplicados hasta migrarlos"
+    )
+    if st.button("🔁 Migrar registros anteriores"):
+        if not espejo.sincronizar():
+            st.error(f"❌ No se pudo sincronizar antes de migrar: {espejo.ultimo_error}")
+            return
+        try:
+            por_tipo = espejo.registros_legado(sin_migrar)
+            diario = obtener_diario_capturas(config)
+            for tipo, registros in por_tipo.items():
+                if registros:
+                    diario.agregar_lote(archivo_estructurado(config[f'remote_file_{tipo}']), registros)
+        except Exception as e:
+            st.error(f"❌ Error al migrar los registros anteriores: {e}")
+            return
+        espejo.marcar_legado(sin_migrar)
+        indice = obtener_indice_duplicados(espejo)
+        for registros in por_tipo.values():
+            for registro in registros:
+                indice.agregar(registro)
+        del st.session_state.legado_sin_migrar
+        st.success(f"✅ {sum(map(len, por_tipo.values()))} registros anteriores migrados; "
+                   "se enviarán al servidor remoto en segundo plano")
 
 # Pantalla de autenticación
 def autenticar(config):
@@ -162,8 +337,13 @@ def main():
         initial_sidebar_state="expanded"
     )
     
-    # Cargar configuración
-    config = cargar_configuracion()
+    # Cargar configuración (validada una vez por proceso)
+    try:
+        config = cargar_configuracion()
+    except ErrorConfiguracion as e:
+        st.error(f"Error al cargar configuración: {e}")
+        st.stop()
+    trazas.configurar(config)
     
     # Verificar autenticación
     if not hasattr(st.session_state, 'autenticado'):
@@ -173,14 +353,16 @@ def main():
         autenticar(config)
         return
     
+    # Mantiene el espejo local al día sin bloquear la página (base de la detección de duplicados)
+    obtener_espejo(config).sincronizar_en_segundo_plano(antiguedad_maxima=300)
+    
     # Sidebar
     with st.sidebar:
         # Mostrar logo en la columna izquierda con tamaño fijo
         try:
-            logo = Image.open('escudo_COLOR.jpg')
-            tamaño_fijo = (160, 160)  # Tamaño fijo de 150x150 píxeles
-            logo_reducido = logo.resize(tamaño_fijo)
-            st.image(logo_reducido, caption="Escudo", use_container_width=False)
+            tamaño_fijo = (160, 160)  # Tamaño fijo de 160x160 píxeles
+            logo_reducido = imagen('escudo_COLOR.jpg', tamano=tamaño_fijo)
+            st.image(logo_reducido, caption="Escudo", use_container_width=False, output_format="JPEG")
         except Exception as e:
             st.warning("No se pudo cargar el logo: escudo_COLOR.jpg")
 
@@ -188,11 +370,12 @@ def main():
         st.markdown("---")
         tipo = st.radio(
             "Tipo de registro:",
-            ["📄 Artículo", "📚 Tesis", "🎤 Congreso", "💰 Financiamiento"],
+            ["📄 Artículo", "📚 Tesis", "🎤 Congreso", "💰 Financiamiento", "📥 Importación masiva", "🔎 Buscar registros"],
             index=0
         )
         st.markdown("---")
         st.info("Ingrese la referencia completa en el formato sugerido")
+        aviso_legado(config)
         
         if st.button("🚪 Salir"):
             st.session_state.autenticado = False
@@ -205,15 +388,53 @@ def main():
         "💰 Financiamiento": "fin"
     }
     
-    contenido = formulario_simplificado(tipo_map[tipo])
-    
-    if contenido:
-        with st.spinner("Guardando registro en servidor remoto..."):
-            if gestionar_archivo_remoto(config, config[f'remote_file_{tipo_map[tipo]}'], contenido):
-                st.success("✅ Registro guardado en servidor remoto con éxito!")
-                enviar_notificacion(config, tipo[2:].lower(), contenido)
+    if tipo in tipo_map:
+        captura = formulario_simplificado(tipo_map[tipo])
+        
+        if captura:
+            contenido, registro = captura
+            coincidencias = buscar_duplicados(config, registro)
+            if not coincidencias:
+                guardar_registro(config, tipo, contenido, registro)
+            elif config.get('duplicate_policy', 'advertir') == 'bloquear':
+                st.error(f"❌ Registro duplicado, no se guardó: coincide por {describir_coincidencias(coincidencias)}")
             else:
-                st.error("❌ Error al guardar el registro en el servidor remoto")
+                st.session_state.duplicado_pendiente = (tipo, contenido, registro, coincidencias)
+        
+        if st.session_state.get('duplicado_pendiente'):
+            tipo_dup, contenido_dup, registro_dup, coincidencias = st.session_state.duplicado_pendiente
+            aviso = st.empty()
+            aviso.warning(f"⚠️ Posible duplicado: coincide por {describir_coincidencias(coincidencias)}")
+            col_guardar, col_descartar = st.columns(2)
+            if col_guardar.button("💾 Guardar de todos modos"):
+                del st.session_state.duplicado_pendiente
+                aviso.empty()
+                guardar_registro(config, tipo_dup, contenido_dup, registro_dup)
+            if col_descartar.button("🗑️ Descartar"):
+                del st.session_state.duplicado_pendiente
+                st.rerun()
+    elif tipo == "📥 Importación masiva":
+        vista_importacion(config)
+    else:
+        vista_busqueda(config)
+    
+    # Estado del envío en segundo plano
+    with st.sidebar:
+        estado = obtener_diario_capturas(config).estado()
+        st.caption(f"📤 Pendientes de envío: {estado['pendientes']} | Enviados: {estado['enviados']}")
+        if estado['ultimo_error']:
+            st.caption(f"⚠️ Último error de envío: {estado['ultimo_error']}")
+        avisos = obtener_notificador(config).estado()
+        st.caption(f"✉️ Notificaciones pendientes: {avisos['pendientes']} | Enviadas: {avisos['enviados']}")
+        if avisos['ultimo_error']:
+            st.caption(f"⚠️ Último error de correo: {avisos['ultimo_error']}")
+        almacen = obtener_almacen(config)
+        if hasattr(almacen, 'estado_replicas'):
+            for replica in almacen.estado_replicas():
+                st.caption(f"🗄️ Réplica {replica['replica']}: {replica['pendientes']} bloques por reparar")
+                if replica['ultimo_error']:
+                    st.caption(f"⚠️ Último error de reparación: {replica['ultimo_error']}")
+        trazas.panel(config)
 
 if __name__ == "__main__":
     main()
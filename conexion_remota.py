@@ -0,0 +1,243 @@
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from trazas import tramo
+
+# Parámetros por defecto del pool de conexiones
+MAX_TRANSPORTES = 2       # Transportes autenticados por servidor
+MAX_CANALES = 8           # Canales (exec/SFTP) simultáneos por servidor
+KEEPALIVE_SEGUNDOS = 30
+TIMEOUT_CONEXION = 10     # Segundos para conectar y para cada respuesta del servidor
+ESPERA_BLOQUEO = 60       # Segundos máximos esperando el candado de un archivo remoto
+BLOQUEO_CADUCADO = 30     # Segundos sin cambios tras los que un candado se da por abandonado
+
+
+@contextmanager
+def candado(sftp, ruta, espera=ESPERA_BLOQUEO, caducidad=BLOQUEO_CADUCADO):
+    """Candado consultivo entre escritores: el directorio `ruta` existe mientras alguien escribe.
+
+    mkdir es atómico en el servidor, así que solo un cliente lo crea. Si el
+    candado no cambia durante `caducidad` segundos (medidos con el reloj
+    local, sin depender del reloj del servidor) se considera abandonado.
+    """
+    limite = time.monotonic() + espera
+    visto, desde = None, None
+    pausa = 0.02
+    while True:
+        try:
+            sftp.mkdir(ruta)
+            break
+        except IOError:
+            pass
+        try:
+            marca = sftp.stat(ruta).st_mtime
+        except IOError:
+            marca = None
+        if marca is not None and marca != visto:
+            visto, desde = marca, time.monotonic()
+        elif marca is not None and time.monotonic() - desde > caducidad:
+            try:
+                sftp.rmdir(ruta)
+            except IOError:
+                pass
+            visto = None
+            continue
+        if time.monotonic() > limite:
+            raise TimeoutError(f"No se obtuvo el candado {ruta} en {espera} s")
+        time.sleep(pausa)
+        pausa = min(pausa * 2, 0.5)
+    try:
+        yield
+    finally:
+        try:
+            sftp.rmdir(ruta)
+        except IOError:
+            pass
+
+
+def anexar_sftp(sftp, ruta, datos, cabecera=None):
+    """Agrega `datos` (bytes) al final de `ruta` por SFTP y devuelve el offset donde quedaron.
+
+    El archivo se crea si no existe, con `cabecera` al inicio si se indica.
+    Mientras dura la escritura se retiene el candado `ruta + '.lock'`, así
+    que escritores simultáneos no intercalan sus bloques. El offset se
+    confirma con un stat después de cerrar el archivo.
+    """
+    with tramo('sftp.anexar', bytes=len(datos)) as traza:
+        with candado(sftp, ruta + '.lock'):
+            with sftp.open(ruta, 'ab') as archivo:
+                # Las escrituras se encadenan sin esperar cada confirmación; close las espera
+                archivo.set_pipelined(True)
+                inicio = archivo.tell()
+                if inicio == 0 and cabecera:
+                    archivo.write(cabecera)
+                    inicio = len(cabecera)
+                archivo.write(datos)
+            final = sftp.stat(ruta).st_size
+        if final < inicio + len(datos):
+            raise IOError(f"Escritura incompleta en {ruta}: {final} bytes, se esperaban {inicio + len(datos)}")
+        traza.anotar(offset=inicio)
+        return inicio
+
+
+class PoolSSH:
+    """Pool de transportes SSH autenticados contra un mismo servidor.
+
+    Cada transporte se abre una sola vez (TCP + intercambio de llaves + login)
+    y se reutiliza para abrir canales ligeros. Los transportes caídos se
+    descartan y se reconectan de forma automática. Las conexiones nuevas se
+    abren fuera del candado: un servidor lento o caído no hace esperar a
+    quien puede usar un transporte ya abierto.
+    """
+
+    def __init__(self, host, port, usuario, password,
+                 max_transportes=MAX_TRANSPORTES, max_canales=MAX_CANALES,
+                 keepalive=KEEPALIVE_SEGUNDOS, timeout=TIMEOUT_CONEXION):
+        self.host = host
+        self.port = int(port)
+        self.usuario = usuario
+        self._password = password
+        self.max_transportes = max(1, int(max_transportes))
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self._transportes = []
+        self._turno = 0
+        self._lock = threading.Lock()
+        # Conexiones en curso (ocupan cupo) y su resultado, para quien espera sin transporte
+        self._conectando = 0
+        self._intentos = 0
+        self._ultimo_error = None
+        self._conectado = threading.Condition(self._lock)
+        self._canales = threading.BoundedSemaphore(max(1, int(max_canales)))
+
+    def _conectar(self):
+        """Abre y autentica un transporte nuevo"""
+        import paramiko
+
+        with tramo('ssh.conectar', host=self.host):
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            transporte = paramiko.Transport(sock)
+            try:
+                transporte.start_client(timeout=self.timeout)
+                transporte.auth_password(self.usuario, self._password)
+            except Exception:
+                transporte.close()
+                raise
+        transporte.set_keepalive(self.keepalive)
+        return transporte
+
+    @staticmethod
+    def _saludable(transporte):
+        return transporte.is_active() and transporte.is_authenticated()
+
+    def _obtener_transporte(self):
+        """Devuelve un transporte sano, creando uno nuevo si hay cupo"""
+        with self._lock:
+            while True:
+                vivos = [t for t in self._transportes if self._saludable(t)]
+                for t in self._transportes:
+                    if t not in vivos:
+                        t.close()
+                self._transportes = vivos
+
+                if len(self._transportes) + self._conectando < self.max_transportes:
+                    self._conectando += 1  # Se reserva el cupo; la conexión se abre sin el candado
+                    break
+                if self._transportes:
+                    self._turno = (self._turno + 1) % len(self._transportes)
+                    return self._transportes[self._turno]
+
+                # Todo el cupo se está conectando: se espera ese resultado en lugar de abrir otro
+                intento = self._intentos
+                while self._intentos == intento:
+                    self._conectado.wait()
+                if self._ultimo_error is not None and not self._transportes:
+                    raise self._ultimo_error
+
+        transporte, error = None, None
+        try:
+            transporte = self._conectar()
+            return transporte
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self._lock:
+                self._conectando -= 1
+                self._intentos += 1
+                self._ultimo_error = error
+                if transporte is not None:
+                    self._transportes.append(transporte)
+                self._conectado.notify_all()
+
+    def _descartar(self, transporte):
+        with self._lock:
+            if transporte in self._transportes:
+                self._transportes.remove(transporte)
+        transporte.close()
+
+    def _abrir(self, abrir_canal):
+        """Abre un canal reintentando una vez con un transporte nuevo"""
+        import paramiko
+
+        for intento in range(2):
+            transporte = self._obtener_transporte()
+            try:
+                return abrir_canal(transporte)
+            except (paramiko.SSHException, EOFError, OSError):
+                self._descartar(transporte)
+                if intento:
+                    raise
+
+    @contextmanager
+    def sftp(self):
+        """Cliente SFTP sobre un transporte del pool"""
+        import paramiko
+
+        with self._canales:
+            cliente = self._abrir(paramiko.SFTPClient.from_transport)
+            # Sin esto, un servidor que deja de responder bloquea la operación para siempre
+            cliente.get_channel().settimeout(self.timeout)
+            try:
+                yield cliente
+            finally:
+                cliente.close()
+
+    def cerrar(self):
+        with self._lock:
+            for transporte in self._transportes:
+                transporte.close()
+            self._transportes = []
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obtener_pool(config):
+    """Devuelve el pool del proceso para el servidor indicado en la configuración"""
+    clave = (config['remote_host'], int(config['remote_port']), config['remote_user'])
+    with _pools_lock:
+        pool = _pools.get(clave)
+        if pool is None:
+            pool = PoolSSH(
+                config['remote_host'],
+                config['remote_port'],
+                config['remote_user'],
+                config['remote_password'],
+                max_transportes=config.get('remote_max_transportes', MAX_TRANSPORTES),
+                max_canales=config.get('remote_max_canales', MAX_CANALES),
+                keepalive=config.get('remote_keepalive', KEEPALIVE_SEGUNDOS),
+                timeout=config.get('remote_timeout', TIMEOUT_CONEXION),
+            )
+            _pools[clave] = pool
+        return pool
+
+
+def cerrar_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.cerrar()
+        _pools.clear()
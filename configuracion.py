@@ -0,0 +1,238 @@
+import dataclasses
+import os
+import threading
+from pathlib import Path
+
+import streamlit as st
+
+RUTA_SECRETS = Path('.streamlit') / 'secrets.toml'
+
+# Claves sin las que las aplicaciones no pueden funcionar
+REQUERIDAS_REMOTO = (
+    'remote_password', 'remote_file_art', 'remote_file_tes', 'remote_file_con', 'remote_file_fin',
+)
+# Según el almacén de los archivos de registros (storage_backend)
+REQUERIDAS_ALMACEN = {
+    'ssh': ('remote_host', 'remote_port', 'remote_user', 'remote_dir'),
+    'local': ('storage_dir',),
+}
+REQUERIDAS_CORREO = (
+    'smtp_server', 'smtp_port', 'email_user', 'email_password', 'notification_email',
+)
+POLITICAS_DUPLICADOS = ('advertir', 'bloquear')
+POLITICAS_SEGMENTOS = ('anio', 'tamano')
+# Clave que ubica a cada réplica según su almacén; las demás se heredan de la configuración principal
+UBICACION_REPLICA = {'ssh': 'remote_host', 'local': 'storage_dir'}
+
+
+class ErrorConfiguracion(ValueError):
+    """Faltan claves en secrets.toml o tienen un valor que no se puede convertir"""
+
+
+@dataclasses.dataclass(frozen=True)
+class Configuracion:
+    """Configuración validada de las aplicaciones; inmutable.
+
+    Se lee como el dict de antes (`config['remote_host']`,
+    `config.get('mirror_dir', '.gea_espejo')`), así que los módulos que la
+    reciben no cambian. Las claves opcionales no definidas valen None y
+    `get` devuelve entonces el valor por defecto de quien la consulta.
+    """
+
+    remote_password: str
+    remote_file_art: str
+    remote_file_tes: str
+    remote_file_con: str
+    remote_file_fin: str
+    storage_backend: str = None
+    storage_dir: str = None
+    storage_segments: str = None
+    storage_segment_mb: float = None
+    storage_compress: bool = None
+    remote_host: str = None
+    remote_port: int = None
+    remote_user: str = None
+    remote_dir: str = None
+    # Tablas [[replicas]], cada una como pares (clave, valor)
+    replicas: tuple = None
+    replica_quorum: int = None
+    smtp_server: str = None
+    smtp_port: int = None
+    smtp_starttls: bool = None
+    email_user: str = None
+    email_password: str = None
+    notification_email: str = None
+    notification_digest_seconds: float = None
+    remote_max_transportes: int = None
+    remote_max_canales: int = None
+    remote_keepalive: int = None
+    remote_timeout: float = None
+    mirror_dir: str = None
+    journal_dir: str = None
+    duplicate_policy: str = None
+    tracing: bool = None
+    tracing_log_file: str = None
+    admin_password: str = None
+    # Claves no reconocidas, como pares (clave, valor)
+    extras: tuple = ()
+
+    def __getitem__(self, clave):
+        valor = self.get(clave)
+        if valor is None:
+            raise KeyError(clave)
+        return valor
+
+    def __contains__(self, clave):
+        return self.get(clave) is not None
+
+    def get(self, clave, defecto=None):
+        if clave in _CAMPOS:
+            valor = getattr(self, clave)
+        else:
+            valor = dict(self.extras).get(clave)
+        return defecto if valor is None else valor
+
+
+_CAMPOS = {campo.name: campo.type for campo in dataclasses.fields(Configuracion) if campo.name != 'extras'}
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    texto = str(valor).strip().lower()
+    if texto in ('1', 'true', 'si', 'sí', 'yes'):
+        return True
+    if texto in ('0', 'false', 'no', ''):
+        return False
+    raise ValueError(f"no es un booleano: {valor!r}")
+
+
+def _replicas(valor):
+    """Lista de tablas [[replicas]] -> tupla de réplicas, cada una como pares (clave, valor) convertidos"""
+    if isinstance(valor, (str, bytes, dict)):
+        raise ValueError("se esperaba una lista de tablas [[replicas]]")
+    replicas = []
+    for numero, replica in enumerate(valor, 1):
+        pares = []
+        for clave, dato in dict(replica).items():
+            tipo = _CAMPOS.get(clave)
+            if tipo is None or tipo is tuple:
+                raise ValueError(f"réplica {numero}: clave no admitida {clave}")
+            try:
+                pares.append((clave, _CONVERTIDORES[tipo](dato)))
+            except (TypeError, ValueError):
+                # Sin el valor: puede ser una contraseña
+                raise ValueError(f"réplica {numero}: {clave} no es {tipo.__name__}") from None
+        replicas.append(tuple(sorted(pares)))
+    return tuple(replicas)
+
+
+_CONVERTIDORES = {str: lambda v: str(v).strip(), int: int, float: float, bool: _booleano, tuple: _replicas}
+
+
+def validar(datos, correo=True):
+    """Convierte el dict de secrets.toml en una Configuracion o lanza ErrorConfiguracion.
+
+    Reporta todas las claves faltantes o inválidas de una sola vez. Con
+    `correo=False` no se exigen las claves SMTP (página pública); las del
+    servidor remoto solo se exigen con `storage_backend = "ssh"`, el valor
+    por defecto. Cada réplica debe indicar su `remote_host` (o su
+    `storage_dir` si es local).
+    """
+    almacen = str(datos.get('storage_backend') or 'ssh').strip()
+    requeridas = REQUERIDAS_REMOTO + REQUERIDAS_ALMACEN.get(almacen, ()) + (REQUERIDAS_CORREO if correo else ())
+    faltantes = [clave for clave in requeridas if datos.get(clave) in (None, '')]
+    valores, invalidas = {}, []
+    for clave, tipo in _CAMPOS.items():
+        valor = datos.get(clave)
+        if valor is None or valor == '':
+            continue
+        try:
+            valores[clave] = _CONVERTIDORES[tipo](valor)
+        except (TypeError, ValueError) as e:
+            invalidas.append(f"{clave} ({e})" if tipo is tuple else f"{clave} ({tipo.__name__}: {valor!r})")
+    if valores.get('duplicate_policy') not in (None,) + POLITICAS_DUPLICADOS:
+        invalidas.append(f"duplicate_policy ({' o '.join(POLITICAS_DUPLICADOS)}: {valores['duplicate_policy']!r})")
+    if valores.get('storage_segments') not in (None,) + POLITICAS_SEGMENTOS:
+        invalidas.append(f"storage_segments ({' o '.join(POLITICAS_SEGMENTOS)}: {valores['storage_segments']!r})")
+    if almacen not in REQUERIDAS_ALMACEN:
+        invalidas.append(f"storage_backend ({' o '.join(REQUERIDAS_ALMACEN)}: {almacen!r})")
+    replicas = valores.get('replicas', ())
+    for numero, replica in enumerate(replicas, 1):
+        almacen_replica = dict(replica).get('storage_backend', almacen)
+        if almacen_replica not in UBICACION_REPLICA:
+            invalidas.append(f"replicas (réplica {numero}: storage_backend {almacen_replica!r})")
+        elif UBICACION_REPLICA[almacen_replica] not in dict(replica):
+            invalidas.append(f"replicas (réplica {numero}: falta {UBICACION_REPLICA[almacen_replica]})")
+    if not 1 <= valores.get('replica_quorum', 1) <= len(replicas) + 1:
+        invalidas.append(f"replica_quorum (entre 1 y {len(replicas) + 1}: {valores['replica_quorum']!r})")
+    if 'remote_dir' in valores and valores['remote_dir'] != '/':
+        valores['remote_dir'] = valores['remote_dir'].rstrip('/')
+
+    errores = []
+    if faltantes:
+        errores.append(f"faltan {', '.join(faltantes)}")
+    if invalidas:
+        errores.append(f"valores inválidos en {', '.join(invalidas)}")
+    if errores:
+        raise ErrorConfiguracion("; ".join(errores))
+
+    extras = tuple(sorted((clave, valor) for clave, valor in datos.items() if clave not in _CAMPOS))
+    return Configuracion(extras=extras, **valores)
+
+
+def _mtime(ruta):
+    try:
+        return os.stat(ruta).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _rutas_secrets():
+    try:
+        from streamlit import config as config_streamlit
+        return tuple(config_streamlit.get_option('secrets.files'))
+    except Exception:
+        return (str(RUTA_SECRETS),)
+
+
+def _leer():
+    """Dict crudo de st.secrets o, si Streamlit no lo puede leer, de .streamlit/secrets.toml"""
+    try:
+        return dict(st.secrets)
+    except Exception:
+        try:
+            import toml
+            with open(RUTA_SECRETS, 'r') as f:
+                return toml.load(f)
+        except Exception as e:
+            raise ErrorConfiguracion(f"no se pudo leer {RUTA_SECRETS}: {e}") from e
+
+
+# (correo) -> (objeto st.secrets, mtimes de los archivos, Configuracion)
+_cargadas = {}
+_cargadas_lock = threading.Lock()
+
+
+def cargar_configuracion(correo=True):
+    """Configuración del proceso; solo se vuelve a leer si cambió algún secrets.toml.
+
+    La validación ocurre en la primera carga: una clave faltante se reporta
+    al arrancar y no como KeyError a mitad de una petición.
+    """
+    # st.secrets es el mismo objeto durante toda la vida del servidor; AppTest
+    # lo reemplaza en cada ejecución y entonces se vuelve a validar
+    fuente = st.secrets
+    mtimes = tuple(_mtime(ruta) for ruta in _rutas_secrets())
+    with _cargadas_lock:
+        guardada = _cargadas.get(correo)
+        if guardada and guardada[0] is fuente:
+            if guardada[1] == mtimes:
+                return guardada[2]
+            # El archivo cambió: Streamlit solo lo relee si vigila archivos, así que se fuerza
+            reiniciar = getattr(fuente, '_reset', None)
+            if reiniciar is not None:
+                reiniciar()
+        config = validar(_leer(), correo=correo)
+        _cargadas[correo] = (fuente, mtimes, config)
+        return config
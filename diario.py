@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+# Parámetros por defecto del envío en segundo plano
+TAM_LOTE = 1000           # Registros por archivo remoto en cada envío
+ESPERA_INICIAL = 2        # Segundos antes del primer reintento
+ESPERA_MAXIMA = 300       # Tope del reintento exponencial
+TAM_COMPACTACION = 1 << 20  # Bytes a partir de los que se trunca un diario sin pendientes
+
+
+class Diario:
+    """Diario local de escritura anticipada para los registros capturados.
+
+    Cada registro se agrega con fsync a un archivo JSONL antes de confirmar
+    la captura; un hilo de fondo los envía por lotes con `enviar(archivo,
+    entradas)` y escribe una marca de confirmación ("ack") cuando el envío
+    tuvo éxito, con el offset remoto que `enviar` devuelva. Al reiniciar, los
+    registros sin confirmación se reenvían.
+    """
+
+    def __init__(self, ruta, enviar, tam_lote=TAM_LOTE,
+                 espera_inicial=ESPERA_INICIAL, espera_maxima=ESPERA_MAXIMA):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._enviar = enviar
+        self.tam_lote = tam_lote
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self._pendientes = OrderedDict()
+        self._lock = threading.Lock()
+        self._hay_trabajo = threading.Event()
+        self._detenido = threading.Event()
+        self.enviados = 0
+        self.ultimo_error = None
+        self.ultimo_envio = None
+        self._cargar()
+        self._hilo = threading.Thread(target=self._vaciar, name="gea-diario", daemon=True)
+        self._hilo.start()
+        if self._pendientes:
+            self._hay_trabajo.set()
+
+    def _cargar(self):
+        """Reconstruye los pendientes a partir del diario en disco"""
+        if not self.ruta.exists():
+            return
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    entrada = json.loads(linea)
+                except json.JSONDecodeError:
+                    # Última línea incompleta por una caída a mitad de escritura
+                    continue
+                if entrada.get('op') == 'registro':
+                    self._pendientes[entrada['id']] = entrada
+                elif entrada.get('op') == 'ack':
+                    for id_registro in entrada['ids']:
+                        self._pendientes.pop(id_registro, None)
+
+    def _escribir(self, entradas):
+        with open(self.ruta, 'a', encoding='utf-8') as f:
+            for entrada in entradas:
+                f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def agregar(self, archivo, contenido):
+        """Guarda un registro de forma durable y devuelve su identificador"""
+        return self.agregar_lote(archivo, [contenido])[0]
+
+    def agregar_lote(self, archivo, contenidos):
+        """Guarda varios registros con una sola escritura y fsync; devuelve sus identificadores"""
+        fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        entradas = [
+            {
+                'op': 'registro',
+                'id': uuid.uuid4().hex,
+                'archivo': archivo,
+                'fecha': fecha,
+                'contenido': contenido,
+            }
+            for contenido in contenidos
+        ]
+        with self._lock:
+            self._escribir(entradas)
+            for entrada in entradas:
+                self._pendientes[entrada['id']] = entrada
+        self._hay_trabajo.set()
+        return [entrada['id'] for entrada in entradas]
+
+    def _lotes(self):
+        """Agrupa los pendientes por archivo remoto respetando el orden de captura"""
+        with self._lock:
+            lotes = OrderedDict()
+            for entrada in self._pendientes.values():
+                lote = lotes.setdefault(entrada['archivo'], [])
+                if len(lote) < self.tam_lote:
+                    lote.append(entrada)
+            return lotes
+
+    def _confirmar(self, entradas, offset=None):
+        ack = {'op': 'ack', 'ids': [e['id'] for e in entradas]}
+        if offset is not None:
+            ack['archivo'], ack['offset'] = entradas[0]['archivo'], offset
+        with self._lock:
+            self._escribir([ack])
+            for entrada in entradas:
+                self._pendientes.pop(entrada['id'], None)
+            self.enviados += len(entradas)
+            self.ultimo_envio = datetime.now()
+            if not self._pendientes and self.ruta.stat().st_size > TAM_COMPACTACION:
+                self.ruta.write_text('', encoding='utf-8')
+
+    def enviar_pendientes(self):
+        """Envía un lote por archivo; devuelve False si algún envío falló"""
+        exito = True
+        for archivo, entradas in self._lotes().items():
+            try:
+                offset = self._enviar(archivo, entradas)
+            except Exception as e:
+                self.ultimo_error = f"{datetime.now():%H:%M:%S} {archivo}: {e}"
+                exito = False
+                continue
+            self._confirmar(entradas, offset)
+        if exito:
+            self.ultimo_error = None
+        return exito
+
+    def _vaciar(self):
+        espera = self.espera_inicial
+        while not self._detenido.is_set():
+            self._hay_trabajo.wait()
+            self._hay_trabajo.clear()
+            if self._detenido.is_set():
+                break
+            if self.enviar_pendientes():
+                espera = self.espera_inicial
+            else:
+                # Los registros nuevos no adelantan el reintento contra un servidor caído
+                self._detenido.wait(espera)
+                espera = min(espera * 2, self.espera_maxima)
+            if self._pendientes:
+                self._hay_trabajo.set()
+
+    def estado(self):
+        with self._lock:
+            return {
+                'pendientes': len(self._pendientes),
+                'enviados': self.enviados,
+                'ultimo_envio': self.ultimo_envio,
+                'ultimo_error': self.ultimo_error,
+            }
+
+    def detener(self):
+        self._detenido.set()
+        self._hay_trabajo.set()
+        self._hilo.join(timeout=5)
+
+
+_diarios = {}
+_diarios_lock = threading.Lock()
+
+
+def obtener_diario(ruta, enviar):
+    """Devuelve el diario del proceso para `ruta`, creándolo con `enviar` la primera vez"""
+    clave = str(Path(ruta).resolve())
+    with _diarios_lock:
+        diario = _diarios.get(clave)
+        if diario is None:
+            diario = Diario(ruta, enviar)
+            _diarios[clave] = diario
+        return diario
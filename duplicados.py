@@ -0,0 +1,99 @@
+import re
+import threading
+import unicodedata
+
+from espejo import TIPOS
+
+_NO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+_PREFIJO_DOI = re.compile(r'^(https?://(dx\.)?doi\.org/|doi:\s*)', re.IGNORECASE)
+
+
+def _normalizar(texto):
+    sin_acentos = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode().lower()
+    return _NO_ALFANUMERICO.sub(' ', sin_acentos).strip()
+
+
+def _compacto(texto):
+    return _normalizar(texto).replace(' ', '')
+
+
+def normalizar_doi(doi):
+    return _PREFIJO_DOI.sub('', doi.strip()).strip().lower()
+
+
+def claves(registro):
+    """Claves normalizadas que identifican un registro.
+
+    - DOI
+    - ISSN/ISBN + título
+    - huella de título + apellido del primer autor
+    - clave del proyecto (financiamientos)
+    """
+    campos = registro.get('campos', {})
+    titulo = _normalizar(campos.get('titulo', ''))
+    resultado = []
+
+    if campos.get('doi'):
+        resultado.append(f"doi:{normalizar_doi(campos['doi'])}")
+    for campo in ('issn', 'isbn'):
+        if campos.get(campo) and titulo:
+            resultado.append(f"{campo}:{_compacto(campos[campo])}|{titulo}")
+    if registro.get('tipo') == 'fin' and campos.get('clave'):
+        resultado.append(f"clave:{_compacto(campos['clave'])}")
+    if titulo:
+        autores = campos.get('autores') or ['']
+        palabras = _normalizar(autores[0]).split()
+        apellido = max(palabras, key=len) if palabras else ''
+        resultado.append(f"huella:{registro.get('tipo')}|{titulo}|{apellido}")
+    return resultado
+
+
+class IndiceDuplicados:
+    """Tabla hash de claves normalizadas -> id del registro que las tiene"""
+
+    def __init__(self):
+        self._claves = {}
+        self._posiciones = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._claves)
+
+    def buscar(self, registro):
+        """Lista de (clave, id) ya registrados que coinciden con el registro"""
+        return [
+            (clave, self._claves[clave])
+            for clave in claves(registro)
+            if clave in self._claves and self._claves[clave] != registro.get('id')
+        ]
+
+    def agregar(self, registro):
+        with self._lock:
+            for clave in claves(registro):
+                self._claves.setdefault(clave, registro.get('id'))
+
+    def actualizar(self, espejo):
+        """Agrega las claves de lo que el espejo local trajo desde la última llamada"""
+        with self._lock:
+            posiciones = dict(self._posiciones)
+        for tipo in TIPOS:
+            registros, posiciones[tipo] = espejo.nuevos(tipo, posiciones.get(tipo))
+            for registro in registros:
+                self.agregar(registro)
+        with self._lock:
+            self._posiciones = posiciones
+
+
+_indices = {}
+_indices_lock = threading.Lock()
+
+
+def obtener_indice_duplicados(espejo):
+    """Devuelve el índice de duplicados del proceso asociado a un espejo local"""
+    clave = str(espejo.directorio)
+    with _indices_lock:
+        indice = _indices.get(clave)
+        if indice is None:
+            indice = IndiceDuplicados()
+            _indices[clave] = indice
+        return indice
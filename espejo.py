@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from almacenamiento import obtener_almacen
+from registros import archivo_estructurado, convertir_texto_legado, leer_registros
+from trazas import tramo
+
+TIPOS = ("art", "tes", "con", "fin")
+TAM_CABECERA = 64         # Bytes iniciales usados para detectar rotación del archivo remoto
+
+
+def _huella(datos):
+    return hashlib.sha1(datos).hexdigest()
+
+
+class Espejo:
+    """Copia local e incremental de los archivos de registros remotos.
+
+    Por cada tipo se guarda el desplazamiento ya copiado; cada sincronización
+    descarga solo los bytes agregados desde entonces, en una sola sesión del
+    almacén. Si el archivo remoto se truncó o fue reemplazado (cambia su
+    cabecera), o si ahora lo sirve otra réplica, se vuelve a copiar completo.
+    """
+
+    def __init__(self, config, directorio):
+        self.config = config
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self._ruta_indice = self.directorio / 'indice.json'
+        self._lock = threading.Lock()
+        self.ultima_sincronizacion = None
+        self.ultimo_error = None
+        self.indice = self._cargar_indice()
+
+    def _cargar_indice(self):
+        try:
+            with open(self._ruta_indice, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _guardar_indice(self):
+        temporal = self._ruta_indice.with_suffix('.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.indice, f)
+        os.replace(temporal, self._ruta_indice)
+
+    def remoto(self, tipo):
+        """Nombre del archivo dentro del almacén"""
+        return archivo_estructurado(self.config[f'remote_file_{tipo}'])
+
+    def local(self, tipo):
+        return self.directorio / Path(archivo_estructurado(self.config[f'remote_file_{tipo}'])).name
+
+    def _rotado(self, sesion, tipo, entrada):
+        """Compara la cabecera remota con la copiada para detectar un archivo reemplazado"""
+        cabecera = b''.join(sesion.leer(self.remoto(tipo), 0, entrada['tam_cabecera']))
+        return _huella(cabecera) != entrada['cabecera']
+
+    def _sincronizar_tipo(self, sesion, tipo):
+        vacia = {'offset': 0, 'registros': 0, 'cabecera': _huella(b''), 'tam_cabecera': 0, 'mtime': None}
+        entrada = dict(self.indice.get(tipo, vacia))
+        local = self.local(tipo)
+        tamano, mtime = sesion.stat(self.remoto(tipo))
+
+        # Los offsets de una réplica no valen en otra: cambiar de réplica es como una rotación
+        cambio_replica = entrada['offset'] and entrada.get('origen') != sesion.origen
+        if (tamano, mtime) == (entrada['offset'], entrada['mtime']) and not cambio_replica:
+            return
+
+        # Una copia local más corta que el índice (borrada a mano) también se recopia
+        incompleta = entrada['offset'] > (local.stat().st_size if local.exists() else 0)
+        if (tamano < entrada['offset'] or cambio_replica or incompleta
+                or (entrada['offset'] and self._rotado(sesion, tipo, entrada))):
+            entrada = dict(vacia, generacion=entrada.get('generacion', 0) + 1)
+            local.write_bytes(b'')
+
+        if tamano > entrada['offset']:
+            with open(local, 'ab') as destino:
+                # Lo que una sincronización interrumpida alcanzó a copiar no quedó en el índice
+                destino.truncate(entrada['offset'])
+                resto = b''
+                for datos in sesion.leer(self.remoto(tipo), entrada['offset'], tamano - entrada['offset']):
+                    datos = resto + datos
+                    # Solo se copian líneas completas; el resto se toma en la siguiente sincronización
+                    corte = datos.rfind(b'\n') + 1
+                    destino.write(datos[:corte])
+                    resto = datos[corte:]
+                    entrada['offset'] += corte
+                    entrada['registros'] += datos.count(b'\n', 0, corte)
+
+            if entrada['tam_cabecera'] < TAM_CABECERA and entrada['offset'] > entrada['tam_cabecera']:
+                with open(local, 'rb') as f:
+                    cabecera = f.read(TAM_CABECERA)
+                entrada['cabecera'], entrada['tam_cabecera'] = _huella(cabecera), len(cabecera)
+
+        # Con una línea incompleta al final se deja el mtime sin registrar para reintentar
+        entrada['mtime'] = mtime if entrada['offset'] == tamano else None
+        entrada['origen'] = sesion.origen
+        self.indice[tipo] = entrada
+
+    def sincronizar(self, antiguedad_maxima=None):
+        """Trae lo nuevo de los cuatro archivos; devuelve False si falló la conexión
+
+        Con `antiguedad_maxima` (segundos) no se contacta al servidor si la
+        última sincronización exitosa es más reciente.
+        """
+        with self._lock:
+            if self._vigente(antiguedad_maxima):
+                return True
+            try:
+                with tramo('espejo.sincronizar'), obtener_almacen(self.config).sesion() as sesion:
+                    for tipo in TIPOS:
+                        self._sincronizar_tipo(sesion, tipo)
+            except Exception as e:
+                self.ultimo_error = f"{datetime.now():%H:%M:%S} {e}"
+                return False
+            finally:
+                self._guardar_indice()
+            self.ultimo_error = None
+            self.ultima_sincronizacion = datetime.now()
+            return True
+
+    def _vigente(self, antiguedad_maxima):
+        return antiguedad_maxima is not None and self.ultima_sincronizacion is not None and (
+            datetime.now() - self.ultima_sincronizacion).total_seconds() < antiguedad_maxima
+
+    def sincronizar_en_segundo_plano(self, antiguedad_maxima):
+        """Lanza una sincronización en un hilo si hace falta y no hay otra en curso"""
+        if self._vigente(antiguedad_maxima) or self._lock.locked():
+            return
+        threading.Thread(target=self.sincronizar, args=(antiguedad_maxima,), daemon=True).start()
+
+    def nuevos(self, tipo, posicion=None):
+        """Registros del espejo local posteriores a `posicion`.
+
+        Devuelve (registros, nueva posición). La posición incluye la generación
+        del espejo: si el archivo se volvió a copiar desde cero se relee completo.
+        """
+        local = self.local(tipo)
+        generacion = self.indice.get(tipo, {}).get('generacion', 0)
+        offset = posicion[1] if posicion and posicion[0] == generacion else 0
+        registros = []
+        if not local.exists():
+            return registros, (generacion, 0)
+        with open(local, 'rb') as f:
+            f.seek(offset)
+            for linea in f:
+                if not linea.endswith(b'\n'):
+                    break
+                offset += len(linea)
+                try:
+                    registros.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    continue
+        return registros, (generacion, offset)
+
+    def firma_remota(self):
+        """(tamaño, mtime) de cada archivo del almacén, en una sola sesión y sin leer su contenido"""
+        with tramo('espejo.sondear'), obtener_almacen(self.config).sesion() as sesion:
+            return tuple(sesion.stat(self.remoto(tipo)) for tipo in TIPOS)
+
+    def firma_local(self):
+        """(bytes copiados, mtime) de cada tipo; igual a firma_remota cuando el espejo está al día"""
+        return tuple(
+            (self.indice.get(tipo, {}).get('offset', 0), self.indice.get(tipo, {}).get('mtime'))
+            for tipo in TIPOS
+        )
+
+    def conteos(self):
+        """Registros por tipo según el índice local"""
+        return {tipo: self.indice.get(tipo, {}).get('registros', 0) for tipo in TIPOS}
+
+    def registros(self, tipo, anio=None):
+        """Itera los registros del espejo local de un tipo"""
+        local = self.local(tipo)
+        if not local.exists():
+            return
+        with open(local, 'r', encoding='utf-8') as f:
+            yield from leer_registros(f, tipo=tipo, anio=anio)
+
+    def legado(self, tipo):
+        """Archivo de texto libre anterior a los registros JSONL, o None si remote_file_ ya es .jsonl"""
+        archivo = self.config[f'remote_file_{tipo}']
+        return None if archivo == self.remoto(tipo) else archivo
+
+    def legado_sin_migrar(self):
+        """{tipo: (tamaño, mtime)} de los archivos de texto anteriores que cambiaron desde su migración"""
+        migrados = self.indice.get('legado', {})
+        with tramo('espejo.legado'), obtener_almacen(self.config).sesion() as sesion:
+            firmas = {tipo: sesion.stat(self.legado(tipo)) for tipo in TIPOS if self.legado(tipo)}
+        return {tipo: firma for tipo, firma in firmas.items()
+                if firma[1] is not None and list(firma) != migrados.get(tipo)}
+
+    def registros_legado(self, tipos):
+        """Registros de los archivos de texto anteriores que todavía no están en el espejo, por tipo.
+
+        Sus identificadores se derivan de la fecha y el contenido: lo ya
+        migrado se reconoce aunque la migración se repita.
+        """
+        pendientes = {}
+        with tramo('espejo.legado'), obtener_almacen(self.config).sesion() as sesion:
+            for tipo in tipos:
+                texto = b''.join(sesion.leer(self.legado(tipo))).decode('utf-8', errors='replace')
+                existentes = {registro['id'] for registro in self.registros(tipo)}
+                pendientes[tipo] = [registro for registro in convertir_texto_legado(tipo, texto)
+                                    if registro['id'] not in existentes]
+        return pendientes
+
+    def marcar_legado(self, firmas):
+        """Anota los archivos de texto ya migrados para no volver a leerlos mientras no cambien"""
+        with self._lock:
+            self.indice.setdefault('legado', {}).update({tipo: list(firma) for tipo, firma in firmas.items()})
+            self._guardar_indice()
+
+
+_espejos = {}
+_espejos_lock = threading.Lock()
+
+
+def obtener_espejo(config):
+    """Devuelve el espejo del proceso para el directorio configurado en mirror_dir"""
+    directorio = str(Path(config.get('mirror_dir', '.gea_espejo')).resolve())
+    with _espejos_lock:
+        espejo = _espejos.get(directorio)
+        if espejo is None:
+            espejo = Espejo(config, directorio)
+            _espejos[directorio] = espejo
+        return espejo
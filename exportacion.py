@@ -0,0 +1,297 @@
+import csv
+import io
+import re
+import unicodedata
+import zipfile
+from xml.sax.saxutils import escape
+
+from almacenamiento import obtener_almacen
+from espejo import TIPOS
+from registros import ESQUEMAS, archivo_estructurado, leer_registros
+from trazas import tramo
+
+# Exportación de los registros a CSV, Excel (XLSX) o BibTeX. Los archivos se
+# leen del almacén por bloques y cada formato se produce como un iterador de
+# trozos de bytes, así que la memoria no crece con el tamaño de los archivos.
+
+TAM_TROZO = 256 * 1024       # Bytes acumulados antes de entregar un trozo
+FILAS_HOJA = 1048575         # Filas de datos por hoja de Excel (el límite es 1,048,576 con el encabezado)
+
+# Formato -> (extensión, tipo MIME)
+FORMATOS = {
+    'csv': ('csv', 'text/csv'),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'bib': ('bib', 'application/x-bibtex'),
+}
+
+# Columnas de CSV y Excel: las del registro y la unión de los campos de las plantillas
+COLUMNAS_REGISTRO = ('id', 'tipo', 'fecha_registro', 'anio')
+COLUMNAS_CAMPOS = tuple(dict.fromkeys(
+    campo for esquema in ESQUEMAS.values() for campo, _ in esquema.values() if campo != 'anio'))
+COLUMNAS = COLUMNAS_REGISTRO + COLUMNAS_CAMPOS + ('texto',)
+
+_VOL_NO = re.compile(r'^\s*([^()]+?)\s*(?:\(\s*([^()]+?)\s*\))?\s*$')
+_CONTROL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_ESPECIALES_BIBTEX = re.compile(r'([&%$#_])')
+
+
+def lineas_por_bloques(bloques):
+    """Líneas completas de un iterador de bloques de bytes, sin juntar el archivo"""
+    resto = b''
+    for bloque in bloques:
+        datos = resto + bloque
+        corte = datos.rfind(b'\n') + 1
+        yield from datos[:corte].splitlines()
+        resto = datos[corte:]
+    if resto:
+        yield resto
+
+
+def registros_almacen(config, tipos=TIPOS, desde=None, hasta=None):
+    """Registros de los archivos remote_file_* de los tipos pedidos, leídos del almacén por bloques.
+
+    `desde` y `hasta` filtran por año de publicación (inclusive); con un
+    filtro de año los registros sin año se omiten.
+    """
+    unico = desde if desde is not None and desde == hasta else None
+    with tramo('exportacion.leer'), obtener_almacen(config).sesion() as sesion:
+        for tipo in tipos:
+            nombre = archivo_estructurado(config[f'remote_file_{tipo}'])
+            if sesion.stat(nombre)[1] is None:
+                continue  # Tipo sin registros todavía: el archivo aún no existe
+            for registro in leer_registros(lineas_por_bloques(sesion.leer(nombre)), tipo=tipo, anio=unico):
+                anio = registro.get('anio')
+                if desde is not None and (anio is None or anio < desde):
+                    continue
+                if hasta is not None and (anio is None or anio > hasta):
+                    continue
+                yield registro
+
+
+def _valor(valor):
+    if isinstance(valor, list):
+        return '; '.join(str(v) for v in valor)
+    if isinstance(valor, bool):
+        return 'Sí' if valor else 'No'
+    return valor
+
+
+def _fila(registro):
+    campos = registro.get('campos', {})
+    return ([registro.get(columna) for columna in COLUMNAS_REGISTRO]
+            + [_valor(campos.get(columna)) for columna in COLUMNAS_CAMPOS]
+            + [registro.get('texto')])
+
+
+class _Trozos:
+    """Destino de escritura que acumula bytes hasta que se piden como trozo"""
+
+    def __init__(self):
+        self._partes = []
+        self.tamano = 0
+
+    def write(self, datos):
+        if isinstance(datos, str):
+            datos = datos.encode('utf-8')
+        self._partes.append(bytes(datos))
+        self.tamano += len(datos)
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        trozo = b''.join(self._partes)
+        self._partes, self.tamano = [], 0
+        return trozo
+
+
+def exportar_csv(registros):
+    """CSV en UTF-8 con BOM (Excel reconoce así los acentos)"""
+    texto = io.StringIO()
+    escritor = csv.writer(texto)
+    escritor.writerow(COLUMNAS)
+    yield '\ufeff'.encode('utf-8')
+    for registro in registros:
+        escritor.writerow(_fila(registro))
+        if texto.tell() >= TAM_TROZO:
+            yield texto.getvalue().encode('utf-8')
+            texto.seek(0)
+            texto.truncate()
+    yield texto.getvalue().encode('utf-8')
+
+
+def _celda(valor):
+    if valor is None or valor == '':
+        return '<c/>'
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(_CONTROL_XML.sub('', str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(valores):
+    return '<row>' + ''.join(_celda(valor) for valor in valores) + '</row>'
+
+
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_NS_HOJA = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_NS_PAQUETE = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+
+def _partes_libro(hojas):
+    """Archivos fijos del paquete XLSX para `hojas` hojas"""
+    tipo_hoja = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+    yield '[Content_Types].xml', (
+        _XML + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        + ''.join(f'<Override PartName="/xl/worksheets/sheet{n}.xml" ContentType="{tipo_hoja}"/>'
+                  for n in range(1, hojas + 1))
+        + '</Types>')
+    yield '_rels/.rels', (
+        _XML + f'<Relationships xmlns="{_NS_PAQUETE}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>')
+    yield 'xl/workbook.xml', (
+        _XML + f'<workbook xmlns="{_NS_HOJA}" xmlns:r="{_NS_REL}"><sheets>'
+        + ''.join(f'<sheet name="Registros{"" if n == 1 else f" {n}"}" sheetId="{n}" r:id="rId{n}"/>'
+                  for n in range(1, hojas + 1))
+        + '</sheets></workbook>')
+    yield 'xl/_rels/workbook.xml.rels', (
+        _XML + f'<Relationships xmlns="{_NS_PAQUETE}">'
+        + ''.join(f'<Relationship Id="rId{n}" Type="{_NS_REL}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                  for n in range(1, hojas + 1))
+        + '</Relationships>')
+
+
+def exportar_xlsx(registros):
+    """Libro de Excel escrito a mano (sin openpyxl): las hojas se comprimen conforme se generan.
+
+    Las celdas de texto van en línea (inlineStr) en lugar de en la tabla de
+    cadenas compartidas, que obligaría a conservar todos los textos hasta el
+    final. Si los registros no caben en una hoja se continúa en otra.
+    """
+    salida = _Trozos()
+    encabezado = _XML + f'<worksheet xmlns="{_NS_HOJA}"><sheetData>' + _fila_xml(COLUMNAS)
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as libro:
+        hojas, filas, hoja = 1, 0, None
+        for registro in registros:
+            if hoja is None or filas == FILAS_HOJA:
+                if hoja is not None:
+                    hoja.write(b'</sheetData></worksheet>')
+                    hoja.close()
+                    hojas += 1
+                hoja = libro.open(f'xl/worksheets/sheet{hojas}.xml', 'w', force_zip64=True)
+                hoja.write(encabezado.encode('utf-8'))
+                filas = 0
+            hoja.write(_fila_xml(_fila(registro)).encode('utf-8'))
+            filas += 1
+            if salida.tamano >= TAM_TROZO:
+                yield salida.vaciar()
+        if hoja is None:
+            hoja = libro.open('xl/worksheets/sheet1.xml', 'w')
+            hoja.write(encabezado.encode('utf-8'))
+        hoja.write(b'</sheetData></worksheet>')
+        hoja.close()
+        for nombre, contenido in _partes_libro(hojas):
+            libro.writestr(nombre, contenido)
+    yield salida.vaciar()
+
+
+def _texto_bibtex(valor):
+    texto = str(valor).replace('\\', '').replace('{', '').replace('}', '')
+    return _ESPECIALES_BIBTEX.sub(r'\\\1', ' '.join(texto.split()))
+
+
+def _clave_bibtex(registro):
+    """Palabra más larga del primer autor + año + inicio del id: estable y sin acentos"""
+    autores = registro.get('campos', {}).get('autores') or ['']
+    sin_acentos = unicodedata.normalize('NFKD', autores[0]).encode('ascii', 'ignore').decode()
+    palabras = re.sub(r'[^A-Za-z]+', ' ', sin_acentos).split()
+    apellido = max(palabras, key=len).lower() if palabras else 'gea'
+    return f"{apellido}{registro.get('anio') or ''}{registro.get('id', '')[:6]}"
+
+
+def entrada_bibtex(registro):
+    """Una entrada BibTeX con los campos equivalentes a los de la plantilla"""
+    campos = registro.get('campos', {})
+    tipo = registro.get('tipo')
+    pares = [
+        ('title', campos.get('titulo')),
+        ('author', ' and '.join(campos.get('autores', [])) or None),
+        ('year', registro.get('anio')),
+    ]
+    if tipo == 'art':
+        entrada = 'article'
+        volumen = numero = None
+        if campos.get('vol_no') and (partes := _VOL_NO.match(campos['vol_no'])):
+            volumen, numero = partes.groups()
+        pares += [('journal', campos.get('revista')), ('volume', volumen), ('number', numero),
+                  ('pages', (campos.get('paginas') or '').replace('-', '--') or None),
+                  ('doi', campos.get('doi')), ('issn', campos.get('issn')),
+                  ('keywords', ', '.join(campos.get('indexacion', [])) or None)]
+    elif tipo == 'tes':
+        entrada = 'mastersthesis' if 'maestr' in (campos.get('grado') or '').lower() else 'phdthesis'
+        pares += [('school', campos.get('institucion')), ('type', campos.get('grado')),
+                  ('note', f"Director: {campos['director']}" if campos.get('director') else None)]
+    elif tipo == 'con':
+        entrada = 'inproceedings'
+        pares += [('booktitle', campos.get('evento')), ('address', campos.get('lugar')),
+                  ('isbn', campos.get('isbn')), ('note', campos.get('fecha'))]
+    else:
+        entrada = 'misc'
+        detalle = ', '.join(f"{etiqueta}: {_valor(campos[campo])}" for etiqueta, campo in
+                            (('Fuente', 'fuente'), ('Monto', 'monto'), ('Periodo', 'periodo'),
+                             ('Clave', 'clave'), ('Tipo', 'modalidad')) if campos.get(campo) is not None)
+        pares += [('howpublished', 'Proyecto financiado'), ('note', detalle or None)]
+    cuerpo = ''.join(f",\n  {nombre} = {{{_texto_bibtex(valor)}}}" for nombre, valor in pares if valor)
+    return f"@{entrada}{{{_clave_bibtex(registro)}{cuerpo}\n}}\n\n"
+
+
+def exportar_bibtex(registros):
+    partes, tamano = [], 0
+    for registro in registros:
+        entrada = entrada_bibtex(registro)
+        partes.append(entrada)
+        tamano += len(entrada)
+        if tamano >= TAM_TROZO:
+            yield ''.join(partes).encode('utf-8')
+            partes, tamano = [], 0
+    yield ''.join(partes).encode('utf-8')
+
+
+_EXPORTADORES = {'csv': exportar_csv, 'xlsx': exportar_xlsx, 'bib': exportar_bibtex}
+
+
+def exportar(config, formato, tipos=TIPOS, desde=None, hasta=None):
+    """Trozos de bytes del archivo exportado, generados conforme se leen los registros"""
+    registros = registros_almacen(config, tipos, desde, hasta)
+    with tramo('exportacion.exportar', formato=formato):
+        yield from _EXPORTADORES[formato](registros)
+
+
+def exportar_a_archivo(config, formato, destino, tipos=TIPOS, desde=None, hasta=None):
+    """Escribe la exportación en un archivo abierto en modo binario"""
+    for trozo in exportar(config, formato, tipos, desde, hasta):
+        destino.write(trozo)
+
+
+if __name__ == "__main__":
+    # Exportación sin pasar por Streamlit: python exportacion.py csv --tipo art --desde 2020 > art.csv
+    import argparse
+    import sys
+
+    from configuracion import cargar_configuracion
+
+    parser = argparse.ArgumentParser(description="Exporta los registros de GEA")
+    parser.add_argument('formato', choices=list(FORMATOS))
+    parser.add_argument('--tipo', action='append', choices=TIPOS, help="Se puede repetir; por defecto todos")
+    parser.add_argument('--desde', type=int, help="Año de publicación inicial")
+    parser.add_argument('--hasta', type=int, help="Año de publicación final")
+    args = parser.parse_args()
+    exportar_a_archivo(cargar_configuracion(correo=False), args.formato, sys.stdout.buffer,
+                       tuple(args.tipo or TIPOS), args.desde, args.hasta)
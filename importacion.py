@@ -0,0 +1,286 @@
+import csv
+import re
+import unicodedata
+from collections import namedtuple
+
+from registros import normalizar_etiqueta
+from validacion import describir_errores, validar_referencia
+
+# Resultado de leer una referencia: línea donde empieza, tipo (art/tes/con/fin),
+# registro estructurado si se aceptó y motivo si se rechazó
+Fila = namedtuple('Fila', 'linea tipo registro error')
+
+TIPOS_BIBTEX = {
+    'article': 'art',
+    'phdthesis': 'tes',
+    'mastersthesis': 'tes',
+    'thesis': 'tes',
+    'inproceedings': 'con',
+    'conference': 'con',
+    'proceedings': 'con',
+}
+
+TIPOS_RIS = {
+    'JOUR': 'art',
+    'JFULL': 'art',
+    'EJOUR': 'art',
+    'THES': 'tes',
+    'CONF': 'con',
+    'CPAPER': 'con',
+}
+
+TIPOS_CSV = {
+    'art': 'art', 'articulo': 'art',
+    'tes': 'tes', 'tesis': 'tes',
+    'con': 'con', 'congreso': 'con',
+    'fin': 'fin', 'financiamiento': 'fin',
+}
+COLUMNA_TIPO_CSV = 'tipo de registro'
+# Encabezado normalizado de otra plantilla -> etiqueta equivalente en la plantilla de cada tipo,
+# para que un mismo CSV sirva para todos los tipos (Autores en tesis, Título en financiamiento...)
+EQUIVALENCIAS_CSV = {
+    'art': {'autor': 'Autores', 'proyecto': 'Título', 'responsable': 'Autores'},
+    'tes': {'autores': 'Autor', 'proyecto': 'Título', 'responsable': 'Autor'},
+    'con': {'autor': 'Autores', 'proyecto': 'Título', 'responsable': 'Autores'},
+    'fin': {'titulo': 'Proyecto', 'autor': 'Responsable', 'autores': 'Responsable'},
+}
+
+_ACENTOS_LATEX = re.compile(r'\\([\'`^"~])\{?([A-Za-z])\}?')
+_COMBINANTES = {"'": '\u0301', '`': '\u0300', '^': '\u0302', '"': '\u0308', '~': '\u0303'}
+_LINEA_RIS = re.compile(r'^([A-Z][A-Z0-9])  -\s?(.*)$')
+_CAMPO_BIBTEX = re.compile(r'\s*,?\s*([A-Za-z][\w-]*)\s*=\s*')
+_ENCABEZADO_BIBTEX = re.compile(r'@\s*(\w+)\s*\{\s*([^,]*),')
+
+
+def _limpiar_latex(valor):
+    valor = _ACENTOS_LATEX.sub(
+        lambda m: unicodedata.normalize('NFC', m.group(2) + _COMBINANTES[m.group(1)]), valor)
+    valor = valor.replace('\\&', '&').replace('{', '').replace('}', '')
+    return ' '.join(valor.split())
+
+
+def _nombre_natural(autor):
+    """'Posadas, Rosalinda' -> 'Rosalinda Posadas' (la coma separa autores en las plantillas)"""
+    if ',' in autor:
+        apellido, nombre = autor.split(',', 1)
+        return f"{nombre.strip()} {apellido.strip()}".strip()
+    return autor.strip()
+
+
+def _texto_plantilla(tipo, campos):
+    """Arma el texto "Clave: valor" de formulario_simplificado a partir de campos sueltos"""
+    autores = ', '.join(_nombre_natural(a) for a in campos.get('autores', []) if a.strip())
+    volumen, numero = campos.get('volumen'), campos.get('numero')
+    etiquetas = {
+        'art': [
+            ('Título', campos.get('titulo')),
+            ('Autores', autores),
+            ('Revista', campos.get('revista')),
+            ('Vol(No)', f"{volumen}({numero})" if volumen and numero else volumen),
+            ('Páginas', campos.get('paginas')),
+            ('Año', campos.get('anio')),
+            ('DOI', campos.get('doi')),
+            ('ISSN', campos.get('issn')),
+        ],
+        'tes': [
+            ('Título', campos.get('titulo')),
+            ('Autor', autores),
+            ('Tipo', campos.get('grado')),
+            ('Institución', campos.get('institucion')),
+            ('Año', campos.get('anio')),
+        ],
+        'con': [
+            ('Título', campos.get('titulo')),
+            ('Autores', autores),
+            ('Evento', campos.get('evento')),
+            ('Lugar', campos.get('lugar')),
+            ('Fecha', campos.get('fecha') or campos.get('anio')),
+            ('Memorias', campos.get('memorias')),
+            ('ISBN', campos.get('isbn')),
+        ],
+    }[tipo]
+    return '\n'.join(f"{etiqueta}: {valor}" for etiqueta, valor in etiquetas if valor)
+
+
+def _validar(linea, tipo, texto):
+    """Convierte el texto en registro o explica por qué se rechaza, con el mismo motor que la captura"""
+    if tipo is None:
+        return Fila(linea, None, None, "Tipo de referencia no soportado")
+    registro, errores = validar_referencia(tipo, texto)
+    if errores:
+        return Fila(linea, tipo, None, describir_errores(errores))
+    return Fila(linea, tipo, registro, None)
+
+
+def _campos_bibtex(cuerpo):
+    """Lee los pares campo = {valor} | "valor" | valor de una entrada BibTeX"""
+    campos = {}
+    i, n = 0, len(cuerpo)
+    while i < n:
+        coincidencia = _CAMPO_BIBTEX.match(cuerpo, i)
+        if not coincidencia:
+            break
+        nombre = coincidencia.group(1).lower()
+        i = coincidencia.end()
+        if i < n and cuerpo[i] in '{"':
+            cierre = '}' if cuerpo[i] == '{' else '"'
+            profundidad, inicio = 0, i + 1
+            while i < n:
+                if cuerpo[i] == '{':
+                    profundidad += 1
+                elif cuerpo[i] == '}':
+                    profundidad -= 1
+                if profundidad == 0 and (cierre == '}' or (cuerpo[i] == '"' and i >= inicio)):
+                    break
+                i += 1
+            valor = cuerpo[inicio:i]
+            i += 1
+        else:
+            fin = cuerpo.find(',', i)
+            fin = n if fin == -1 else fin
+            valor = cuerpo[i:fin]
+            i = fin
+        campos[nombre] = _limpiar_latex(valor)
+    return campos
+
+
+def leer_bibtex(lineas):
+    """Itera las entradas de un archivo BibTeX sin cargarlo completo"""
+    entrada, linea_inicio, profundidad = [], 0, 0
+    for numero, linea in enumerate(lineas, 1):
+        if not entrada:
+            posicion = linea.find('@')
+            if posicion == -1:
+                continue
+            linea, linea_inicio = linea[posicion:], numero
+        entrada.append(linea)
+        profundidad += linea.count('{') - linea.count('}')
+        if profundidad > 0 or '{' not in ''.join(entrada):
+            continue
+
+        texto = ''.join(entrada)
+        entrada, profundidad = [], 0
+        encabezado = _ENCABEZADO_BIBTEX.match(texto)
+        if not encabezado:
+            if not re.match(r'@\s*(comment|string|preamble)', texto, re.IGNORECASE):
+                yield Fila(linea_inicio, None, None, "Entrada BibTeX mal formada")
+            continue
+        tipo_bib = encabezado.group(1).lower()
+        cuerpo = texto[encabezado.end():texto.rfind('}')]
+        campos = _campos_bibtex(cuerpo)
+        tipo = TIPOS_BIBTEX.get(tipo_bib)
+        if tipo is None:
+            yield Fila(linea_inicio, None, None, f"Tipo BibTeX no soportado: @{tipo_bib}")
+            continue
+        yield _validar(linea_inicio, tipo, _texto_plantilla(tipo, {
+            'titulo': campos.get('title'),
+            'autores': re.split(r'\s+and\s+', campos.get('author', '')),
+            'revista': campos.get('journal'),
+            'volumen': campos.get('volume'),
+            'numero': campos.get('number'),
+            'paginas': campos.get('pages', '').replace('--', '-'),
+            'anio': campos.get('year'),
+            'doi': campos.get('doi'),
+            'issn': campos.get('issn'),
+            'isbn': campos.get('isbn'),
+            'grado': {'phdthesis': 'Doctorado', 'mastersthesis': 'Maestría'}.get(tipo_bib),
+            'institucion': campos.get('school') or campos.get('institution'),
+            'evento': campos.get('booktitle'),
+            'lugar': campos.get('address') or campos.get('location'),
+            'memorias': 'Sí' if tipo_bib in ('inproceedings', 'proceedings') else None,
+        }))
+    if entrada:
+        yield Fila(linea_inicio, None, None, "Entrada BibTeX incompleta al final del archivo")
+
+
+def leer_ris(lineas):
+    """Itera las referencias de un archivo RIS sin cargarlo completo"""
+    etiquetas, linea_inicio = None, 0
+    for numero, linea in enumerate(lineas, 1):
+        coincidencia = _LINEA_RIS.match(linea.rstrip('\r\n').lstrip('\ufeff'))
+        if not coincidencia:
+            continue
+        etiqueta, valor = coincidencia.group(1), coincidencia.group(2).strip()
+        if etiqueta == 'TY':
+            etiquetas, linea_inicio = {'TY': [valor]}, numero
+        elif etiqueta == 'ER':
+            if etiquetas is None:
+                continue
+            yield _fila_ris(linea_inicio, etiquetas)
+            etiquetas = None
+        elif etiquetas is not None:
+            etiquetas.setdefault(etiqueta, []).append(valor)
+    if etiquetas is not None:
+        yield Fila(linea_inicio, None, None, "Referencia RIS sin ER al final del archivo")
+
+
+def _fila_ris(linea, etiquetas):
+    def primero(*nombres):
+        for nombre in nombres:
+            if etiquetas.get(nombre):
+                return etiquetas[nombre][0]
+        return None
+
+    tipo_ris = primero('TY')
+    tipo = TIPOS_RIS.get(tipo_ris)
+    if tipo is None:
+        return Fila(linea, None, None, f"Tipo RIS no soportado: {tipo_ris}")
+    inicio, fin = primero('SP'), primero('EP')
+    anio = primero('PY', 'Y1', 'DA')
+    numero_issn = primero('SN')
+    return _validar(linea, tipo, _texto_plantilla(tipo, {
+        'titulo': primero('TI', 'T1'),
+        'autores': etiquetas.get('AU', []) + etiquetas.get('A1', []),
+        'revista': primero('JO', 'JF', 'T2'),
+        'volumen': primero('VL'),
+        'numero': primero('IS'),
+        'paginas': f"{inicio}-{fin}" if inicio and fin else inicio,
+        'anio': anio.split('/')[0] if anio else None,
+        'doi': primero('DO'),
+        'issn': numero_issn if tipo == 'art' else None,
+        'isbn': numero_issn if tipo == 'con' else None,
+        'institucion': primero('PB'),
+        'evento': primero('T2', 'BT') if tipo == 'con' else None,
+        'lugar': primero('CY'),
+    }))
+
+
+def leer_csv(lineas, tipo_predeterminado=None):
+    """Itera las filas de un CSV cuyos encabezados son las etiquetas de las plantillas.
+
+    La columna opcional "Tipo de registro" (art/tes/con/fin) indica el tipo de
+    cada fila; sin ella se usa `tipo_predeterminado`. Los encabezados comunes
+    se traducen a la etiqueta del tipo de la fila (ver EQUIVALENCIAS_CSV).
+    """
+    lector = csv.reader(lineas)
+    try:
+        encabezados = next(lector)
+    except StopIteration:
+        return
+    encabezados = [e.lstrip('\ufeff').strip() for e in encabezados]
+    for fila in lector:
+        if not any(celda.strip() for celda in fila):
+            continue
+        tipo = tipo_predeterminado
+        celdas = []
+        for encabezado, valor in zip(encabezados, fila):
+            if normalizar_etiqueta(encabezado) == COLUMNA_TIPO_CSV:
+                tipo = TIPOS_CSV.get(normalizar_etiqueta(valor)) if valor.strip() else tipo_predeterminado
+            elif valor.strip():
+                celdas.append((encabezado, valor.strip()))
+        equivalencias = EQUIVALENCIAS_CSV.get(tipo, {})
+        lineas_texto = [f"{equivalencias.get(normalizar_etiqueta(encabezado), encabezado)}: {valor}"
+                        for encabezado, valor in celdas]
+        yield _validar(lector.line_num, tipo, '\n'.join(lineas_texto))
+
+
+def leer_referencias(nombre_archivo, lineas, tipo_predeterminado=None):
+    """Elige el lector según la extensión del archivo"""
+    extension = nombre_archivo.rsplit('.', 1)[-1].lower()
+    if extension == 'bib':
+        return leer_bibtex(lineas)
+    if extension == 'ris':
+        return leer_ris(lineas)
+    if extension == 'csv':
+        return leer_csv(lineas, tipo_predeterminado)
+    raise ValueError(f"Formato no soportado: .{extension}")
@@ -0,0 +1,177 @@
+import queue
+import smtplib
+import threading
+import time
+from datetime import datetime
+from email.message import EmailMessage
+
+from trazas import tramo
+
+# Parámetros por defecto del envío de notificaciones
+VENTANA_RESUMEN = 0       # Segundos para agrupar registros en un solo correo (0 = uno por registro)
+INACTIVIDAD_MAXIMA = 120  # Segundos tras los que se cierra la sesión SMTP ociosa
+TIMEOUT_SMTP = 30
+
+
+def construir_mensaje(config, avisos):
+    """Arma el correo para uno o varios avisos (tipo_registro, contenido, fecha, asunto)"""
+    msg = EmailMessage()
+    msg['From'] = config['email_user']
+    msg['To'] = config['notification_email']
+
+    if len(avisos) == 1:
+        tipo_registro, contenido, fecha, asunto = avisos[0]
+        if asunto:
+            msg['Subject'] = asunto
+            cuerpo = f"{contenido}\n"
+        else:
+            msg['Subject'] = f"Nuevo registro de {tipo_registro} capturado"
+            cuerpo = f"Se ha capturado un nuevo {tipo_registro} con el siguiente contenido:\n\n{contenido}\n"
+        cuerpo += f"\nFecha de registro: {fecha}"
+    else:
+        msg['Subject'] = f"Resumen: {len(avisos)} nuevos registros capturados"
+        cuerpo = f"Se han capturado {len(avisos)} registros nuevos:\n"
+        for i, (tipo_registro, contenido, fecha, _) in enumerate(avisos, 1):
+            cuerpo += f"\n--- {i}. {tipo_registro} ({fecha}) ---\n{contenido}\n"
+
+    msg.set_content(cuerpo)
+    return msg
+
+
+class Notificador:
+    """Cola de notificaciones atendida por un hilo con una sesión SMTP reutilizable.
+
+    Con `ventana` > 0 los avisos que llegan dentro de esa ventana se envían
+    juntos en un correo de resumen.
+    """
+
+    def __init__(self, config, ventana=VENTANA_RESUMEN, inactividad=INACTIVIDAD_MAXIMA):
+        self.config = config
+        self.ventana = ventana
+        self.inactividad = inactividad
+        self._cola = queue.Queue()
+        self._smtp = None
+        self.enviados = 0
+        self.correos = 0
+        self.ultimo_error = None
+        self._hilo = threading.Thread(target=self._trabajar, name="gea-notificaciones", daemon=True)
+        self._hilo.start()
+
+    def encolar(self, tipo_registro, contenido, asunto=None):
+        fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._cola.put((tipo_registro, contenido, fecha, asunto))
+
+    def _conectar(self):
+        with tramo('smtp.conectar', servidor=self.config['smtp_server']):
+            smtp = smtplib.SMTP(self.config['smtp_server'], self.config['smtp_port'], timeout=TIMEOUT_SMTP)
+            if self.config.get('smtp_starttls', True):
+                smtp.starttls()
+            smtp.login(self.config['email_user'], self.config['email_password'])
+            return smtp
+
+    def _cerrar_sesion(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _sesion(self):
+        """Devuelve la sesión abierta o una nueva si caducó"""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+        self._smtp = self._conectar()
+        return self._smtp
+
+    def _enviar(self, avisos):
+        msg = construir_mensaje(self.config, avisos)
+        with tramo('smtp.enviar', avisos=len(avisos)):
+            for intento in range(2):
+                try:
+                    self._sesion().send_message(msg)
+                    break
+                except (smtplib.SMTPServerDisconnected, OSError):
+                    # Conexión cerrada por el servidor: se reintenta una vez con sesión nueva
+                    self._smtp = None
+                    if intento:
+                        raise
+        self.enviados += len(avisos)
+        self.correos += 1
+
+    def _recoger(self, primero):
+        """Junta los avisos que llegan durante la ventana de resumen"""
+        avisos = [primero]
+        limite = time.monotonic() + self.ventana
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return avisos
+            try:
+                avisos.append(self._cola.get(timeout=restante))
+            except queue.Empty:
+                return avisos
+
+    def _trabajar(self):
+        while True:
+            try:
+                primero = self._cola.get(timeout=self.inactividad)
+            except queue.Empty:
+                self._cerrar_sesion()
+                continue
+            if primero is None:
+                self._cerrar_sesion()
+                return
+
+            avisos = self._recoger(primero) if self.ventana > 0 else [primero]
+            fin = None in avisos
+            avisos = [a for a in avisos if a is not None]
+            try:
+                if self.ventana > 0:
+                    self._enviar(avisos)
+                else:
+                    for aviso in avisos:
+                        self._enviar([aviso])
+                self.ultimo_error = None
+            except Exception as e:
+                self.ultimo_error = f"{datetime.now():%H:%M:%S} {e}"
+                self._cerrar_sesion()
+            if fin:
+                self._cerrar_sesion()
+                return
+
+    def estado(self):
+        return {
+            'pendientes': self._cola.qsize(),
+            'enviados': self.enviados,
+            'correos': self.correos,
+            'ultimo_error': self.ultimo_error,
+        }
+
+    def detener(self, timeout=10):
+        """Envía lo pendiente, cierra la sesión y termina el hilo"""
+        self._cola.put(None)
+        self._hilo.join(timeout=timeout)
+
+
+_notificadores = {}
+_notificadores_lock = threading.Lock()
+
+
+def obtener_notificador(config):
+    """Devuelve el notificador del proceso para la cuenta SMTP de la configuración"""
+    clave = (config['smtp_server'], int(config['smtp_port']), config['email_user'])
+    with _notificadores_lock:
+        notificador = _notificadores.get(clave)
+        if notificador is None:
+            notificador = Notificador(
+                config,
+                ventana=float(config.get('notification_digest_seconds', VENTANA_RESUMEN)),
+            )
+            _notificadores[clave] = notificador
+        return notificador
@@ -1,67 +1,112 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-from PIL import Image
+import functools
 import os
-from pathlib import Path
-import paramiko
-import toml
+import tempfile
+from datetime import date
 
-def main():
-    # ===== FUNCIONES DE ACCESO REMOTO =====
-    def cargar_configuracion():
-        """Carga la configuración desde secrets.toml"""
-        try:
-            config = dict(st.secrets)
-            if config.get('remote_host'):
-                return config
-        except:
-            try:
-                secrets_path = Path('.streamlit') / 'secrets.toml'
-                with open(secrets_path, 'r') as f:
-                    return toml.load(f)
-            except Exception as e:
-                st.error(f"Error de configuración: {e}")
-                return None
+import streamlit as st
+from espejo import obtener_espejo
+from exportacion import FORMATOS, exportar_a_archivo
+from analitica import obtener_analitica
+from recursos import imagen, primera_imagen
+from configuracion import ErrorConfiguracion, cargar_configuracion
+import trazas
+from trazas import tramo
 
-    def contar_registros_remotos():
-        """Obtiene el conteo de registros desde el servidor remoto usando nombres de archivos desde secrets"""
-        config = cargar_configuracion()
-        if not config:
-            return None
+# Segundos entre consultas de la firma (tamaño y mtime) de los archivos remotos
+INTERVALO_SONDEO = 15
+
+NOMBRES_TIPOS = {
+    "art": "Artículos",
+    "tes": "Tesis",
+    "con": "Congresos",
+    "fin": "Financiamientos"
+}
+
+@st.cache_data(ttl=INTERVALO_SONDEO, show_spinner=False)
+def sondear_remoto(config):
+    """Firma de los archivos remotos, compartida por todas las sesiones; devuelve (firma, error)"""
+    try:
+        return obtener_espejo(config).firma_remota(), None
+    except Exception as e:
+        return None, str(e)
+
+def sincronizar_espejo(config):
+    """Sincroniza el espejo local solo si cambió la firma remota; devuelve (firma local, error)"""
+    firma, error = sondear_remoto(config)
+    espejo = obtener_espejo(config)
+    if firma is not None and firma != espejo.firma_local():
+        if not espejo.sincronizar():
+            error = espejo.ultimo_error
+    return espejo.firma_local(), error
+
+def consultar_conteos(config):
+    """Cuenta los registros de cada tipo a partir del índice del espejo local"""
+    import pandas as pd
+
+    conteos = obtener_espejo(config).conteos()
+    resultados = [
+        {"Tipo": nombre, "Registros": conteos[tipo]}
+        for tipo, nombre in NOMBRES_TIPOS.items()
+    ]
+    return pd.DataFrame(resultados)
 
+def consultar_analitica(config):
+    """Agregados por mes, año e indexación, al día con el espejo local"""
+    espejo = obtener_espejo(config)
+    analitica = obtener_analitica(espejo)
+    analitica.actualizar(espejo)
+    return analitica
+
+NOMBRES_FORMATOS = {
+    "csv": "CSV",
+    "xlsx": "Excel (XLSX)",
+    "bib": "BibTeX"
+}
+
+def generar_exportacion(config, formato, tipos, desde, hasta):
+    """Archivo con la exportación, generado por trozos en un temporal en disco.
+
+    Streamlit la llama en un hilo aparte cuando se pulsa el botón de descarga
+    y lee el archivo completo a la memoria del servidor para servirlo; para
+    exportaciones grandes conviene la línea de comandos (python exportacion.py).
+    """
+    with tempfile.NamedTemporaryFile(prefix='gea_exportacion_', delete=False) as archivo:
         try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(
-                hostname=config['remote_host'],
-                port=config['remote_port'],
-                username=config['remote_user'],
-                password=config['remote_password']
-            )
+            exportar_a_archivo(config, formato, archivo, tipos, desde, hasta)
+        except Exception:
+            os.unlink(archivo.name)
+            raise
+    # Streamlit acepta archivos abiertos solo para lectura; el nombre ya no hace falta
+    lectura = open(archivo.name, 'rb')
+    os.unlink(archivo.name)
+    return lectura
 
-            # Usamos los nombres de archivo definidos en secrets.toml
-            archivos = {
-                "Artículos": config['remote_file_art'],
-                "Tesis": config['remote_file_tes'],
-                "Congresos": config['remote_file_con'],
-                "Financiamientos": config['remote_file_fin']
-            }
-
-            resultados = []
-            for nombre, archivo in archivos.items():
-                comando = f"if [ -f {config['remote_dir']}/{archivo} ]; then wc -l {config['remote_dir']}/{archivo} | awk '{{print $1}}'; else echo 0; fi"
-                stdin, stdout, stderr = ssh.exec_command(comando)
-                output = stdout.read().decode().strip()
-                count = int(output) if output else 0
-                resultados.append({"Tipo": nombre, "Registros": count})
-
-            ssh.close()
-            return pd.DataFrame(resultados)
+def main():
+    # ===== FUNCIONES DE ACCESO REMOTO =====
+    def contar_registros_remotos(config, avisar=True):
+        """Conteos desde el espejo local; devuelve (firma, conteos) o (None, None) si no hay datos"""
+        if not config:
+            return None, None
 
+        try:
+            with tramo('contar_registros_remotos'):
+                firma, error = sincronizar_espejo(config)
+                if error and avisar:
+                    st.warning(f"Servidor remoto no disponible ({error}); se muestran los datos del espejo local")
+                return firma, consultar_conteos(config)
         except Exception as e:
-            st.error(f"Conexión fallida: {str(e)}")
-            return None
+            if avisar:
+                st.error(f"Conexión fallida: {str(e)}")
+            return None, None
+
+    def vigente(clave, firma, construir):
+        """Reutiliza lo guardado en la sesión (tablas, figuras) mientras la firma de los datos no cambie"""
+        guardada = st.session_state.get(clave)
+        if guardada is not None and guardada[0] == firma:
+            return guardada[1]
+        figura = construir()
+        st.session_state[clave] = (firma, figura)
+        return figura
 
     # ===== CONFIGURACIÓN DE PÁGINA =====
     st.set_page_config(
@@ -70,6 +115,16 @@ def main():
         page_icon="🧬"
     )
 
+    # Configuración validada una vez por proceso; la página pública no usa SMTP
+    try:
+        config = cargar_configuracion(correo=False)
+    except ErrorConfiguracion as e:
+        st.error(f"Error de configuración: {e}")
+        config = None
+
+    # Trazas de tiempos (apagadas salvo `tracing = true` en la configuración)
+    trazas.configurar(config or {})
+
     # Paleta de colores
     color_guinda = "#6a0f1a"
     color_marrón = "#8B4513"
@@ -101,28 +156,13 @@ def main():
     </style>
     """, unsafe_allow_html=True)
 
-    # Función para cargar imágenes
-    def load_image_with_fallback(main_path, alternative_names):
-        paths_to_try = [main_path] + alternative_names
-        for img_path in paths_to_try:
-            try:
-                if os.path.exists(img_path):
-                    img = Image.open(img_path)
-                    img.verify()
-                    img = Image.open(img_path)
-                    return img, None
-            except (IOError, SyntaxError, Exception):
-                continue
-        return None, f"No se encontró imagen válida en: {', '.join(paths_to_try)}"
-
     # ===== INTERFAZ PRINCIPAL =====
     # Encabezado con logos
     col1, col2, col3 = st.columns([1, 2, 1])
     
     with col1:
         try:
-            logo_izq = Image.open("escudo_COLOR.jpg")
-            st.image(logo_izq, width=100)
+            st.image(imagen("escudo_COLOR.jpg", ancho=100), width=100, output_format="JPEG")
         except Exception as e:
             st.error(f"No se pudo cargar el logo izquierdo: {str(e)}")
 
@@ -132,22 +172,29 @@ def main():
 
     with col3:
         try:
-            logo_der = Image.open("UTF-8IMG-20250417-WA0007.jpg")
-            st.image(logo_der, width=100)
+            st.image(imagen("UTF-8IMG-20250417-WA0007.jpg", ancho=100), width=100, output_format="JPEG")
         except Exception as e:
             st.error(f"No se pudo cargar el logo derecho: {str(e)}")
 
     st.markdown("---")
 
     # ===== ESTADÍSTICAS REMOTAS =====
-    with st.expander("📈 Estadísticas de Registros", expanded=False):
+    # Cada sección de datos es un fragmento: se vuelve a ejecutar sola cada
+    # INTERVALO_SONDEO sin recorrer el resto de la página, y solo reconstruye
+    # sus gráficas cuando la firma de los archivos remotos cambió
+    colores_tipos = [color_guinda, color_marrón, color_verde_pardo, "#4B3621"]
+
+    @st.fragment(run_every=INTERVALO_SONDEO)
+    def seccion_estadisticas():
         st.markdown("""
         <div class="card">
             <h3 style="color: #6a0f1a; margin-bottom: 0.5rem;">Registros almacenados</h3>
             <div class="stats-table">
         """, unsafe_allow_html=True)
         
-        df_stats = contar_registros_remotos()
+        if st.button("🔄 Actualizar estadísticas"):
+            sondear_remoto.clear()
+        _, df_stats = contar_registros_remotos(config)
         if df_stats is not None:
             st.table(df_stats.assign(hack='').set_index('hack'))
             total = df_stats['Registros'].sum()
@@ -160,37 +207,44 @@ def main():
             st.warning("No se pudo conectar al servidor remoto")
         
         st.markdown("</div></div>", unsafe_allow_html=True)
+
+    with st.expander("📈 Estadísticas de Registros", expanded=False):
+        seccion_estadisticas()
     
     st.markdown("---")
 
     # ===== HISTOGRAMA DINÁMICO =====
-    with st.container():
+    @st.fragment(run_every=INTERVALO_SONDEO)
+    def seccion_histograma():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("📊 Distribución de Registros")
         
-        df_stats = contar_registros_remotos()
-        
+        firma, df_stats = contar_registros_remotos(config, avisar=False)
         if df_stats is not None:
-            # Creamos el gráfico con los datos reales
-            fig = px.bar(df_stats, x='Tipo', y='Registros',
-                         title="Registros por categoría",
-                         color='Tipo',
-                         color_discrete_sequence=[color_guinda, color_marrón, color_verde_pardo, "#4B3621"],
-                         text='Registros',
-                         labels={'Tipo': 'Categoría', 'Registros': 'Número de Registros'})
-            
-            fig.update_traces(textposition='outside', 
-                             marker_line_color='rgb(8,48,107)',
-                             marker_line_width=1.5)
-            fig.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                xaxis_title=None,
-                yaxis_title="Cantidad de Registros",
-                showlegend=False,
-                hovermode="x unified"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def construir():
+                # Creamos el gráfico con los datos reales
+                import plotly.express as px
+                with tramo('plotly.figura'):
+                    fig = px.bar(df_stats, x='Tipo', y='Registros',
+                                 title="Registros por categoría",
+                                 color='Tipo',
+                                 color_discrete_sequence=colores_tipos,
+                                 text='Registros',
+                                 labels={'Tipo': 'Categoría', 'Registros': 'Número de Registros'})
+                    
+                    fig.update_traces(textposition='outside', 
+                                     marker_line_color='rgb(8,48,107)',
+                                     marker_line_width=1.5)
+                    fig.update_layout(
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        xaxis_title=None,
+                        yaxis_title="Cantidad de Registros",
+                        showlegend=False,
+                        hovermode="x unified"
+                    )
+                return fig
+            st.plotly_chart(vigente('fig_distribucion', firma, construir), use_container_width=True)
             
             # Estadísticas resumidas
             total_registros = df_stats['Registros'].sum()
@@ -205,6 +259,109 @@ def main():
         
         st.markdown('</div>', unsafe_allow_html=True)
 
+    with st.container():
+        seccion_histograma()
+
+    # ===== EVOLUCIÓN TEMPORAL =====
+    @st.fragment(run_every=INTERVALO_SONDEO)
+    def seccion_evolucion():
+        st.subheader("📅 Evolución de Registros")
+
+        firma, df_stats = contar_registros_remotos(config, avisar=False)
+        if df_stats is None:
+            st.warning("No se pudieron cargar los datos de evolución")
+            return
+
+        def calcular():
+            with tramo('analitica.actualizar'):
+                analitica = consultar_analitica(config)
+            return analitica.capturas_por_mes(), analitica.publicaciones_por_anio(), analitica.por_indexacion()
+        df_meses, df_anios, df_indexacion = vigente('tablas_evolucion', firma, calcular)
+        colores_por_nombre = dict(zip(NOMBRES_TIPOS.values(), colores_tipos))
+        tab_meses, tab_anios, tab_indexacion = st.tabs(
+            ["Capturas por mes", "Publicaciones por año", "Artículos por indexación"])
+
+        with tab_meses:
+            if df_meses.empty:
+                st.info("Aún no hay capturas con fecha de registro")
+            else:
+                def construir():
+                    import plotly.express as px
+                    with tramo('plotly.figura', grafica='meses'):
+                        fig = px.bar(df_meses.assign(Tipo=df_meses['tipo'].map(NOMBRES_TIPOS)),
+                                     x='Mes', y='Registros', color='Tipo',
+                                     color_discrete_map=colores_por_nombre,
+                                     labels={'Mes': 'Mes de captura', 'Registros': 'Registros capturados'})
+                        fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                                          barmode='stack', hovermode="x unified")
+                    return fig
+                st.plotly_chart(vigente('fig_meses', firma, construir), use_container_width=True)
+
+        with tab_anios:
+            if df_anios.empty:
+                st.info("Aún no hay registros con año de publicación")
+            else:
+                def construir():
+                    import plotly.express as px
+                    with tramo('plotly.figura', grafica='anios'):
+                        fig = px.bar(df_anios.assign(Tipo=df_anios['tipo'].map(NOMBRES_TIPOS)),
+                                     x='Año', y='Registros', color='Tipo',
+                                     color_discrete_map=colores_por_nombre,
+                                     labels={'Registros': 'Número de registros'})
+                        fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                                          barmode='stack', xaxis_type='category')
+                    return fig
+                st.plotly_chart(vigente('fig_anios', firma, construir), use_container_width=True)
+
+        with tab_indexacion:
+            if df_indexacion.empty:
+                st.info("Aún no hay artículos registrados")
+            else:
+                def construir():
+                    import plotly.express as px
+                    with tramo('plotly.figura', grafica='indexacion'):
+                        fig = px.bar(df_indexacion, x='Indexación', y='Registros', text='Registros',
+                                     color_discrete_sequence=[color_guinda],
+                                     labels={'Registros': 'Artículos'})
+                        fig.update_traces(textposition='outside')
+                        fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+                    return fig
+                st.plotly_chart(vigente('fig_indexacion', firma, construir), use_container_width=True)
+                st.caption("Un artículo indexado en varias bases cuenta en cada una de ellas")
+
+    with st.container():
+        seccion_evolucion()
+
+    # ===== EXPORTACIÓN =====
+    # El archivo se genera solo al pulsar el botón, leyendo el almacén por bloques
+    with st.expander("📥 Exportar registros", expanded=False):
+        if not config:
+            st.warning("La exportación no está disponible sin configuración")
+        else:
+            col_tipos, col_formato = st.columns([2, 1])
+            with col_tipos:
+                tipos = st.multiselect("Tipos de registro:", list(NOMBRES_TIPOS), default=list(NOMBRES_TIPOS),
+                                       format_func=NOMBRES_TIPOS.get, key="exportar_tipos")
+            with col_formato:
+                formato = st.selectbox("Formato:", list(NOMBRES_FORMATOS), format_func=NOMBRES_FORMATOS.get,
+                                       key="exportar_formato")
+            desde = hasta = None
+            if st.checkbox("Filtrar por año de publicación", key="exportar_por_anio"):
+                anio_actual = date.today().year
+                col_desde, col_hasta = st.columns(2)
+                desde = col_desde.number_input("Desde:", 1900, anio_actual + 1, anio_actual - 5, key="exportar_desde")
+                hasta = col_hasta.number_input("Hasta:", 1900, anio_actual + 1, anio_actual, key="exportar_hasta")
+            extension, mime = FORMATOS[formato]
+            st.download_button(
+                "⬇️ Descargar registros",
+                data=functools.partial(generar_exportacion, config, formato, tuple(tipos), desde, hasta),
+                file_name=f"gea-registros-{date.today():%Y%m%d}.{extension}",
+                mime=mime,
+                disabled=not tipos or (desde is not None and desde > hasta),
+            )
+            if desde is not None and desde > hasta:
+                st.caption("El año inicial debe ser anterior o igual al final")
+
     # ===== SECCIONES DE CONTENIDO =====
     # Sección de Identidad Institucional
     with st.container():
@@ -226,9 +383,9 @@ def main():
     with st.container():
         st.header("🔍 Metodología del Estudio GEA")
         
-        img, error = load_image_with_fallback(
-            main_path="UTF-8IMG-20250417-WA0004.jpg",
-            alternative_names=[
+        img, error = primera_imagen(
+            [
+                "UTF-8IMG-20250417-WA0004.jpg",
                 "metodologia_gea.jpg",
                 "diagrama_gea.jpg",
                 "metodologia.jpg",
@@ -242,7 +399,8 @@ def main():
                 st.image(
                     img, 
                     caption="Flujo metodológico del estudio GEA", 
-                    use_container_width=True
+                    use_container_width=True,
+                    output_format="JPEG"
                 )
                 st.markdown("""
                 **Componentes principales:**
@@ -262,6 +420,7 @@ def main():
             
             if uploaded_file:
                 try:
+                    from PIL import Image
                     img = Image.open(uploaded_file)
                     st.image(img, use_container_width=True)
                 except Exception as e:
@@ -361,5 +520,8 @@ def main():
         unsafe_allow_html=True
     )
 
+    with st.sidebar:
+        trazas.panel(config or {})
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,73 @@
+import io
+import os
+import threading
+
+from trazas import tramo, trazar
+
+CALIDAD_JPEG = 90
+
+# (ruta absoluta, ancho, tamaño) -> (mtime del archivo, bytes JPEG)
+_imagenes = {}
+_imagenes_lock = threading.Lock()
+
+
+def _codificar(ruta, ancho=None, tamano=None):
+    """Verifica, decodifica y reduce la imagen al tamaño con el que se muestra"""
+    from PIL import Image
+
+    with Image.open(ruta) as img:
+        img.verify()
+    with Image.open(ruta) as img:
+        destino = tamano
+        if destino is None and ancho and img.width > ancho:
+            destino = (ancho, round(img.height * ancho / img.width))
+        if destino is None and img.format == 'JPEG' and img.mode in ('RGB', 'L'):
+            # Ya cabe en el espacio donde se muestra: se sirve el archivo tal cual
+            with open(ruta, 'rb') as f:
+                return f.read()
+        if destino:
+            # El decodificador JPEG reduce por potencias de 2 antes de leer todos los píxeles
+            img.draft('RGB', destino)
+        salida = img.convert('RGB')
+        if destino:
+            salida = salida.resize(destino, Image.LANCZOS)
+    datos = io.BytesIO()
+    salida.save(datos, 'JPEG', quality=CALIDAD_JPEG, optimize=True)
+    return datos.getvalue()
+
+
+@trazar('imagen.cargar')
+def imagen(ruta, ancho=None, tamano=None):
+    """Bytes JPEG de `ruta` listos para st.image, calculados una vez por proceso.
+
+    Con `ancho` se reduce proporcionalmente si la imagen es más ancha; con
+    `tamano` (ancho, alto) se ajusta exacto. El resultado se conserva mientras
+    no cambie el mtime del archivo, así que las recargas de la página no
+    vuelven a decodificar el JPEG. Lanza OSError si no existe o no es válida.
+    """
+    clave = (os.path.abspath(ruta), ancho, tamano)
+    mtime = os.stat(ruta).st_mtime_ns
+    with _imagenes_lock:
+        guardada = _imagenes.get(clave)
+    if guardada and guardada[0] == mtime:
+        return guardada[1]
+    try:
+        with tramo('imagen.decodificar', archivo=os.path.basename(ruta)):
+            datos = _codificar(ruta, ancho, tamano)
+    except (SyntaxError, ValueError) as e:
+        raise OSError(f"Imagen no válida: {ruta} ({e})") from e
+    with _imagenes_lock:
+        _imagenes[clave] = (mtime, datos)
+    return datos
+
+
+def primera_imagen(rutas, ancho=None):
+    """Devuelve (bytes, None) de la primera imagen válida de `rutas` o (None, error)"""
+    for ruta in rutas:
+        if not os.path.exists(ruta):
+            continue
+        try:
+            return imagen(ruta, ancho=ancho), None
+        except OSError:
+            continue
+    return None, f"No se encontró imagen válida en: {', '.join(rutas)}"
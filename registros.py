@@ -0,0 +1,211 @@
+import hashlib
+import json
+import re
+import unicodedata
+import uuid
+from datetime import datetime
+from pathlib import PurePosixPath
+
+# Registros estructurados: cada captura "Clave: valor" se convierte en un
+# objeto JSON y se guarda como una línea de un archivo .jsonl, de modo que
+# contar es contar líneas y filtrar no requiere volver a leer texto libre.
+
+_LINEA_CAMPO = re.compile(r'^\s*([^:]{1,40}?)\s*:\s*(.*?)\s*$')
+_ENCABEZADO_LEGADO = re.compile(r'^--- Registro del (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) ---$')
+
+
+def normalizar_etiqueta(etiqueta):
+    """'Año' -> 'ano', 'Vol(No)' -> 'vol(no)'"""
+    sin_acentos = unicodedata.normalize('NFKD', etiqueta).encode('ascii', 'ignore').decode()
+    return ' '.join(sin_acentos.lower().split())
+
+
+def _texto(valor):
+    return valor or None
+
+
+def _lista(valor):
+    return [v.strip() for v in re.split(r'[,;]', valor) if v.strip()]
+
+
+def _anio(valor):
+    coincidencia = re.search(r'\d{4}', valor)
+    return int(coincidencia.group()) if coincidencia else None
+
+
+def _booleano(valor):
+    normalizado = normalizar_etiqueta(valor)
+    if normalizado in ('si', 's', 'yes', 'true'):
+        return True
+    if normalizado in ('no', 'n', 'false'):
+        return False
+    return None
+
+
+def _monto(valor):
+    numero = re.sub(r'[^\d.]', '', valor.replace(',', ''))
+    try:
+        return float(numero)
+    except ValueError:
+        return None
+
+
+# Etiqueta normalizada -> (campo, conversor) según las plantillas de formulario_simplificado
+ESQUEMAS = {
+    "art": {
+        "titulo": ("titulo", _texto),
+        "autores": ("autores", _lista),
+        "revista": ("revista", _texto),
+        "vol(no)": ("vol_no", _texto),
+        "paginas": ("paginas", _texto),
+        "ano": ("anio", _anio),
+        "doi": ("doi", _texto),
+        "issn": ("issn", _texto),
+        "indexacion": ("indexacion", _lista),
+    },
+    "tes": {
+        "titulo": ("titulo", _texto),
+        "autor": ("autores", _lista),
+        "tipo": ("grado", _texto),
+        "director": ("director", _texto),
+        "institucion": ("institucion", _texto),
+        "ano": ("anio", _anio),
+        "departamento": ("departamento", _texto),
+        "programa": ("programa", _texto),
+    },
+    "con": {
+        "titulo": ("titulo", _texto),
+        "autores": ("autores", _lista),
+        "evento": ("evento", _texto),
+        "tipo": ("alcance", _texto),
+        "lugar": ("lugar", _texto),
+        "fecha": ("fecha", _texto),
+        "memorias": ("memorias", _booleano),
+        "isbn": ("isbn", _texto),
+    },
+    "fin": {
+        "proyecto": ("titulo", _texto),
+        "responsable": ("autores", _lista),
+        "fuente": ("fuente", _texto),
+        "monto": ("monto", _monto),
+        "periodo": ("periodo", _texto),
+        "clave": ("clave", _texto),
+        "tipo": ("modalidad", _texto),
+    },
+}
+
+
+def pares_etiquetados(contenido):
+    """Itera los pares (etiqueta, valor) de las líneas "Clave: valor" de un texto"""
+    for linea in contenido.splitlines():
+        coincidencia = _LINEA_CAMPO.match(linea)
+        if coincidencia:
+            yield coincidencia.group(1), coincidencia.group(2)
+
+
+def parsear_campos(tipo, contenido):
+    """Extrae los campos tipados de un texto con líneas "Clave: valor"
+
+    Las líneas que no corresponden a una etiqueta conocida se ignoran; el
+    texto original se conserva completo en el registro.
+    """
+    esquema = ESQUEMAS[tipo]
+    campos = {}
+    for etiqueta, texto in pares_etiquetados(contenido):
+        definicion = esquema.get(normalizar_etiqueta(etiqueta))
+        if definicion is None:
+            continue
+        campo, conversor = definicion
+        valor = conversor(texto)
+        if valor not in (None, [], ''):
+            campos[campo] = valor
+    return campos
+
+
+def crear_registro(tipo, contenido, fecha=None, id_registro=None, campos=None):
+    """Construye el registro estructurado de una captura; `campos` evita volver a parsear el texto"""
+    if campos is None:
+        campos = parsear_campos(tipo, contenido)
+    return {
+        'id': id_registro or uuid.uuid4().hex,
+        'tipo': tipo,
+        'fecha_registro': fecha or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'anio': campos.get('anio'),
+        'campos': campos,
+        'texto': contenido.strip(),
+    }
+
+
+def serializar(registro):
+    """Una línea JSONL por registro"""
+    return json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def leer_registros(lineas, tipo=None, anio=None):
+    """Itera los registros de un flujo JSONL aplicando filtros opcionales.
+
+    Las líneas se descartan con una comparación de texto antes de decodificar
+    el JSON cuando el filtro lo permite.
+    """
+    marca_tipo = f'"tipo":"{tipo}"' if tipo else None
+    marca_anio = f'"anio":{anio},' if anio is not None else None
+    for linea in lineas:
+        if isinstance(linea, bytes):
+            linea = linea.decode('utf-8')
+        if not linea.strip():
+            continue
+        if marca_tipo and marca_tipo not in linea:
+            continue
+        if marca_anio and marca_anio not in linea:
+            continue
+        try:
+            registro = json.loads(linea)
+        except json.JSONDecodeError:
+            continue
+        if tipo and registro.get('tipo') != tipo:
+            continue
+        if anio is not None and registro.get('anio') != anio:
+            continue
+        yield registro
+
+
+def archivo_estructurado(archivo):
+    """Nombre del archivo JSONL que corresponde a un remote_file_* de la configuración"""
+    ruta = PurePosixPath(archivo)
+    return str(ruta.with_suffix('.jsonl')) if ruta.suffix != '.jsonl' else archivo
+
+
+def _registro_legado(tipo, fecha, bloque):
+    contenido = '\n'.join(bloque).strip()
+    if not contenido:
+        return None
+    # Identificador estable para que migrar dos veces no duplique registros
+    id_registro = hashlib.sha1(f"{tipo}|{fecha}|{contenido}".encode()).hexdigest()[:32]
+    return crear_registro(tipo, contenido, fecha, id_registro)
+
+
+def convertir_texto_legado(tipo, texto):
+    """Convierte un archivo de texto libre ("--- Registro del ... ---") en registros"""
+    fecha = None
+    bloque = []
+    for linea in texto.splitlines():
+        coincidencia = _ENCABEZADO_LEGADO.match(linea.strip())
+        if not coincidencia:
+            bloque.append(linea)
+            continue
+        if fecha and (registro := _registro_legado(tipo, fecha, bloque)):
+            yield registro
+        fecha = coincidencia.group(1)
+        bloque = []
+    if fecha and (registro := _registro_legado(tipo, fecha, bloque)):
+        yield registro
+
+
+if __name__ == "__main__":
+    # Migración: python registros.py art articulos.txt >> articulos.jsonl
+    import sys
+
+    tipo, origen = sys.argv[1], sys.argv[2]
+    with open(origen, 'r', encoding='utf-8') as f:
+        for registro in convertir_texto_legado(tipo, f.read()):
+            sys.stdout.write(serializar(registro))
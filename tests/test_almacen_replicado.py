@@ -0,0 +1,109 @@
+"""Escrituras replicadas contra servidores SFTP locales (benchmarks/servidores_locales.py).
+
+Cubren quórum fallido con reintento del lote, una réplica lenta que sigue
+escribiendo cuando llega el reintento y una réplica que deja de responder.
+"""
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / 'benchmarks'))
+
+from almacenamiento import AlmacenReplicado, AlmacenSSH, ErrorQuorum
+from servidores_locales import ServidorSSHLocal
+
+TIMEOUT = 1  # remote_timeout de las réplicas: una réplica colgada falla en este tiempo
+
+
+@pytest.fixture
+def replicas(tmp_path):
+    """Tres servidores SFTP y un AlmacenReplicado con quórum 2 sobre ellos"""
+    servidores = []
+    for n in range(3):
+        raiz = tmp_path / f"replica{n}"
+        raiz.mkdir()
+        servidores.append(ServidorSSHLocal(raiz).iniciar())
+    almacenes = [AlmacenSSH(dict(servidor.config(), remote_timeout=TIMEOUT)) for servidor in servidores]
+    almacen = AlmacenReplicado(almacenes, [f"r{n}" for n in range(3)], 2, tmp_path / 'reparaciones', espera=10)
+    for reparacion in almacen._reparaciones:
+        reparacion.espera_inicial = 0.1
+        reparacion.espera_maxima = 0.5
+    yield almacen, servidores
+    for servidor in servidores:
+        servidor.detener()
+
+
+def _contenidos(servidores, nombre):
+    return [(Path(servidor.raiz) / nombre).read_bytes() for servidor in servidores]
+
+
+def _esperar_reparaciones(almacen, espera=20):
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if all(estado['pendientes'] == 0 for estado in almacen.estado_replicas()):
+            return
+        time.sleep(0.05)
+    pytest.fail(f"Reparaciones sin terminar: {almacen.estado_replicas()}")
+
+
+def test_quorum_fallido_y_reintento_sin_duplicar(replicas):
+    almacen, servidores = replicas
+    almacen.anexar('x.jsonl', b'uno\n')
+    _esperar_reparaciones(almacen)
+    puertos = [servidores[n].port for n in (1, 2)]
+    servidores[1].detener()
+    servidores[2].detener()
+    with pytest.raises(ErrorQuorum, match="quórum 2"):
+        almacen.anexar('x.jsonl', b'dos\n')
+    for n, puerto in zip((1, 2), puertos):
+        servidores[n] = ServidorSSHLocal(servidores[n].raiz, port=puerto).iniciar()
+
+    # El diario de capturas reintenta el lote desde el mismo bloque, con lo nuevo al final
+    almacen.anexar('x.jsonl', b'dos\ntres\n')
+    _esperar_reparaciones(almacen)
+    assert _contenidos(servidores, 'x.jsonl') == [b'uno\ndos\ntres\n'] * 3
+
+
+def test_reintento_con_replica_lenta_en_curso(replicas):
+    almacen, servidores = replicas
+    servidores[0].retraso = 0.5
+    puertos = [servidores[n].port for n in (1, 2)]
+    servidores[1].detener()
+    servidores[2].detener()
+    with pytest.raises(ErrorQuorum, match="aún escribiendo"):
+        almacen.anexar('x.jsonl', b'Q\n')
+    for n, puerto in zip((1, 2), puertos):
+        servidores[n] = ServidorSSHLocal(servidores[n].raiz, port=puerto).iniciar()
+
+    # r0 todavía escribe Q: el reintento no la espera ni le vuelve a anexar Q
+    almacen.anexar('x.jsonl', b'Q\nR\n')
+    _esperar_reparaciones(almacen)
+    assert _contenidos(servidores, 'x.jsonl') == [b'Q\nR\n'] * 3
+
+
+def test_replica_colgada_no_detiene_las_escrituras(replicas):
+    almacen, servidores = replicas
+    almacen.anexar('x.jsonl', b'0\n')
+    # La réplica más lenta pudo quedar terminando el bloque por su diario de reparación
+    _esperar_reparaciones(almacen)
+    servidores[0].retraso = 60  # Acepta la conexión y deja de responder
+
+    inicio = time.monotonic()
+    for n in range(1, 21):
+        almacen.anexar('x.jsonl', f"{n}\n".encode())
+    # Cada escritura espera solo a las dos réplicas sanas
+    assert time.monotonic() - inicio < TIMEOUT * 5
+    esperado = ''.join(f"{n}\n" for n in range(21)).encode()
+    assert _contenidos(servidores, 'x.jsonl')[1:] == [esperado] * 2
+    assert almacen.estado_replicas()[0]['pendientes'] > 0
+
+    # Cuando vuelve a responder, su diario de reparación la pone al día y en orden. La
+    # escritura interrumpida dejó su candado, que caduca en BLOQUEO_CADUCADO; se retira aquí
+    servidores[0].retraso = 0
+    (Path(servidores[0].raiz) / 'x.jsonl.lock').rmdir()
+    _esperar_reparaciones(almacen, espera=30)
+    assert _contenidos(servidores, 'x.jsonl') == [esperado] * 3
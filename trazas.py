@@ -0,0 +1,254 @@
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from collections import deque
+
+# Duraciones que se conservan por tramo para los histogramas (las más recientes)
+VENTANA = 500
+# Límites superiores de las barras del histograma, en milisegundos
+LIMITES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+TAM_LOG = 10 << 20        # Bytes por archivo de log antes de rotar
+
+registro_log = logging.getLogger('gea.trazas')
+
+
+def _activadas_por_entorno():
+    return os.environ.get('GEA_TRAZAS', '').lower() in ('1', 'true', 'si', 'sí')
+
+
+_activas = _activadas_por_entorno()
+_tramos = {}
+_tramos_lock = threading.Lock()
+_pila = threading.local()
+_archivo_log = None
+
+
+class _Nulo:
+    """Tramo que no mide nada; se reutiliza cuando las trazas están apagadas"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        return False
+
+    def anotar(self, **atributos):
+        pass
+
+
+_NULO = _Nulo()
+
+
+class _Tramo:
+    __slots__ = ('nombre', 'atributos', 'padre', '_inicio')
+
+    def __init__(self, nombre, atributos):
+        self.nombre = nombre
+        self.atributos = atributos
+
+    def anotar(self, **atributos):
+        """Agrega atributos al evento del tramo (tamaño, archivo, etc.)"""
+        self.atributos.update(atributos)
+
+    def __enter__(self):
+        pila = getattr(_pila, 'tramos', None)
+        if pila is None:
+            pila = _pila.tramos = []
+        self.padre = pila[-1].nombre if pila else None
+        pila.append(self)
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, rastreo):
+        duracion = time.perf_counter() - self._inicio
+        _pila.tramos.pop()
+        _registrar(self, duracion, valor)
+        return False
+
+
+class _Serie:
+    """Duraciones recientes de un tramo más sus totales desde el arranque"""
+
+    __slots__ = ('duraciones', 'total', 'errores', 'suma')
+
+    def __init__(self):
+        self.duraciones = deque(maxlen=VENTANA)
+        self.total = 0
+        self.errores = 0
+        self.suma = 0.0
+
+
+def _registrar(tramo, duracion, error):
+    with _tramos_lock:
+        serie = _tramos.get(tramo.nombre)
+        if serie is None:
+            serie = _tramos[tramo.nombre] = _Serie()
+        serie.duraciones.append(duracion)
+        serie.total += 1
+        serie.suma += duracion
+        if error is not None:
+            serie.errores += 1
+    if registro_log.isEnabledFor(logging.INFO):
+        evento = {
+            'ts': round(time.time(), 3),
+            'tramo': tramo.nombre,
+            'ms': round(duracion * 1000, 3),
+            'padre': tramo.padre,
+            'hilo': threading.current_thread().name,
+        }
+        if error is not None:
+            evento['error'] = f"{type(error).__name__}: {error}"
+        evento.update(tramo.atributos)
+        registro_log.info(json.dumps(evento, ensure_ascii=False, default=str))
+
+
+def tramo(nombre, **atributos):
+    """Mide el bloque `with` bajo `nombre`; sin trazas activas no hace nada"""
+    if not _activas:
+        return _NULO
+    return _Tramo(nombre, atributos)
+
+
+def trazar(nombre):
+    """Decorador equivalente a envolver la función en `tramo(nombre)`"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _activas:
+                return funcion(*args, **kwargs)
+            with _Tramo(nombre, {}):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def configurar(config):
+    """Activa las trazas según `tracing` y envía los eventos a `tracing_log_file`.
+
+    La variable de entorno GEA_TRAZAS=1 también las activa. Es barata de
+    llamar en cada ejecución del script: solo cambia algo si la configuración
+    cambió.
+    """
+    global _activas, _archivo_log
+    _activas = bool(config.get('tracing')) or _activadas_por_entorno()
+    archivo = config.get('tracing_log_file')
+    if not _activas or not archivo or archivo == _archivo_log:
+        return
+    with _tramos_lock:
+        if archivo == _archivo_log:
+            return
+        manejador = logging.handlers.RotatingFileHandler(
+            archivo, maxBytes=TAM_LOG, backupCount=3, encoding='utf-8')
+        manejador.setFormatter(logging.Formatter('%(message)s'))
+        for anterior in [h for h in registro_log.handlers if getattr(h, 'gea_trazas', False)]:
+            registro_log.removeHandler(anterior)
+            anterior.close()
+        manejador.gea_trazas = True
+        registro_log.addHandler(manejador)
+        registro_log.setLevel(logging.INFO)
+        registro_log.propagate = False
+        _archivo_log = archivo
+
+
+def activas():
+    return _activas
+
+
+def _percentil(ordenadas, p):
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p / 100))]
+
+
+def resumen():
+    """Estadísticas por tramo sobre la ventana reciente, ordenadas por tiempo acumulado"""
+    with _tramos_lock:
+        copias = {nombre: (list(s.duraciones), s.total, s.errores, s.suma) for nombre, s in _tramos.items()}
+    filas = []
+    for nombre, (duraciones, total, errores, suma) in copias.items():
+        if not duraciones:
+            continue
+        ordenadas = sorted(duraciones)
+        filas.append({
+            'tramo': nombre,
+            'llamadas': total,
+            'errores': errores,
+            'total_s': round(suma, 3),
+            'p50_ms': round(_percentil(ordenadas, 50) * 1000, 2),
+            'p95_ms': round(_percentil(ordenadas, 95) * 1000, 2),
+            'p99_ms': round(_percentil(ordenadas, 99) * 1000, 2),
+            'max_ms': round(ordenadas[-1] * 1000, 2),
+        })
+    return sorted(filas, key=lambda fila: -fila['total_s'])
+
+
+def histograma(nombre):
+    """Cuántas de las duraciones recientes de `nombre` caen en cada intervalo de LIMITES_MS"""
+    with _tramos_lock:
+        serie = _tramos.get(nombre)
+        duraciones = list(serie.duraciones) if serie else []
+    conteos = [0] * len(LIMITES_MS)
+    for duracion in duraciones:
+        ms = duracion * 1000
+        for i, limite in enumerate(LIMITES_MS):
+            if ms <= limite:
+                conteos[i] += 1
+                break
+    etiquetas = [f"≤{limite:g} ms" if limite != float('inf') else f">{LIMITES_MS[-2]:g} ms" for limite in LIMITES_MS]
+    return list(zip(etiquetas, conteos))
+
+
+def exportar():
+    """Resumen de todos los tramos como líneas JSON, listo para descargar o enviar a un colector"""
+    marca = round(time.time(), 3)
+    lineas = []
+    for fila in resumen():
+        fila = dict(fila, ts=marca, tipo='resumen', histograma=dict(histograma(fila['tramo'])))
+        lineas.append(json.dumps(fila, ensure_ascii=False))
+    return '\n'.join(lineas) + ('\n' if lineas else '')
+
+
+def reiniciar():
+    with _tramos_lock:
+        _tramos.clear()
+
+
+def panel(config):
+    """Panel de diagnóstico para la barra lateral, visible solo para administradores.
+
+    Requiere trazas activas y `admin_password` en la configuración.
+    """
+    if not _activas or not config.get('admin_password'):
+        return
+    import streamlit as st
+
+    with st.expander("🛠️ Diagnóstico de tiempos", expanded=False):
+        if not st.session_state.get('admin_trazas'):
+            clave = st.text_input("Contraseña de administrador:", type="password", key="clave_admin_trazas")
+            if clave and clave == config['admin_password']:
+                st.session_state.admin_trazas = True
+                st.rerun()
+            elif clave:
+                st.error("Contraseña incorrecta")
+            return
+
+        filas = resumen()
+        if not filas:
+            st.caption("Aún no hay tramos medidos")
+            return
+        st.dataframe(filas, hide_index=True, use_container_width=True)
+        elegido = st.selectbox("Histograma de:", [fila['tramo'] for fila in filas], key="tramo_histograma")
+        barras = histograma(elegido)
+        import plotly.express as px  # Solo cuando se dibuja el histograma
+        fig = px.bar(x=[e for e, _ in barras], y=[c for _, c in barras],
+                     labels={'x': 'Duración', 'y': 'Llamadas'}, height=250)
+        fig.update_layout(margin=dict(l=0, r=0, t=10, b=0))
+        st.plotly_chart(fig, use_container_width=True)
+        col_exportar, col_reiniciar = st.columns(2)
+        col_exportar.download_button("⬇️ Exportar JSONL", exportar(), file_name="trazas_gea.jsonl",
+                                     mime="application/x-ndjson")
+        if col_reiniciar.button("♻️ Reiniciar"):
+            reiniciar()
+            st.rerun()
@@ -0,0 +1,221 @@
+import functools
+import re
+from collections import namedtuple
+from datetime import date
+
+from duplicados import normalizar_doi
+from registros import ESQUEMAS, crear_registro, normalizar_etiqueta, pares_etiquetados
+
+# Error de un campo: etiqueta como la escribió el usuario (o la de la plantilla si falta) y motivo
+ErrorCampo = namedtuple('ErrorCampo', 'etiqueta mensaje')
+
+ANIO_MINIMO = 1900
+
+_DOI = re.compile(r'^10\.\d{4,9}/\S+$')
+_ISSN = re.compile(r'^(\d{4})-?(\d{3}[\dX])$')
+_ISBN = re.compile(r'^(\d{9}[\dX]|\d{13})$')
+_VOL_NO = re.compile(r'^\d+\s*(\(\s*[\w\-–/ ]+\s*\))?$')
+_PAGINAS = re.compile(r'^([A-Za-z]{0,2})(\d+)(?:\s*[-–—]\s*([A-Za-z]{0,2})(\d+))?$')
+_FECHA = re.compile(r'^(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?$')
+_PERIODO = re.compile(r'^(\d{4})(?:\s*[-–]\s*(\d{4}))?$')
+
+
+def _anio_fuera_de_rango(anio):
+    limite = date.today().year + 1
+    if not ANIO_MINIMO <= anio <= limite:
+        return f"el año debe estar entre {ANIO_MINIMO} y {limite}"
+    return None
+
+
+def digito_issn(siete):
+    """Dígito verificador (módulo 11) de los primeros siete dígitos de un ISSN"""
+    suma = sum(int(digito) * peso for digito, peso in zip(siete, range(8, 1, -1)))
+    resto = (11 - suma % 11) % 11
+    return 'X' if resto == 10 else str(resto)
+
+
+def issn_valido(issn):
+    coincidencia = _ISSN.match(issn.strip().upper())
+    if not coincidencia:
+        return False
+    digitos = coincidencia.group(1) + coincidencia.group(2)
+    return digito_issn(digitos[:7]) == digitos[7]
+
+
+def isbn_valido(isbn):
+    """ISBN-10 (módulo 11) o ISBN-13 (módulo 10), con o sin guiones"""
+    digitos = re.sub(r'[\s-]', '', isbn.upper())
+    if not _ISBN.match(digitos):
+        return False
+    if len(digitos) == 10:
+        valores = [10 if d == 'X' else int(d) for d in digitos]
+        return 'X' not in digitos[:9] and sum(v * p for v, p in zip(valores, range(10, 0, -1))) % 11 == 0
+    return sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digitos)) % 10 == 0
+
+
+# Reglas por campo: reciben el texto capturado (sin espacios a los lados) y
+# devuelven el motivo del rechazo o None
+
+def _regla_anio(valor):
+    if not valor.isdigit() or len(valor) != 4:
+        return "debe ser un año de cuatro dígitos, por ejemplo 2023"
+    return _anio_fuera_de_rango(int(valor))
+
+
+def _regla_doi(valor):
+    if not _DOI.match(normalizar_doi(valor)):
+        return "debe tener la forma 10.<registrante>/<sufijo>, por ejemplo 10.1016/j.cell.2023.01.001"
+    return None
+
+
+def _regla_issn(valor):
+    if not _ISSN.match(valor.upper()):
+        return "debe tener la forma 1234-5678"
+    if not issn_valido(valor):
+        return "el dígito verificador no corresponde"
+    return None
+
+
+def _regla_isbn(valor):
+    if not _ISBN.match(re.sub(r'[\s-]', '', valor.upper())):
+        return "debe tener 10 o 13 dígitos"
+    if not isbn_valido(valor):
+        return "el dígito verificador no corresponde"
+    return None
+
+
+def _regla_vol_no(valor):
+    if not _VOL_NO.match(valor):
+        return "debe ser el volumen y, entre paréntesis, el número: 5(3)"
+    return None
+
+
+def _regla_paginas(valor):
+    coincidencia = _PAGINAS.match(valor)
+    if not coincidencia:
+        return "debe ser una página o un rango inicio-fin, por ejemplo 123-135"
+    inicio, fin = coincidencia.group(2), coincidencia.group(4)
+    if fin is not None and int(fin) < int(inicio):
+        return f"la página final ({fin}) es menor que la inicial ({inicio})"
+    return None
+
+
+def _regla_fecha(valor):
+    coincidencia = _FECHA.match(valor)
+    if not coincidencia:
+        return "debe tener la forma AAAA-MM-DD"
+    anio, mes, dia = (int(parte) if parte else 1 for parte in coincidencia.groups())
+    try:
+        date(anio, mes, dia)
+    except ValueError:
+        return "no es una fecha válida"
+    return _anio_fuera_de_rango(anio)
+
+
+def _regla_periodo(valor):
+    coincidencia = _PERIODO.match(valor)
+    if not coincidencia:
+        return "debe ser un año o un rango de años, por ejemplo 2022-2023"
+    inicio, fin = coincidencia.group(1), coincidencia.group(2) or coincidencia.group(1)
+    if int(fin) < int(inicio):
+        return f"el año final ({fin}) es anterior al inicial ({inicio})"
+    return _anio_fuera_de_rango(int(inicio)) or _anio_fuera_de_rango(int(fin))
+
+
+def _convertible(mensaje):
+    """Regla para campos cuyo conversor devuelve None si el texto no sirve"""
+    return lambda valor, conversor: None if conversor(valor) is not None else mensaje
+
+
+REGLAS = {
+    'anio': _regla_anio,
+    'doi': _regla_doi,
+    'issn': _regla_issn,
+    'isbn': _regla_isbn,
+    'vol_no': _regla_vol_no,
+    'paginas': _regla_paginas,
+    'fecha': _regla_fecha,
+    'periodo': _regla_periodo,
+}
+
+# Reglas que dependen del conversor del campo
+REGLAS_CONVERSOR = {
+    'memorias': _convertible("debe ser Sí o No"),
+    'monto': _convertible("debe ser una cantidad, por ejemplo $100,000 MXN"),
+}
+
+# Campos obligatorios por tipo, con la etiqueta de la plantilla
+OBLIGATORIOS = {
+    'art': (('titulo', 'Título'), ('autores', 'Autores'), ('anio', 'Año')),
+    'tes': (('titulo', 'Título'), ('autores', 'Autor'), ('anio', 'Año')),
+    'con': (('titulo', 'Título'), ('autores', 'Autores')),
+    'fin': (('titulo', 'Proyecto'), ('autores', 'Responsable')),
+}
+
+
+class Esquema:
+    """Reglas de un tipo de registro, resueltas una sola vez al importar el módulo.
+
+    `validar` recorre el texto en una sola pasada: cada línea "Clave: valor"
+    se busca en un dict de etiquetas normalizadas que ya trae el campo, su
+    conversor y su regla, así que no hay búsquedas ni compilaciones por línea.
+    """
+
+    __slots__ = ('tipo', 'definiciones', 'obligatorios')
+
+    def __init__(self, tipo):
+        self.tipo = tipo
+        # Etiqueta normalizada -> (campo, conversor, regla, la regla recibe el conversor)
+        self.definiciones = {}
+        for etiqueta, (campo, conversor) in ESQUEMAS[tipo].items():
+            if campo in REGLAS_CONVERSOR:
+                self.definiciones[etiqueta] = (campo, conversor, REGLAS_CONVERSOR[campo], True)
+            else:
+                self.definiciones[etiqueta] = (campo, conversor, REGLAS.get(campo), False)
+        self.obligatorios = OBLIGATORIOS[tipo]
+
+    def validar(self, contenido):
+        """(campos convertidos, lista de ErrorCampo) de un texto con líneas "Clave: valor" """
+        campos, errores, rechazados = {}, [], set()
+        for etiqueta, texto in pares_etiquetados(contenido):
+            definicion = self.definiciones.get(_normalizar(etiqueta))
+            if definicion is None or not texto:
+                continue
+            campo, conversor, regla, con_conversor = definicion
+            if regla is not None:
+                mensaje = regla(texto, conversor) if con_conversor else regla(texto)
+                if mensaje:
+                    errores.append(ErrorCampo(etiqueta, mensaje))
+                    rechazados.add(campo)
+                    continue
+            valor = conversor(texto)
+            if valor not in (None, [], ''):
+                campos[campo] = valor
+        for campo, etiqueta in self.obligatorios:
+            if campo not in campos and campo not in rechazados:
+                errores.append(ErrorCampo(etiqueta, "falta este campo"))
+        return campos, errores
+
+
+# Las etiquetas se repiten en cada referencia; se normalizan una sola vez
+_normalizar = functools.lru_cache(maxsize=1024)(normalizar_etiqueta)
+
+ESQUEMAS_COMPILADOS = {tipo: Esquema(tipo) for tipo in ESQUEMAS}
+
+
+def validar_referencia(tipo, contenido, fecha=None, id_registro=None):
+    """Valida una referencia "Clave: valor" sin acceso a red.
+
+    Devuelve (registro, errores): el registro estructurado si no hubo errores
+    (None en otro caso) y la lista de ErrorCampo. Es el mismo motor para la
+    captura individual y la importación masiva.
+    """
+    campos, errores = ESQUEMAS_COMPILADOS[tipo].validar(contenido)
+    if errores:
+        return None, errores
+    return crear_registro(tipo, contenido, fecha, id_registro, campos=campos), errores
+
+
+def describir_errores(errores):
+    """'DOI: motivo; ISSN: motivo' para mostrar en una sola línea"""
+    return "; ".join(f"{error.etiqueta}: {error.mensaje}" for error in errores)